@@ -18,6 +18,9 @@
 import os
 
 CHUNK_SIZE = int(os.getenv('PYTROLL_CHUNK_SIZE', 4096))
+# Backend used with nprocs > 1: 'auto', 'threads' or 'processes'. 'auto'
+# uses threads when pyproj 2 and pykdtree are available, processes otherwise
+PARALLEL = os.getenv('PYTROLL_PARALLEL', 'auto')
 
 # Backwards compatibility
 from pyresample import geometry  # noqa
@@ -33,10 +36,11 @@ from pyresample.geometry import (SwathDefinition,  # noqa
 from pyresample.area_config import load_area, create_area_def, get_area_def, \
                                    parse_area_file, convert_def_to_yaml  # noqa
 from pyresample.kd_tree import XArrayResamplerNN  # noqa
+from pyresample.auto import resample  # noqa
 from pyresample.plot import save_quicklook, area_def2basemap  # noqa
 from .version import get_versions  # noqa
 
-__all__ = ['grid', 'image', 'kd_tree', 'utils', 'plot', 'geo_filter', 'geometry', 'CHUNK_SIZE',
+__all__ = ['grid', 'image', 'kd_tree', 'utils', 'plot', 'geo_filter', 'geometry', 'CHUNK_SIZE', 'PARALLEL', 'resample',
            'load_area', 'create_area_def', 'get_area_def', 'parse_area_file', 'convert_def_to_yaml']
 
 __version__ = get_versions()['version']
@@ -0,0 +1,243 @@
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020  Pyresample developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Caching of precomputed numpy arrays in memory and on disk."""
+
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from logging import getLogger
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+
+class ArrayCache(object):
+    """Least recently used cache of named numpy arrays.
+
+    Every entry is a dictionary of arrays stored under a string key. Entries
+    are kept in memory until their combined size exceeds `max_bytes`, after
+    which the least recently used ones are dropped. If `cache_dir` is given,
+    entries are also written to disk as one directory of ``.npy`` files per
+    key and read back as read-only memory maps, so they survive the process
+    and are shared between processes. Entries are written atomically, and
+    processes sharing the directory lock it while writing, evicting or
+    reading. With `max_disk_bytes`, the least recently used entries on disk
+    are removed once the directory grows larger.
+
+    The number of lookups found in the cache (in memory or on disk) and not
+    found are counted in `hits` and `misses`, of which `disk_hits` were
+    loaded from disk.
+
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES,
+                 max_disk_bytes=None):
+        """Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory to store the entries in. If None
+                (default), entries are only kept in memory.
+            max_bytes (int): Size limit of the in-memory part of the cache.
+            max_disk_bytes (int): Size limit of the entries in `cache_dir`.
+                If None (default), the directory isn't limited.
+
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def nbytes(self):
+        """Get the number of bytes currently held in memory."""
+        return self._nbytes
+
+    def __contains__(self, key):
+        """Check if `key` is available in memory or on disk."""
+        return key in self._entries or (
+            self.cache_dir is not None and os.path.isdir(self._get_path(key)))
+
+    def __len__(self):
+        """Get the number of entries held in memory."""
+        return len(self._entries)
+
+    def get(self, key):
+        """Get the arrays stored under `key`, or None if there are none."""
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            except KeyError:
+                pass
+        arrays = self._load(key)
+        with self._lock:
+            if arrays is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        self._store(key, arrays)
+        return arrays
+
+    def put(self, key, arrays):
+        """Store the dictionary of `arrays` under `key`.
+
+        When the cache is backed by a directory, the arrays held in memory
+        are replaced by memory maps of the written files.
+
+        """
+        arrays = dict(arrays)
+        if self.cache_dir is not None:
+            self._save(key, arrays)
+            arrays = self._load(key) or arrays
+        self._store(key, arrays)
+        return arrays
+
+    def clear(self):
+        """Remove all entries from memory. Files on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def get_stats(self):
+        """Get the hit and miss counts and the size of the cache."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'disk_hits': self.disk_hits, 'entries': len(self),
+                'nbytes': self.nbytes}
+
+    def _store(self, key, arrays):
+        nbytes = _get_nbytes(arrays)
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= _get_nbytes(self._entries.pop(key))
+            if nbytes > self.max_bytes:
+                logger.debug("Entry %s is larger than the cache, not keeping it in memory", key)
+                return
+            self._entries[key] = arrays
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._nbytes -= _get_nbytes(dropped)
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _save(self, key, arrays):
+        path = self._get_path(key)
+        if os.path.isdir(path):
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temporary directory first so that other processes never
+        # see a partially written entry.
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp_')
+        try:
+            for name, arr in arrays.items():
+                np.save(os.path.join(tmp_path, name + '.npy'), np.asanyarray(arr))
+            with _lock_directory(self.cache_dir, exclusive=True):
+                os.rename(tmp_path, path)
+                if self.max_disk_bytes is not None:
+                    self._evict_disk(keep=key)
+        except OSError:
+            # Another process wrote the same entry in the meantime
+            logger.debug("Could not write cache entry %s", path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _evict_disk(self, keep=None):
+        """Remove the least recently used entries until the directory fits `max_disk_bytes`."""
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            path = self._get_path(key)
+            if key.startswith('.') or not os.path.isdir(path):
+                continue
+            entries.append((os.path.getmtime(path), _get_disk_nbytes(path), key))
+        total = sum(nbytes for _, nbytes, _ in entries)
+        for _, nbytes, key in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            if key == keep:
+                continue
+            logger.debug("Removing cache entry %s from disk", key)
+            shutil.rmtree(self._get_path(key), ignore_errors=True)
+            total -= nbytes
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._get_path(key)
+        if not os.path.isdir(path):
+            return None
+        with _lock_directory(self.cache_dir, exclusive=False):
+            try:
+                filenames = os.listdir(path)
+            except OSError:
+                return None
+            arrays = {}
+            for filename in filenames:
+                name, ext = os.path.splitext(filename)
+                if ext != '.npy':
+                    continue
+                arrays[name] = np.load(os.path.join(path, filename), mmap_mode='r')
+            try:
+                # Mark the entry as recently used for the disk eviction
+                os.utime(path)
+            except OSError:
+                pass
+        logger.debug("Loaded cache entry %s", path)
+        return arrays
+
+
+@contextmanager
+def _lock_directory(path, exclusive=True):
+    """Lock the directory `path` against other processes.
+
+    Does nothing where ``fcntl`` isn't available.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _get_nbytes(arrays):
+    return sum(arr.nbytes for arr in arrays.values())
+
+
+def _get_disk_nbytes(path):
+    return sum(os.path.getsize(os.path.join(path, filename)) for filename in os.listdir(path))
@@ -0,0 +1,79 @@
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020  Pyresample developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Chunk sizes of dask resampling targets within a memory budget."""
+
+from logging import getLogger
+
+import numpy as np
+
+logger = getLogger(__name__)
+
+
+def get_target_chunks(shape, pixel_bytes, chunks=None, memory_limit=None,
+                      fixed_bytes=0, default=None):
+    """Get the chunk size of a resampling target.
+
+    Args:
+        shape (tuple): Shape of the target geolocation dimensions
+        pixel_bytes (float): Memory a task uses per target pixel
+        chunks (int or tuple): Explicit chunk size, returned as it is
+        memory_limit (int or str): Memory a single task may use, in bytes or
+            as a string like ``'512MiB'``
+        fixed_bytes (int): Memory a task uses regardless of its number of
+            pixels, e.g. for a kd-tree
+        default (int or tuple): Chunk size when neither `chunks` nor
+            `memory_limit` is given
+
+    Returns:
+        The `chunks` if given, otherwise the size of the largest square
+        chunks whose tasks stay within `memory_limit`, or `default`.
+
+    """
+    if chunks is not None and memory_limit is not None:
+        raise ValueError("Only one of 'chunks' and 'memory_limit' can be given")
+    if chunks is not None:
+        return chunks
+    if memory_limit is None:
+        return default
+    if isinstance(memory_limit, str):
+        from dask.utils import parse_bytes
+        memory_limit = parse_bytes(memory_limit)
+    available = memory_limit - fixed_bytes
+    if available < pixel_bytes:
+        raise ValueError("A memory_limit of %d bytes is too small, at least "
+                         "%d bytes are needed" % (memory_limit, fixed_bytes + pixel_bytes))
+    size = min(int(np.sqrt(available / pixel_bytes)), max(shape))
+    logger.debug("Using target chunks of %d pixels for %.1f bytes per pixel "
+                 "and a memory limit of %d bytes", size, pixel_bytes, memory_limit)
+    return size
+
+
+def get_source_overlap(source_geo_def, target_geo_def):
+    """Estimate the number of source pixels overlapping a target pixel.
+
+    The estimate is the ratio of the pixel areas, from the geocentric
+    resolutions of the geometries. Returns 1 if a resolution is unknown.
+
+    """
+    try:
+        ratio = (target_geo_def.geocentric_resolution() /
+                 source_geo_def.geocentric_resolution()) ** 2
+    except (RuntimeError, AttributeError, ZeroDivisionError):
+        return 1.
+    if not np.isfinite(ratio) or ratio <= 0:
+        return 1.
+    return ratio
@@ -0,0 +1,93 @@
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020  Pyresample developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Fast fingerprints of large numpy arrays for hashing geometries."""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Bytes hashed per task when fingerprinting a whole array
+CHUNK_BYTES = 16 * 1024 ** 2
+# Number of elements hashed in the sampled mode
+SAMPLE_SIZE = 2 ** 16
+
+
+def _new_hash():
+    """Get the fastest available hash object and its name."""
+    if xxhash is not None and hasattr(xxhash, 'xxh3_128'):
+        return xxhash.xxh3_128(), b'xxh3_128'
+    return hashlib.blake2b(digest_size=20), b'blake2b'
+
+
+def _hash_block(block):
+    the_hash = _new_hash()[0]
+    the_hash.update(np.ascontiguousarray(block).view(np.uint8))
+    return the_hash.digest()
+
+
+def fingerprint_array(arr, sampled=False, nthreads=None):
+    """Get a fingerprint of the contents of the numpy array `arr`.
+
+    The array is split along its first axis into blocks of about
+    `CHUNK_BYTES`, which are hashed in parallel by a pool of threads
+    (hashlib and xxhash release the GIL). The fingerprint combines the
+    digests of the blocks with the dtype and shape of the array. xxhash is
+    used if it is installed, blake2b otherwise.
+
+    Args:
+        arr (numpy.ndarray): Array to fingerprint
+        sampled (bool): Only hash a strided sample of about `SAMPLE_SIZE`
+            elements. This is only safe for trusted inputs, as arrays
+            differing outside the sample get the same fingerprint.
+        nthreads (int): Number of threads. Defaults to the number of CPUs.
+
+    Returns:
+        bytes: The fingerprint
+
+    """
+    arr = np.asarray(arr)
+    if arr.ndim == 0:
+        arr = arr.reshape(1)
+    the_hash, name = _new_hash()
+    the_hash.update(name)
+    the_hash.update(arr.dtype.str.encode('utf-8'))
+    the_hash.update(np.array(arr.shape, dtype=np.int64))
+
+    if sampled:
+        per_dim = max(int(SAMPLE_SIZE ** (1. / arr.ndim)), 1)
+        sample = arr[tuple(slice(None, None, max(size // per_dim, 1)) for size in arr.shape)]
+        the_hash.update(b'sampled')
+        the_hash.update(_hash_block(sample))
+        return the_hash.digest()
+
+    rows = max(CHUNK_BYTES // max(arr[:1].nbytes, 1), 1)
+    blocks = [arr[start:start + rows] for start in range(0, arr.shape[0], rows)]
+    if len(blocks) > 1:
+        with ThreadPoolExecutor(nthreads or os.cpu_count()) as executor:
+            digests = list(executor.map(_hash_block, blocks))
+    else:
+        digests = [_hash_block(block) for block in blocks]
+    for digest in digests:
+        the_hash.update(digest)
+    return the_hash.digest()
@@ -19,20 +19,33 @@ from __future__ import absolute_import
 
 import ctypes
 import multiprocessing as mp
+import time
 
 import numpy as np
 
 
 class Scheduler(object):
+    """Load balancer handing out slices of the data to worker processes.
 
-    def __init__(self, ndata, nprocs, chunk=None, schedule='guided'):
+    The data is split up front into one contiguous range per worker. A
+    worker takes its chunks from the front of its own range, so it only
+    locks its own range and never waits for the others. Once its range is
+    empty it steals the back half of the range of another worker. With the
+    'static' schedule nothing is stolen.
+
+    If a `stats` object is given, every worker adds the number of chunks
+    and items it processed and its wall time to it.
+    """
+
+    def __init__(self, ndata, nprocs, chunk=None, schedule='guided', stats=None):
         if not schedule in ['guided', 'dynamic', 'static']:
             raise ValueError('unknown scheduling strategy')
-        self._ndata = mp.RawValue(ctypes.c_int, ndata)
-        self._start = mp.RawValue(ctypes.c_int, 0)
-        self._lock = mp.Lock()
+        if stats is not None and stats.nprocs != nprocs:
+            raise ValueError('stats are collected for %d workers, not %d' %
+                             (stats.nprocs, nprocs))
         self._schedule = schedule
         self._nprocs = nprocs
+        self._stats = stats
         if schedule == 'guided' or schedule == 'dynamic':
             min_chunk = ndata // (10 * nprocs)
             if chunk:
@@ -46,49 +59,164 @@ class Scheduler(object):
             min_chunk = max(min_chunk, 1)
             self._chunk = min_chunk
 
+        bounds = [ndata * rank // nprocs for rank in range(nprocs + 1)]
+        self._starts = mp.RawArray(ctypes.c_longlong, bounds[:-1])
+        self._stops = mp.RawArray(ctypes.c_longlong, bounds[1:])
+        self._locks = [mp.Lock() for _ in range(nprocs)]
+        self._next_rank = mp.RawValue(ctypes.c_int, 0)
+        self._rank_lock = mp.Lock()
+
+    def _claim_rank(self):
+        with self._rank_lock:
+            rank = self._next_rank.value
+            self._next_rank.value = rank + 1
+        return rank
+
+    def _take(self, rank):
+        """Take the next chunk from the front of the range of `rank`."""
+        with self._locks[rank]:
+            start = self._starts[rank]
+            remaining = self._stops[rank] - start
+            if remaining <= 0:
+                return None
+            chunk = self._chunk
+            if self._schedule == 'guided':
+                chunk = max(chunk, remaining // 2)
+            stop = start + min(chunk, remaining)
+            self._starts[rank] = stop
+        return slice(start, stop)
+
+    def _steal(self, rank):
+        """Steal the back half of the range of another worker.
+
+        The stolen range becomes the range of `rank`, or is returned as a
+        slice if `rank` has no range of its own.
+        """
+        for victim in range(rank + 1, rank + 1 + self._nprocs):
+            victim = victim % self._nprocs
+            if victim == rank:
+                continue
+            with self._locks[victim]:
+                start = self._starts[victim]
+                stop = self._stops[victim]
+                remaining = stop - start
+                if remaining <= 0:
+                    continue
+                if remaining > self._chunk:
+                    start = stop - remaining // 2
+                self._stops[victim] = start
+            if rank >= self._nprocs:
+                return slice(start, stop)
+            with self._locks[rank]:
+                self._starts[rank] = start
+                self._stops[rank] = stop
+            return True
+        return None
+
     def __iter__(self):
+        rank = self._claim_rank()
+        t_start = time.time()
+        chunks = 0
+        items = 0
         while True:
-            self._lock.acquire()
-            ndata = self._ndata.value
-            nprocs = self._nprocs
-            start = self._start.value
-            if self._schedule == 'guided':
-                _chunk = ndata // nprocs
-                chunk = max(self._chunk, _chunk)
+            if rank < self._nprocs:
+                s = self._take(rank)
             else:
-                chunk = self._chunk
-            if ndata:
-                if chunk > ndata:
-                    s0 = start
-                    s1 = start + ndata
-                    self._ndata.value = 0
-                else:
-                    s0 = start
-                    s1 = start + chunk
-                    self._ndata.value = ndata - chunk
-                    self._start.value = start + chunk
-                self._lock.release()
-                yield slice(s0, s1)
-            else:
-                self._lock.release()
-                return
+                s = None
+            if s is None:
+                if self._schedule == 'static':
+                    break
+                s = self._steal(rank)
+                if s is None:
+                    break
+                if s is True:
+                    continue
+            chunks += 1
+            items += s.stop - s.start
+            yield s
+        if self._stats is not None and rank < self._nprocs:
+            self._stats.add(rank, chunks, items, time.time() - t_start)
+
+
+class SchedulerStats(object):
+    """Chunks, items and wall time per worker of the runs of a Scheduler.
+
+    The counts are kept in shared memory, so the worker processes can add
+    to them. Passing the same object to several runs adds up their counts.
+    """
+
+    def __init__(self, nprocs):
+        self.nprocs = nprocs
+        self._chunks = mp.RawArray(ctypes.c_longlong, nprocs)
+        self._items = mp.RawArray(ctypes.c_longlong, nprocs)
+        self._wall_time = mp.RawArray(ctypes.c_double, nprocs)
+
+    def add(self, rank, chunks, items, wall_time):
+        """Add the counts of a run of worker `rank`."""
+        # Each worker only writes to its own entry
+        self._chunks[rank] += chunks
+        self._items[rank] += items
+        self._wall_time[rank] += wall_time
+
+    @property
+    def chunks(self):
+        """Number of chunks processed per worker."""
+        return shmem_as_ndarray(self._chunks).copy()
+
+    @property
+    def items(self):
+        """Number of items processed per worker."""
+        return shmem_as_ndarray(self._items).copy()
+
+    @property
+    def wall_time(self):
+        """Wall time in seconds per worker."""
+        return shmem_as_ndarray(self._wall_time).copy()
+
+    def __str__(self):
+        lines = ['worker %d: %d chunks, %d items, %.3f s' % stats
+                 for stats in zip(range(self.nprocs), self.chunks, self.items,
+                                  self.wall_time)]
+        return '\n'.join(lines)
+
+
+_ctypes_to_numpy = {
+    ctypes.c_char: np.int8,
+    ctypes.c_wchar: np.int16,
+    ctypes.c_byte: np.int8,
+    ctypes.c_ubyte: np.uint8,
+    ctypes.c_short: np.int16,
+    ctypes.c_ushort: np.uint16,
+    ctypes.c_int: np.int32,
+    ctypes.c_uint: np.uint32,
+    ctypes.c_long: np.dtype(ctypes.c_long).type,
+    ctypes.c_ulong: np.dtype(ctypes.c_ulong).type,
+    ctypes.c_longlong: np.int64,
+    ctypes.c_ulonglong: np.uint64,
+    ctypes.c_float: np.float32,
+    ctypes.c_double: np.float64
+}
+
+_numpy_to_ctypes = {
+    np.dtype(np.int8): ctypes.c_byte,
+    np.dtype(np.uint8): ctypes.c_ubyte,
+    np.dtype(np.int16): ctypes.c_short,
+    np.dtype(np.uint16): ctypes.c_ushort,
+    np.dtype(np.int32): ctypes.c_int32,
+    np.dtype(np.uint32): ctypes.c_uint32,
+    np.dtype(np.int64): ctypes.c_int64,
+    np.dtype(np.uint64): ctypes.c_uint64,
+    np.dtype(np.float32): ctypes.c_float,
+    np.dtype(np.float64): ctypes.c_double
+}
+
+
+def shmem_empty(size, dtype):
+    """Allocate a shared memory array of `size` items of `dtype`."""
+    return mp.RawArray(_numpy_to_ctypes[np.dtype(dtype)], int(size))
 
 
 def shmem_as_ndarray(raw_array):
-    _ctypes_to_numpy = {
-        ctypes.c_char: np.int8,
-        ctypes.c_wchar: np.int16,
-        ctypes.c_byte: np.int8,
-        ctypes.c_ubyte: np.uint8,
-        ctypes.c_short: np.int16,
-        ctypes.c_ushort: np.uint16,
-        ctypes.c_int: np.int32,
-        ctypes.c_uint: np.int32,
-        ctypes.c_long: np.int32,
-        ctypes.c_ulong: np.int32,
-        ctypes.c_float: np.float32,
-        ctypes.c_double: np.float64
-    }
     dtype = _ctypes_to_numpy[raw_array._type_]
 
     # The following works too, but occasionally raises
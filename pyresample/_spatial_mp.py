@@ -18,6 +18,11 @@
 from __future__ import absolute_import
 
 import ctypes
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pyproj
@@ -32,15 +37,34 @@ try:
 except ImportError:
     ne = None
 
-from ._multi_proc import shmem_as_ndarray, Scheduler
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from ._multi_proc import shmem_as_ndarray, shmem_empty, Scheduler
 
 # Earth radius
 R = 6370997.0
+# Seconds between the checks that the workers of a kd-tree pool are alive
+POOL_POLL_INTERVAL = 1.0
 
 
 class cKDTree_MP(object):
 
-    ''' Multiprocessing cKDTree subclass, shared memory '''
+    ''' Multiprocessing cKDTree subclass, shared memory
+
+    By default every query starts `nprocs` new processes, which each
+    rebuild the kd-tree. Used as a context manager, or after calling
+    `start`, the tree keeps a pool of worker processes instead. Each worker
+    builds the tree once, and the query points and results are exchanged
+    through shared memory blocks that are reused between queries. The pool
+    is stopped by leaving the context or calling `close`::
+
+        with cKDTree_MP(coords, nprocs=4) as kdtree:
+            for target_coords in targets:
+                distances, indices = kdtree.query(target_coords, k=8)
+    '''
 
     def __init__(self, data, leafsize=10, nprocs=2, chunk=None,
                  schedule='guided'):
@@ -51,17 +75,24 @@ class cKDTree_MP(object):
         chunk : Minimum chunk size for the load balancer.
         schedule: Strategy for balancing work load
         ('static', 'dynamic' or 'guided').
+
+        float32 and float64 data keep their dtype in shared memory, as do
+        the query points and distances. Indices are int32, or int64 for more
+        than 2**31 - 1 data points.
         '''
 
         self.n, self.m = data.shape
+        self.dtype = _get_coords_dtype(data.dtype)
+        self.index_dtype = _get_index_dtype(self.n)
         # Allocate shared memory for data
-        self.shmem_data = mp.RawArray(ctypes.c_double, self.n * self.m)
+        self.shmem_data = shmem_empty(self.n * self.m, self.dtype)
 
         # View shared memory as ndarray, and copy over the data.
         # The RawArray objects have information about the dtype and
         # buffer size.
         _data = shmem_as_ndarray(self.shmem_data).reshape((self.n, self.m))
         _data[:,:] = data
+        self.data = _data
 
         # Initialize parent, we must do this last because
         # cKDTree stores a reference to the data array. We pass in
@@ -70,18 +101,45 @@ class cKDTree_MP(object):
         self._nprocs = nprocs
         self._chunk = chunk
         self._schedule = schedule
-
-    def query(self, x, k=1, eps=0, p=2, distance_upper_bound=np.inf):
+        self._pool = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        '''Start the persistent worker pool used by the following queries.'''
+        if self._pool is None:
+            self._pool = _KDTreePool(self.shmem_data, self.n, self.m,
+                                     self.leafsize, self._nprocs,
+                                     self.dtype, self.index_dtype)
+
+    def close(self):
+        '''Stop the worker pool and free its shared memory.'''
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def query(self, x, k=1, eps=0, p=2, distance_upper_bound=np.inf,
+              stats=None):
         '''
         Same as cKDTree.query except parallelized with multiple
         processes and shared memory.        
+        Extra keyword arguments:
+        stats : SchedulerStats collecting the work done per process.
         '''
+        if self._pool is not None:
+            return self._pool.query(x, k, eps, p, distance_upper_bound,
+                                    chunk=self._chunk, stats=stats)
 
         # allocate shared memory for x and result
         nx = x.shape[0]
-        shmem_x = mp.RawArray(ctypes.c_double, nx * self.m)
-        shmem_d = mp.RawArray(ctypes.c_double, nx * k)
-        shmem_i = mp.RawArray(ctypes.c_int, nx * k)
+        shmem_x = shmem_empty(nx * self.m, self.dtype)
+        shmem_d = shmem_empty(nx * k, self.dtype)
+        shmem_i = shmem_empty(nx * k, self.index_dtype)
 
         # view shared memory as ndarrays
         _x = shmem_as_ndarray(shmem_x).reshape((nx, self.m))
@@ -97,7 +155,7 @@ class cKDTree_MP(object):
 
         # set up a scheduler to load balance the query
         scheduler = Scheduler(nx, self._nprocs, chunk=self._chunk,
-                              schedule=self._schedule)
+                              schedule=self._schedule, stats=stats)
 
         # query with multiple processes
         query_args = [scheduler, self.shmem_data, self.n, self.m,
@@ -109,6 +167,114 @@ class cKDTree_MP(object):
         return _d.copy(), _i.copy()
 
 
+class _KDTreePool(object):
+    """Worker processes that each keep a kd-tree of the same shared data."""
+
+    def __init__(self, shmem_data, ndata, ndim, leafsize, nprocs,
+                 dtype=np.float64, index_dtype=np.int32):
+        if shared_memory is None:
+            raise ImportError("A persistent kd-tree pool requires "
+                              "'multiprocessing.shared_memory' (Python 3.8+)")
+        self._ndim = ndim
+        self._dtype = np.dtype(dtype)
+        self._index_dtype = np.dtype(index_dtype)
+        self._nprocs = nprocs
+        self._buffers = {}
+        self._tasks = mp.Queue()
+        self._done = mp.Queue()
+        self._workers = [mp.Process(target=_pool_worker,
+                                    args=(shmem_data, ndata, ndim, leafsize,
+                                          self._tasks, self._done, rank),
+                                    daemon=True)
+                         for rank in range(nprocs)]
+        for worker in self._workers:
+            worker.start()
+        # Stop the workers even if the pool isn't closed explicitly
+        self._finalizer = weakref.finalize(self, _close_pool, self._workers,
+                                           self._tasks, self._buffers)
+
+    def _get_buffer(self, name, shape, dtype):
+        """Get a shared memory array, reusing the block of the last query if it is large enough."""
+        nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        block = self._buffers.get(name)
+        if block is None or block.size < nbytes:
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._buffers[name] = block
+        return block.name, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def query(self, x, k, eps, p, distance_upper_bound, chunk=None, stats=None):
+        if stats is not None and stats.nprocs != self._nprocs:
+            raise ValueError('stats are collected for %d workers, not %d' %
+                             (stats.nprocs, self._nprocs))
+        nx = x.shape[0]
+        x_name, _x = self._get_buffer('x', (nx, self._ndim), self._dtype)
+        d_name, _d = self._get_buffer('d', (nx, k), self._dtype)
+        i_name, _i = self._get_buffer('i', (nx, k), self._index_dtype)
+        _x[:] = x
+        self._check_workers()
+
+        # The queue hands out the chunks to the idle workers
+        if not chunk:
+            chunk = nx // (10 * self._nprocs)
+        chunk = max(chunk, 1)
+        slices = [(start, min(start + chunk, nx)) for start in range(0, nx, chunk)]
+        for start, stop in slices:
+            self._tasks.put((x_name, d_name, i_name, self._dtype.str,
+                             self._index_dtype.str, nx, k, eps, p,
+                             distance_upper_bound, start, stop))
+        # Chunks, items and query time of each worker
+        work = np.zeros((self._nprocs, 3))
+        errors = []
+        for _ in slices:
+            rank, items, wall_time, error = self._get_done()
+            work[rank] += (1, items, wall_time)
+            if error is not None:
+                errors.append(error)
+        if stats is not None:
+            for rank, (chunks, items, wall_time) in enumerate(work):
+                stats.add(rank, int(chunks), int(items), wall_time)
+        if errors:
+            raise RuntimeError('%d errors in worker processes. Last one reported:\n%s' %
+                               (len(errors), errors[-1]))
+        if k == 1:
+            return _d[:, 0].copy(), _i[:, 0].copy()
+        return _d.copy(), _i.copy()
+
+    def _check_workers(self):
+        """Raise if a worker process has exited, its chunks would never be done."""
+        dead = [worker for worker in self._workers if not worker.is_alive()]
+        if dead:
+            raise RuntimeError('%d worker processes of the kd-tree pool exited, '
+                               'the last one with exit code %s' %
+                               (len(dead), dead[-1].exitcode))
+
+    def _get_done(self):
+        """Wait for the next finished chunk while the workers are alive."""
+        while True:
+            try:
+                return self._done.get(timeout=POOL_POLL_INTERVAL)
+            except queue.Empty:
+                self._check_workers()
+
+    def close(self):
+        self._finalizer()
+
+
+def _close_pool(workers, tasks, buffers):
+    """Stop the workers of a pool and free its shared memory."""
+    for _ in workers:
+        tasks.put(None)
+    for worker in workers:
+        worker.join()
+    for block in buffers.values():
+        block.close()
+        block.unlink()
+    buffers.clear()
+
+
 class BaseProj(pyproj.Proj):
     """Helper class for easier backwards compatibility."""
 
@@ -145,7 +311,8 @@ class Proj_MP(BaseProj):
         super(Proj_MP, self).__init__(*args, **kwargs)
 
     def __call__(self, data1, data2, inverse=False, radians=False,
-                 errcheck=False, nprocs=2, chunk=None, schedule='guided'):
+                 errcheck=False, nprocs=2, chunk=None, schedule='guided',
+                 stats=None):
         if self.is_latlong():
             return data1, data2
 
@@ -169,7 +336,8 @@ class Proj_MP(BaseProj):
         _data2[:] = data2.ravel()
 
         # set up a scheduler to load balance the query
-        scheduler = Scheduler(n, nprocs, chunk=chunk, schedule=schedule)
+        scheduler = Scheduler(n, nprocs, chunk=chunk, schedule=schedule,
+                              stats=stats)
 
         # Projection with multiple processes
         proj_call_args = [scheduler, shmem_data1, shmem_data2, shmem_res1,
@@ -190,21 +358,216 @@ class Cartesian(object):
         if np.issubdtype(lons.dtype, np.integer):
             lons = lons.astype(np.float)
         coords = np.zeros((lons.size, 3), dtype=lons.dtype)
-        if ne:
-            deg2rad = np.pi / 180  # noqa: F841
-            coords[:, 0] = ne.evaluate("R*cos(lats*deg2rad)*cos(lons*deg2rad)")
-            coords[:, 1] = ne.evaluate("R*cos(lats*deg2rad)*sin(lons*deg2rad)")
-            coords[:, 2] = ne.evaluate("R*sin(lats*deg2rad)")
-        else:
-            coords[:, 0] = R * np.cos(np.deg2rad(lats)) * np.cos(np.deg2rad(lons))
-            coords[:, 1] = R * np.cos(np.deg2rad(lats)) * np.sin(np.deg2rad(lons))
-            coords[:, 2] = R * np.sin(np.deg2rad(lats))
+        _transform_lonlats(lons, lats, coords)
         return coords
 
 
+def _transform_lonlats(lons, lats, coords):
+    """Write the cartesian coordinates of longitudes and latitudes to `coords`."""
+    if ne:
+        deg2rad = np.pi / 180  # noqa: F841
+        coords[:, 0] = ne.evaluate("R*cos(lats*deg2rad)*cos(lons*deg2rad)")
+        coords[:, 1] = ne.evaluate("R*cos(lats*deg2rad)*sin(lons*deg2rad)")
+        coords[:, 2] = ne.evaluate("R*sin(lats*deg2rad)")
+    else:
+        coords[:, 0] = R * np.cos(np.deg2rad(lats)) * np.cos(np.deg2rad(lons))
+        coords[:, 1] = R * np.cos(np.deg2rad(lats)) * np.sin(np.deg2rad(lons))
+        coords[:, 2] = R * np.sin(np.deg2rad(lats))
+
+
 Cartesian_MP = Cartesian
 
 
+class cKDTree_Threads(object):
+    """Kd-tree whose queries are split across a pool of threads.
+
+    The tree is built once with pykdtree, which releases the GIL while
+    querying, so the threads share the tree and write their part of the
+    result directly into the output arrays. Like `cKDTree_MP`, the pool can
+    be kept alive between queries with `start` and `close`, or by using the
+    tree as a context manager.
+    """
+
+    def __init__(self, data, leafsize=10, nprocs=2, chunk=None,
+                 schedule='guided'):
+        from pykdtree.kdtree import KDTree
+        self.n, self.m = data.shape
+        self.leafsize = leafsize
+        self._kdtree = KDTree(data, leafsize=leafsize)
+        self.data = self._kdtree.data
+        self._nprocs = nprocs
+        self._chunk = chunk
+        self._executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """Start the thread pool used by the following queries."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self._nprocs)
+
+    def close(self):
+        """Stop the thread pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def query(self, x, k=1, eps=0, p=2, distance_upper_bound=np.inf):
+        """Same as pykdtree's KDTree.query except split across threads."""
+        if p != 2:
+            raise ValueError("Only euclidean distances (p=2) are supported by the threads backend")
+        x = np.ascontiguousarray(x, dtype=self.data.dtype)
+        slices = _split(x.shape[0], self._nprocs, self._chunk)
+        if distance_upper_bound is None or not np.isfinite(distance_upper_bound):
+            distance_upper_bound = None
+
+        def query_slice(s):
+            return self._kdtree.query(x[s], k=k, eps=eps,
+                                      distance_upper_bound=distance_upper_bound)
+
+        # The first slice gives the data types of the results
+        d, i = query_slice(slices[0])
+        _d = np.empty((x.shape[0],) + d.shape[1:], dtype=d.dtype)
+        _i = np.empty((x.shape[0],) + i.shape[1:], dtype=i.dtype)
+        _d[slices[0]], _i[slices[0]] = d, i
+
+        def query_into(s):
+            _d[s], _i[s] = query_slice(s)
+
+        _run_threads(query_into, slices[1:], self._nprocs, self._executor)
+        return _d, _i
+
+
+class Proj_Threads(BaseProj):
+    """Projection whose transforms are split across a pool of threads.
+
+    pyproj releases the GIL while transforming, but its projection objects
+    can't be shared between threads, so each thread initialises its own.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._args = args
+        self._kwargs = kwargs
+        self._local = threading.local()
+        super(Proj_Threads, self).__init__(*args, **kwargs)
+
+    def _get_thread_proj(self):
+        if not hasattr(self._local, 'proj'):
+            self._local.proj = pyproj.Proj(*self._args, **self._kwargs)
+        return self._local.proj
+
+    def __call__(self, data1, data2, inverse=False, radians=False,
+                 errcheck=False, nprocs=2, chunk=None, schedule='guided'):
+        if self.is_latlong():
+            return data1, data2
+
+        grid_shape = np.shape(data1)
+        _data1 = np.ravel(data1)
+        _data2 = np.ravel(data2)
+        _res1 = np.empty(_data1.size, dtype=np.float64)
+        _res2 = np.empty(_data1.size, dtype=np.float64)
+
+        def transform_into(s):
+            proj = self._get_thread_proj()
+            _res1[s], _res2[s] = proj(_data1[s], _data2[s], inverse=inverse,
+                                      radians=radians, errcheck=errcheck)
+
+        _run_threads(transform_into, _split(_data1.size, nprocs, chunk), nprocs)
+        return _res1.reshape(grid_shape), _res2.reshape(grid_shape)
+
+
+class Cartesian_Threads(Cartesian):
+    """Cartesian transform split across a pool of threads."""
+
+    def __init__(self, nprocs=2, chunk=None):
+        self._nprocs = nprocs
+        self._chunk = chunk
+
+    def transform_lonlats(self, lons, lats):
+        """Transform longitudes and latitues to cartesian coordinates."""
+        if np.issubdtype(lons.dtype, np.integer):
+            lons = lons.astype(np.float64)
+        coords = np.zeros((lons.size, 3), dtype=lons.dtype)
+
+        def transform_into(s):
+            _transform_lonlats(lons[s], lats[s], coords[s])
+
+        _run_threads(transform_into, _split(lons.size, self._nprocs, self._chunk),
+                     self._nprocs)
+        return coords
+
+
+def get_parallel_backend(parallel=None):
+    """Get the backend used when running with more than one process.
+
+    Args:
+        parallel (str): 'threads', 'processes' or 'auto'. Defaults to
+            `pyresample.PARALLEL`, which can be set with the
+            ``PYTROLL_PARALLEL`` environment variable.
+
+    Returns:
+        'threads' or 'processes'. With 'auto', threads are used when pyproj
+        releases the GIL (pyproj 2+) and pykdtree is available.
+
+    """
+    if parallel is None:
+        from pyresample import PARALLEL as parallel
+    if parallel not in ('auto', 'threads', 'processes'):
+        raise ValueError("Unknown parallel backend '{}', use 'threads', "
+                         "'processes' or 'auto'".format(parallel))
+    if parallel == 'auto':
+        try:
+            import pykdtree.kdtree  # noqa: F401
+        except ImportError:
+            return 'processes'
+        return 'threads' if is_pyproj2() else 'processes'
+    return parallel
+
+
+def get_kdtree_class(parallel=None):
+    """Get the parallel kd-tree class of the `parallel` backend."""
+    if get_parallel_backend(parallel) == 'threads':
+        return cKDTree_Threads
+    return cKDTree_MP
+
+
+def get_proj_class(parallel=None):
+    """Get the parallel projection class of the `parallel` backend."""
+    if get_parallel_backend(parallel) == 'threads':
+        return Proj_Threads
+    return Proj_MP
+
+
+def get_cartesian_class(parallel=None):
+    """Get the parallel cartesian transform class of the `parallel` backend."""
+    if get_parallel_backend(parallel) == 'threads':
+        return Cartesian_Threads
+    return Cartesian_MP
+
+
+def _split(n, nprocs, chunk=None):
+    """Split `n` items into slices, ten per thread unless `chunk` is given."""
+    if not chunk:
+        chunk = n // (10 * nprocs)
+    chunk = max(chunk, 1)
+    return [slice(start, min(start + chunk, n)) for start in range(0, max(n, 1), chunk)]
+
+
+def _run_threads(func, slices, nprocs, executor=None):
+    """Call `func` on each of the `slices` in a pool of threads."""
+    if executor is None:
+        with ThreadPoolExecutor(nprocs) as executor:
+            return _run_threads(func, slices, nprocs, executor)
+    for future in [executor.submit(func, s) for s in slices]:
+        # Raises the exceptions of the threads
+        future.result()
+
+
 def _run_jobs(target, args, nprocs):
     """Run process pool
     """
@@ -266,6 +629,74 @@ def _parallel_query(scheduler,  # scheduler for load balancing
         warn_msg.value = str(e).encode()
 
 
+def _get_coords_dtype(dtype):
+    """Get the shared memory dtype of coordinates, float32 or float64."""
+    if dtype == np.float32:
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def _get_index_dtype(ndata):
+    """Get the smallest index dtype that holds `ndata`, the missing neighbour index."""
+    if ndata <= np.iinfo(np.int32).max:
+        return np.dtype(np.int32)
+    return np.dtype(np.int64)
+
+
+def _attach_shared_memory(name):
+    """Attach to a shared memory block that is owned by the parent process."""
+    block = shared_memory.SharedMemory(name=name)
+    # Attaching registers the block with the resource tracker, which would
+    # then unlink it again or warn about a leak when the worker exits
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(block._name, 'shared_memory')
+    except (ImportError, AttributeError):
+        pass
+    return block
+
+
+def _pool_worker(data, ndata, ndim, leafsize, tasks, done, rank):
+    """Build the kd-tree once and answer queries until None is received.
+
+    Every chunk is reported with the `rank` of the worker, its number of
+    items, the time spent on it and an error message or None.
+    """
+    import scipy.spatial as sp
+    kdtree = sp.cKDTree(shmem_as_ndarray(data).reshape((ndata, ndim)),
+                        leafsize=leafsize)
+    # Attached shared memory blocks of the x, d and i arrays
+    blocks = {}
+
+    def get_array(key, name, shape, dtype):
+        if key not in blocks or blocks[key].name != name:
+            if key in blocks:
+                blocks[key].close()
+            blocks[key] = _attach_shared_memory(name)
+        return np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+
+    def run(x_name, d_name, i_name, dtype, index_dtype, nx, k, eps, p, dub,
+            start, stop):
+        _x = get_array('x', x_name, (nx, ndim), dtype)
+        _d = get_array('d', d_name, (nx, k), dtype)
+        _i = get_array('i', i_name, (nx, k), index_dtype)
+        d, i = kdtree.query(_x[start:stop], k=k, eps=eps, p=p,
+                            distance_upper_bound=dub)
+        _d[start:stop] = d.reshape((stop - start, k))
+        _i[start:stop] = i.reshape((stop - start, k))
+
+    for task in iter(tasks.get, None):
+        t_start = time.time()
+        items = task[-1] - task[-2]
+        try:
+            run(*task)
+            done.put((rank, items, time.time() - t_start, None))
+        except Exception as e:
+            done.put((rank, items, time.time() - t_start, str(e)))
+    for block in blocks.values():
+        block.close()
+
+
 def _parallel_proj(scheduler, data1, data2, res1, res2, proj_args, proj_kwargs,
                    inverse, radians, errcheck, ierr, warn_msg):
     try:
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020
+
+# Author(s):
+
+#   Pyresample developers
+
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Weighted averaging of kd-tree neighbours."""
+
+cimport cython
+cimport numpy as np
+
+from libc.math cimport NAN, sqrt
+
+# Plain C types, as Cython 0.29 can't declare const memoryviews of fused
+# numpy typedefs
+ctypedef fused data_type:
+    float
+    double
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def weighted_sum(const data_type[:, :] data,
+                 const Py_ssize_t[:, :] index_array,
+                 const double[:, :, :] weights,
+                 double[:, :] result,
+                 double fill_value,
+                 double[:, :] stddev=None,
+                 double[:] count=None,
+                 const np.uint8_t[:, :] mask=None,
+                 np.uint8_t[:, :] result_mask=None):
+    """Compute the weighted average of the neighbours of each output pixel.
+
+    Args:
+        data: Reduced source data of shape (input pixels, channels)
+        index_array: Index of the neighbours in `data` for each output pixel,
+            shape (output pixels, neighbours). Negative values mark missing
+            neighbours.
+        weights: Weights of the neighbours for each channel, shape
+            (channels, output pixels, neighbours)
+        result: Output array of shape (output pixels, channels). Pixels
+            without positive weights are set to `fill_value`.
+        fill_value: Value of pixels without positive weights
+        stddev: Optional output array for the weighted standard deviation,
+            shape (output pixels, channels). Pixels with less than two
+            neighbours are set to NaN.
+        count: Optional output array for the number of neighbours of each
+            output pixel. Required when `stddev` is given.
+        mask: Optional mask of `data`, nonzero for masked values
+        result_mask: Output mask of shape (output pixels, channels).
+            Required when `mask` is given. Pixels are masked when a masked
+            neighbour has a nonzero weight, and pixels without positive
+            weights when `fill_value` is nonzero.
+
+    """
+    cdef Py_ssize_t num_out = index_array.shape[0]
+    cdef Py_ssize_t neighbours = index_array.shape[1]
+    cdef Py_ssize_t channels = data.shape[1]
+    cdef bint with_uncert = stddev is not None
+    cdef bint with_mask = mask is not None
+    cdef Py_ssize_t i, j, n, idx
+    cdef int num_valid
+    cdef double value, weight, data_sum, norm, norm_sqr, mean, sqr_sum
+    cdef double new_norm, diff, step, mask_sum
+
+    with nogil:
+        for i in range(num_out):
+            num_valid = 0
+            for n in range(neighbours):
+                if index_array[i, n] >= 0:
+                    num_valid += 1
+            if with_uncert:
+                count[i] = num_valid
+            for j in range(channels):
+                data_sum = 0
+                norm = 0
+                # Running weighted mean and sum of squared deviations, updated
+                # for each neighbour (West, 1979)
+                norm_sqr = 0
+                mean = 0
+                sqr_sum = 0
+                mask_sum = 0
+                for n in range(neighbours):
+                    idx = index_array[i, n]
+                    if idx < 0:
+                        continue
+                    weight = weights[j, i, n]
+                    value = data[idx, j]
+                    data_sum = data_sum + weight * value
+                    if with_mask and mask[idx, j]:
+                        mask_sum = mask_sum + weight
+                    if with_uncert:
+                        new_norm = norm + weight
+                        norm_sqr = norm_sqr + weight * weight
+                        if new_norm != 0:
+                            diff = value - mean
+                            step = diff * weight / new_norm
+                            mean = mean + step
+                            sqr_sum = sqr_sum + norm * diff * step
+                    norm = norm + weight
+                if norm > 0:
+                    result[i, j] = data_sum / norm
+                    if with_mask:
+                        result_mask[i, j] = mask_sum != 0
+                else:
+                    result[i, j] = fill_value
+                    if with_mask:
+                        result_mask[i, j] = fill_value != 0
+                if not with_uncert:
+                    continue
+                if num_valid < 2:
+                    stddev[i, j] = NAN
+                else:
+                    stddev[i, j] = sqrt((norm / (norm * norm - norm_sqr)) * sqr_sum)
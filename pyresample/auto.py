@@ -0,0 +1,295 @@
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020  Pyresample developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Resampling with a method selected from estimates of its cost.
+
+The time and memory of each applicable method are estimated from the
+number of source and target pixels, using the per pixel constants in
+`COSTS`. Methods that would alias or leave gaps at the resolution ratio
+of the geometries, or that exceed the budget, are rejected, and the
+fastest of the remaining ones is used::
+
+    >>> from pyresample import resample
+    >>> result = resample(data, swath_def, area_def, budget={'memory': '4GiB'})
+
+"""
+
+from collections import OrderedDict, namedtuple
+from importlib import import_module
+from logging import getLogger
+
+import numpy as np
+
+from pyresample import CHUNK_SIZE
+from pyresample._chunking import get_source_overlap
+from pyresample.geometry import AreaDefinition, SwathDefinition
+
+logger = getLogger(__name__)
+
+# Seconds and bytes per source and target pixel of the methods selected
+# automatically: (time_src, time_dst, memory_src, memory_dst). The times
+# were measured on a single core with dask's synchronous scheduler for
+# swath sources of 0.25 and 2.25 million pixels, the memory is derived from
+# the arrays each method keeps per pixel. EWA is only used when requested,
+# until its costs are measured.
+COSTS = OrderedDict([
+    ('nearest', (2.8e-7, 8.0e-7, 72, 60)),
+    ('bilinear', (3.9e-7, 1.2e-5, 72, 1000)),
+    ('bucket', (7.0e-7, 2.3e-7, 48, 16)),
+    ('gradient', (2.0e-7, 4.6e-7, 48, 40)),
+])
+# Modules, some of them compiled or with optional dependencies, that each
+# method needs
+MODULES = {'nearest': 'pyresample.kd_tree',
+           'bilinear': 'pyresample.bilinear.xarr',
+           'bucket': 'pyresample.bucket',
+           'ewa': 'pyresample.ewa',
+           'gradient': 'pyresample.gradient'}
+# Source pixels per target pixel from which point sampling methods alias
+DOWNSAMPLING_OVERLAP = 4.
+
+Estimate = namedtuple('Estimate', ['time', 'memory', 'rejection'])
+
+
+class MethodSelection(object):
+    """The estimated cost of each method and the method selected."""
+
+    def __init__(self, method, estimates, overlap):
+        """Init the selection.
+
+        Args:
+            method (str): The selected method
+            estimates (OrderedDict): :class:`Estimate` of each method, whose
+                `rejection` is the reason the method can't be used or None
+            overlap (float): Estimated source pixels per target pixel
+
+        """
+        self.method = method
+        self.estimates = estimates
+        self.overlap = overlap
+
+    def __str__(self):
+        """Summarize the estimates."""
+        lines = ["%.2f source pixels per target pixel, selected %s" %
+                 (self.overlap, self.method)]
+        for method, estimate in self.estimates.items():
+            line = "  %-8s %8.2f s %10.1f MiB" % (method, estimate.time,
+                                                  estimate.memory / 1024. ** 2)
+            if estimate.rejection is not None:
+                line += " (%s)" % estimate.rejection
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def _get_rejection(method, data, source_geo_def, target_geo_def, overlap, quality):
+    """Get the reason `method` can't or shouldn't be used, None if it can."""
+    if method != 'nearest' and not isinstance(target_geo_def, AreaDefinition):
+        return "target is not an area"
+    if method == 'ewa' and not isinstance(source_geo_def, SwathDefinition):
+        return "source is not a swath"
+    if method in ('bucket', 'ewa') and data.ndim != 2:
+        return "data is not 2D"
+    try:
+        import_module(MODULES[method])
+    except ImportError:
+        return "not available"
+    if quality == 'fast':
+        return None
+    if method in ('nearest', 'bilinear', 'gradient') and overlap >= DOWNSAMPLING_OVERLAP:
+        return "aliases when downsampling"
+    if method == 'bucket' and overlap < 1:
+        return "leaves gaps when upsampling"
+    return None
+
+
+def _get_estimate(method, data, source_geo_def, target_geo_def):
+    """Estimate the time and memory `method` needs."""
+    time_src, time_dst, memory_src, memory_dst = COSTS[method]
+    src_size = source_geo_def.size
+    dst_size = target_geo_def.size
+    # The data and the result, in addition to the arrays of the method
+    bands = max(data.size // max(src_size, 1), 1)
+    data_bytes = bands * data.dtype.itemsize * (src_size + dst_size)
+    return (time_src * src_size + time_dst * dst_size,
+            memory_src * src_size + memory_dst * dst_size + data_bytes)
+
+
+def select_method(data, source_geo_def, target_geo_def, budget=None, quality='default'):
+    """Select the fastest resampling method that is suitable and within budget.
+
+    Args:
+        data (xarray.DataArray): Data to resample
+        source_geo_def: Geometry definition of the source
+        target_geo_def: Geometry definition of the target
+        budget (dict): Maximum ``'time'`` in seconds and ``'memory'`` in
+            bytes or as a string like ``'4GiB'``
+        quality (str): With ``'default'``, methods that alias when
+            downsampling or leave gaps when upsampling are rejected. With
+            ``'fast'`` only the applicability of the methods is checked.
+
+    Returns:
+        :class:`MethodSelection`
+
+    Raises:
+        ValueError: If no method is suitable and within budget
+
+    """
+    if quality not in ('default', 'fast'):
+        raise ValueError("Unknown quality '%s'" % quality)
+    budget = dict(budget or {})
+    unknown = set(budget) - {'time', 'memory'}
+    if unknown:
+        raise ValueError("Unknown budget keys: %s" % ", ".join(sorted(unknown)))
+    if isinstance(budget.get('memory'), str):
+        from dask.utils import parse_bytes
+        budget['memory'] = parse_bytes(budget['memory'])
+
+    overlap = get_source_overlap(source_geo_def, target_geo_def)
+    estimates = OrderedDict()
+    for method in COSTS:
+        time, memory = _get_estimate(method, data, source_geo_def, target_geo_def)
+        rejection = _get_rejection(method, data, source_geo_def, target_geo_def,
+                                   overlap, quality)
+        if rejection is None and time > budget.get('time', np.inf):
+            rejection = "over time budget"
+        if rejection is None and memory > budget.get('memory', np.inf):
+            rejection = "over memory budget"
+        estimates[method] = Estimate(time, memory, rejection)
+
+    candidates = [method for method, estimate in estimates.items()
+                  if estimate.rejection is None]
+    if not candidates:
+        raise ValueError("No resampling method is suitable:\n%s" %
+                         MethodSelection(None, estimates, overlap))
+    method = min(candidates, key=lambda method: estimates[method].time)
+    return MethodSelection(method, estimates, overlap)
+
+
+def _get_radius_of_influence(source_geo_def, target_geo_def):
+    """Get a radius covering the neighbours of the bilinear interpolation."""
+    try:
+        resolution = max(source_geo_def.geocentric_resolution(),
+                         target_geo_def.geocentric_resolution())
+    except (RuntimeError, AttributeError):
+        return 50000
+    return 3 * resolution
+
+
+def _resample_nearest(data, source_geo_def, target_geo_def, fill_value,
+                      radius_of_influence):
+    from pyresample.kd_tree import XArrayResamplerNN
+    resampler = XArrayResamplerNN(source_geo_def, target_geo_def,
+                                  radius_of_influence=radius_of_influence)
+    resampler.get_neighbour_info()
+    return resampler.get_sample_from_neighbour_info(data, fill_value=fill_value)
+
+
+def _resample_bilinear(data, source_geo_def, target_geo_def, fill_value,
+                       radius_of_influence):
+    from pyresample.bilinear import XArrayBilinearResampler
+    if radius_of_influence is None:
+        radius_of_influence = _get_radius_of_influence(source_geo_def, target_geo_def)
+    resampler = XArrayBilinearResampler(source_geo_def, target_geo_def,
+                                        radius_of_influence)
+    return resampler.resample(data, fill_value=fill_value)
+
+
+def _resample_bucket(data, source_geo_def, target_geo_def, fill_value,
+                     radius_of_influence):
+    import xarray as xr
+
+    from pyresample.bucket import BucketResampler
+    lons, lats = source_geo_def.get_lonlats(chunks=CHUNK_SIZE)
+    resampler = BucketResampler(target_geo_def, lons, lats)
+    result = resampler.get_average(data.data, fill_value=fill_value)
+    return xr.DataArray(result, dims=('y', 'x'), attrs=data.attrs.copy())
+
+
+def _ewa_block(data, source_geo_def, target_geo_def, fill_value):
+    from pyresample.ewa import fornav, ll2cr
+    _, cols, rows = ll2cr(source_geo_def, target_geo_def)
+    _, result = fornav(cols, rows, target_geo_def, np.asarray(data, dtype=np.float64),
+                       fill=fill_value)
+    return result
+
+
+def _resample_ewa(data, source_geo_def, target_geo_def, fill_value,
+                  radius_of_influence):
+    import dask
+    import dask.array as da
+    import xarray as xr
+
+    # ll2cr and fornav work on whole numpy arrays, so the swath is
+    # resampled in a single task
+    result = da.from_delayed(
+        dask.delayed(_ewa_block)(data.data, source_geo_def, target_geo_def, fill_value),
+        target_geo_def.shape, np.float64)
+    return xr.DataArray(result, dims=('y', 'x'), attrs=data.attrs.copy())
+
+
+def _resample_gradient(data, source_geo_def, target_geo_def, fill_value,
+                       radius_of_influence):
+    from pyresample.gradient import GradientSearchResampler
+    resampler = GradientSearchResampler(source_geo_def, target_geo_def)
+    return resampler.resample(data, fill_value=fill_value)
+
+
+RESAMPLERS = {'nearest': _resample_nearest,
+              'bilinear': _resample_bilinear,
+              'bucket': _resample_bucket,
+              'ewa': _resample_ewa,
+              'gradient': _resample_gradient}
+
+
+def resample(data, source_geo_def, target_geo_def, method='auto', budget=None,
+             quality='default', fill_value=np.nan, radius_of_influence=None):
+    """Resample `data` with the given or the fastest suitable method.
+
+    With ``method='auto'`` the method is selected by :func:`select_method`
+    and the estimates behind the selection are logged. EWA is only used
+    when requested, and resamples the whole swath in a single dask task.
+
+    Args:
+        data (xarray.DataArray): Data to resample, with the geolocation
+            dimensions last
+        source_geo_def: Geometry definition of the source
+        target_geo_def: Geometry definition of the target
+        method (str): ``'auto'`` or one of ``'nearest'``, ``'bilinear'``,
+            ``'bucket'``, ``'ewa'`` and ``'gradient'``
+        budget (dict): Maximum ``'time'`` and ``'memory'`` of an automatic
+            selection, see :func:`select_method`
+        quality (str): Quality constraints of an automatic selection, see
+            :func:`select_method`
+        fill_value (float): Value of the target pixels without data
+        radius_of_influence (float): Cut off distance in meters of the
+            nearest neighbour and bilinear methods. Estimated from the
+            resolutions of the geometries if not given.
+
+    Returns:
+        xarray.DataArray: The resampled data
+
+    """
+    if method == 'auto':
+        selection = select_method(data, source_geo_def, target_geo_def,
+                                  budget=budget, quality=quality)
+        logger.info("Resampling method selection: %s", selection)
+        method = selection.method
+    elif method not in RESAMPLERS:
+        raise ValueError("Unknown resampling method '%s'" % method)
+    if data.chunks is None:
+        data = data.chunk(CHUNK_SIZE)
+    return RESAMPLERS[method](data, source_geo_def, target_geo_def, fill_value,
+                              radius_of_influence)
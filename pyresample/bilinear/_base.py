@@ -37,6 +37,7 @@ from pykdtree.kdtree import KDTree
 
 from pyresample._spatial_mp import Proj
 from pyresample import data_reduce, geometry
+from pyresample.kd_tree import _get_coordinate_dtype
 
 
 class BilinearBase(object):
@@ -48,7 +49,8 @@ class BilinearBase(object):
                  radius_of_influence,
                  neighbours=32,
                  epsilon=0,
-                 reduce_data=True):
+                 reduce_data=True,
+                 precision='double'):
         """
         Initialize resampler.
 
@@ -68,6 +70,11 @@ class BilinearBase(object):
         reduce_data : bool, optional
             Perform initial coarse reduction of source dataset in order
             to reduce execution time
+        precision : {'double', 'single'}, optional
+            'single' builds and queries the kd-tree with float32
+            coordinates and stores the look-up tables as float32 and int32
+            arrays. The fractional distances are still solved in double
+            precision before being stored.
 
         """
         self.bilinear_t = None
@@ -88,6 +95,8 @@ class BilinearBase(object):
         self._source_geo_def = source_geo_def
         self._target_geo_def = target_geo_def
         self._radius_of_influence = radius_of_influence
+        self._precision = precision
+        self._dtype = _get_coordinate_dtype(precision)
         self._resample_kdtree = None
         self._target_lons = None
         self._target_lats = None
@@ -110,12 +119,26 @@ class BilinearBase(object):
             return
 
         self._target_lons, self._target_lats = self._target_geo_def.get_lonlats()
+        if self._dtype is not None:
+            # pykdtree requires query points have same data type as kdtree.
+            self._target_lons = self._target_lons.astype(self._dtype)
+            self._target_lats = self._target_lats.astype(self._dtype)
         self._get_index_array()
 
         # Calculate vertical and horizontal fractional distances t and s
         self._get_fractional_distances()
         self._get_target_proj_vectors()
         self._get_slices()
+        if self._precision == 'single':
+            self._set_single_precision()
+
+    def _set_single_precision(self):
+        """Store the look-up tables as float32 and int32 arrays."""
+        self.bilinear_t = self.bilinear_t.astype(np.float32)
+        self.bilinear_s = self.bilinear_s.astype(np.float32)
+        self.slices_x = self.slices_x.astype(np.int32)
+        self.slices_y = self.slices_y.astype(np.int32)
+        self._index_array = self._index_array.astype(np.int32)
 
     def _get_valid_input_index_and_kdtree(self, kdtree_class=KDTree, nprocs=1):
         valid_input_index, resample_kdtree = self._create_resample_kdtree(
@@ -215,7 +238,7 @@ class BilinearBase(object):
                                    self._radius_of_influence)
         input_coords = lonlat2xyz(source_lons, source_lats)
         valid_input_index = np.ravel(valid_input_index)
-        input_coords = input_coords[valid_input_index, :].astype(np.float)
+        input_coords = input_coords[valid_input_index, :].astype(self._dtype or np.float64)
 
         return valid_input_index, input_coords
 
@@ -636,7 +659,6 @@ def _query_no_distance(target_lons, target_lats,
     voir = np.ravel(valid_output_index)
     target_lons_valid = np.ravel(target_lons)[voir]
     target_lats_valid = np.ravel(target_lats)[voir]
-
     _, index_array = kdtree.query(
         lonlat2xyz(target_lons_valid, target_lats_valid),
         k=neighbours,
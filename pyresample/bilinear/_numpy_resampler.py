@@ -30,7 +30,10 @@ http://www.ahinson.com/algorithms_general/Sections/InterpolationRegression/Inter
 
 """
 
+import os
+import shutil
 import warnings
+from logging import getLogger
 
 import numpy as np
 from pykdtree.kdtree import KDTree
@@ -42,6 +45,19 @@ from ._base import (
     get_slicer
 )
 
+logger = getLogger(__name__)
+
+# Look-up tables used by get_sample_from_bil_info, stored under the
+# attribute name without the leading underscore
+CACHE_INDICES = ['bilinear_s',
+                 'bilinear_t',
+                 'slices_x',
+                 'slices_y',
+                 'mask_slices',
+                 'out_coords_x',
+                 'out_coords_y',
+                 '_valid_input_index']
+
 
 def resample_bilinear(data, source_geo_def, target_area_def, radius=50e3,
                       neighbours=32, nprocs=1, fill_value=0,
@@ -83,7 +99,8 @@ def resample_bilinear(data, source_geo_def, target_area_def, radius=50e3,
 
     """
     if nprocs > 1:
-        from pyresample._spatial_mp import cKDTree_MP as kdtree_class
+        from pyresample._spatial_mp import get_kdtree_class
+        kdtree_class = get_kdtree_class()
     else:
         kdtree_class = KDTree
 
@@ -208,7 +225,8 @@ def get_bil_info(source_geo_def, target_area_def, radius=50e3, neighbours=32,
 
     """
     if nprocs > 1:
-        from pyresample._spatial_mp import cKDTree_MP as kdtree_class
+        from pyresample._spatial_mp import get_kdtree_class
+        kdtree_class = get_kdtree_class()
     else:
         kdtree_class = KDTree
 
@@ -240,15 +258,111 @@ def get_bil_info(source_geo_def, target_area_def, radius=50e3, neighbours=32,
 class NumpyBilinearResampler(BilinearBase):
     """Bilinear interpolation using Numpy."""
 
-    def resample(self, data, fill_value=0, nprocs=1):
-        """Resample the given data."""
+    def resample(self, data, fill_value=0, nprocs=1, cache_dir=None):
+        """Resample the given data.
+
+        The look-up tables are reused from `cache_dir` if given, see
+        :meth:`get_bil_info`.
+
+        """
         if nprocs > 1:
-            from pyresample._spatial_mp import cKDTree_MP as kdtree_class
+            from pyresample._spatial_mp import get_kdtree_class
+            kdtree_class = get_kdtree_class()
         else:
             kdtree_class = KDTree
-        self.get_bil_info(kdtree_class=kdtree_class, nprocs=nprocs)
+        self.get_bil_info(kdtree_class=kdtree_class, nprocs=nprocs, cache_dir=cache_dir)
         return self.get_sample_from_bil_info(data, fill_value=fill_value, output_shape=None)
 
+    def get_bil_info(self, kdtree_class=KDTree, nprocs=1, cache_dir=None):
+        """Calculate bilinear neighbour info.
+
+        With `cache_dir`, the look-up tables are stored there in a directory
+        named after the hash of the geometries and parameters, see
+        :meth:`get_hash`. Existing look-up tables are loaded from there as
+        memory maps instead of being computed.
+
+        """
+        cache_filename = self._get_cache_filename(cache_dir)
+        if cache_filename is not None and os.path.isdir(cache_filename):
+            logger.debug("Loading bilinear look-up tables from %s", cache_filename)
+            self.load_resampling_info(cache_filename)
+            return
+        super(NumpyBilinearResampler, self).get_bil_info(kdtree_class=kdtree_class,
+                                                         nprocs=nprocs)
+        if cache_filename is not None:
+            self._save_cache(cache_filename)
+
+    def get_hash(self):
+        """Get a hash of the geometries and parameters of the look-up tables."""
+        from pyresample.resampler import hash_dict
+        the_hash = self._source_geo_def.update_hash()
+        self._target_geo_def.update_hash(the_hash)
+        hash_dict({'radius_of_influence': float(self._radius_of_influence),
+                   'neighbours': self._neighbours,
+                   'epsilon': self._epsilon,
+                   'reduce_data': self._reduce_data,
+                   'precision': self._precision}, the_hash)
+        return the_hash.hexdigest()
+
+    def _get_cache_filename(self, cache_dir):
+        """Get the directory of the cached look-up tables, or None if they can't be cached."""
+        if cache_dir is None:
+            return None
+        try:
+            return os.path.join(cache_dir, 'bil_lut-' + self.get_hash())
+        except AttributeError:
+            logger.debug("Geometry can't be hashed, look-up tables won't be cached")
+            return None
+
+    def _save_cache(self, filename):
+        """Save the look-up tables to the cache without exposing partial files."""
+        dirname, basename = os.path.split(filename)
+        tmp_filename = os.path.join(dirname, '.tmp-%d-%s' % (os.getpid(), basename))
+        self.save_resampling_info(tmp_filename)
+        try:
+            os.replace(tmp_filename, filename)
+        except OSError:
+            # Another process saved the same look-up tables first
+            shutil.rmtree(tmp_filename, ignore_errors=True)
+
+    def save_resampling_info(self, filename):
+        """Save the look-up tables computed by :meth:`get_bil_info`.
+
+        The arrays are written to an uncompressed numpy ``.npz`` file if
+        `filename` ends with ``.npz``, otherwise as ``.npy`` files in the
+        directory `filename`, which are loaded as memory maps.
+
+        """
+        if self.bilinear_s is None:
+            raise ValueError("No resampling info to save, call 'get_bil_info' first")
+        arrays = {name.lstrip('_'): getattr(self, name) for name in CACHE_INDICES
+                  if getattr(self, name) is not None}
+        if filename.endswith('.npz'):
+            np.savez(filename, **arrays)
+            return
+        os.makedirs(filename, exist_ok=True)
+        for name, arr in arrays.items():
+            np.save(os.path.join(filename, name + '.npy'), arr)
+
+    def load_resampling_info(self, filename):
+        """Load look-up tables saved by :meth:`save_resampling_info`.
+
+        The arrays of a directory are read-only memory maps, so only the
+        parts used for resampling are read from disk.
+
+        """
+        try:
+            if filename.endswith('.npz'):
+                with np.load(filename) as fid:
+                    arrays = {name: fid[name] for name in fid.files}
+            else:
+                arrays = {name[:-len('.npy')]: np.load(os.path.join(filename, name), mmap_mode='r')
+                          for name in os.listdir(filename) if name.endswith('.npy')}
+        except (OSError, ValueError):
+            raise IOError("Can't load bilinear look-up tables from %s" % filename)
+        for name in CACHE_INDICES:
+            setattr(self, name, arrays.get(name.lstrip('_')))
+
     def get_sample_from_bil_info(self, data, fill_value=None, output_shape=None):
         """Resample using pre-computed resampling LUTs."""
         del output_shape
@@ -32,6 +32,7 @@ from dask import delayed
 import numpy as np
 import zarr
 
+from pyresample._chunking import get_target_chunks
 from pyresample._spatial_mp import Proj
 from pyresample import CHUNK_SIZE
 from pyresample.bilinear._base import (
@@ -66,6 +67,60 @@ BIL_COORDINATES = {'bilinear_s': ('x1', ),
 class XArrayBilinearResampler(BilinearBase):
     """Bilinear interpolation using XArray."""
 
+    def __init__(self, source_geo_def, target_geo_def, radius_of_influence,
+                 neighbours=32, epsilon=0, reduce_data=True, precision='double',
+                 chunks=None, memory_limit=None):
+        """Initialize resampler.
+
+        Parameters
+        ----------
+        chunks : int or tuple, optional
+            Chunk size of the target arrays. Defaults to ``CHUNK_SIZE``.
+        memory_limit : int or str, optional
+            Memory a single target chunk task may use, in bytes or as a
+            string like ``'1GiB'``. The chunk size is then derived from the
+            number of neighbours and the precision. Can't be combined with
+            `chunks`.
+
+        The other parameters are described in :class:`BilinearBase`.
+
+        """
+        super(XArrayBilinearResampler, self).__init__(
+            source_geo_def, target_geo_def, radius_of_influence,
+            neighbours=neighbours, epsilon=epsilon, reduce_data=reduce_data,
+            precision=precision)
+        self._chunks = chunks
+        self._memory_limit = memory_limit
+        self._target_chunks = None
+
+    def _get_task_memory(self):
+        """Estimate the memory of a target chunk task per pixel and in total."""
+        coord_size = np.dtype(self._dtype or np.float64).itemsize
+        index_size = 4 if self._precision == 'single' else 8
+        # Query results and the index array of the target pixel
+        pixel_bytes = self._neighbours * (coord_size + 8 + index_size)
+        # Target x/y and the x/y of the four corners
+        pixel_bytes += 10 * 8
+        # Fractional distances, slices and mask of the look-up tables
+        pixel_bytes += 2 * coord_size + 8 * index_size + 4
+        # Four corner values and the result, assuming float64 data
+        pixel_bytes += 5 * 8
+        # The kd-tree and the source data are used in full
+        fixed_bytes = self._source_geo_def.size * (3 * coord_size + 8 + 8)
+        return pixel_bytes, fixed_bytes
+
+    def _get_target_chunks(self):
+        """Get the chunk size of the target arrays from `chunks` or `memory_limit`."""
+        if self._target_chunks is None:
+            pixel_bytes = fixed_bytes = 0
+            if self._memory_limit is not None:
+                pixel_bytes, fixed_bytes = self._get_task_memory()
+            self._target_chunks = get_target_chunks(
+                self._target_geo_def.shape, pixel_bytes, chunks=self._chunks,
+                memory_limit=self._memory_limit, fixed_bytes=fixed_bytes,
+                default=CHUNK_SIZE)
+        return self._target_chunks
+
     def resample(self, data, fill_value=None, nprocs=1):
         """Resample the given data."""
         del nprocs
@@ -80,7 +135,8 @@ class XArrayBilinearResampler(BilinearBase):
         self.bilinear_t = np.nan * da.zeros(self._target_geo_def.size)
         self.slices_x = da.zeros((self._target_geo_def.size, 4), dtype=np.int32)
         self.slices_y = da.zeros((self._target_geo_def.size, 4), dtype=np.int32)
-        self.out_coords_x, self.out_coords_y = self._target_geo_def.get_proj_vectors(chunks=CHUNK_SIZE)
+        self.out_coords_x, self.out_coords_y = self._target_geo_def.get_proj_vectors(
+            chunks=self._get_target_chunks())
         self.mask_slices = self._index_array >= self._source_geo_def.size
 
     def _get_input_xy(self):
@@ -89,7 +145,7 @@ class XArrayBilinearResampler(BilinearBase):
                              self._valid_input_index, self._index_array)
 
     def _get_output_xy(self):
-        return _get_output_xy(self._target_geo_def)
+        return _get_output_xy(self._target_geo_def, chunks=self._get_target_chunks())
 
     def _limit_output_values_to_input(self, data, res, fill_value):
         epsilon = 1e-6
@@ -109,7 +165,10 @@ class XArrayBilinearResampler(BilinearBase):
         else:
             res = da.reshape(res, (shp[0], shp[1]))
 
-        return res
+        chunks = self._get_target_chunks()
+        if not isinstance(chunks, tuple):
+            chunks = (chunks, chunks)
+        return res.rechunk({ndim - 2: chunks[0], ndim - 1: chunks[1]})
 
     def _finalize_output_data(self, data, res, fill_value):
         res = self._limit_output_values_to_input(data, res, fill_value)
@@ -160,7 +219,8 @@ class XArrayBilinearResampler(BilinearBase):
 
     def _get_target_proj_vectors(self):
         try:
-            self.out_coords_x, self.out_coords_y = self._target_geo_def.get_proj_vectors(chunks=CHUNK_SIZE)
+            self.out_coords_x, self.out_coords_y = self._target_geo_def.get_proj_vectors(
+                chunks=self._get_target_chunks())
         except AttributeError:
             pass
 
@@ -172,7 +232,7 @@ class XArrayBilinearResampler(BilinearBase):
                                    self._radius_of_influence)
         input_coords = lonlat2xyz(source_lons, source_lats)
         valid_input_index = np.ravel(valid_input_index)
-        input_coords = input_coords[valid_input_index, :].astype(np.float)
+        input_coords = input_coords[valid_input_index, :].astype(self._dtype or np.float)
 
         return da.compute(valid_input_index, input_coords)
 
@@ -199,8 +259,8 @@ class XArrayBilinearResampler(BilinearBase):
             raise IOError
 
 
-def _get_output_xy(target_geo_def):
-    out_x, out_y = target_geo_def.get_proj_coords(chunks=CHUNK_SIZE)
+def _get_output_xy(target_geo_def, chunks=CHUNK_SIZE):
+    out_x, out_y = target_geo_def.get_proj_coords(chunks=chunks)
     return da.compute(np.ravel(out_x),  np.ravel(out_y))
 
 
@@ -45,7 +45,7 @@ class GridFilter(object):
 
         # Get projection coords
         if self.nprocs > 1:
-            proj = _spatial_mp.Proj_MP(**self.area_def.proj_dict)
+            proj = _spatial_mp.get_proj_class()(**self.area_def.proj_dict)
         else:
             proj = _spatial_mp.Proj(**self.area_def.proj_dict)
 
@@ -25,6 +25,7 @@
 """Classes for geometry operations."""
 
 import hashlib
+import os
 import warnings
 from collections import OrderedDict
 from logging import getLogger
@@ -34,7 +35,8 @@ import yaml
 from pyproj import Geod, transform
 
 from pyresample import CHUNK_SIZE
-from pyresample._spatial_mp import Cartesian, Cartesian_MP, Proj, Proj_MP
+from pyresample._hashing import fingerprint_array
+from pyresample._spatial_mp import Cartesian, Proj, get_cartesian_class, get_proj_class
 from pyresample.boundary import AreaDefBoundary, Boundary, SimpleBoundary
 from pyresample.utils import (proj4_str_to_dict, proj4_dict_to_str,
                               convert_proj_floats, proj4_radius_parameters,
@@ -53,6 +55,10 @@ except ImportError:
 
 logger = getLogger(__name__)
 
+# Only hash a sample of the swath geolocation. Much faster, but only safe
+# when the geolocation arrays are trusted to differ within the sample.
+SWATH_HASH_SAMPLED = os.getenv('PYRESAMPLE_SWATH_HASH_SAMPLED', '').lower() in ('1', 'true', 'yes')
+
 
 class DimensionError(ValueError):
     """Wrap ValueError."""
@@ -298,7 +304,7 @@ class BaseDefinition(object):
             lons, lats = self.get_lonlats(nprocs=nprocs, data_slice=data_slice)
 
             if nprocs > 1:
-                cartesian = Cartesian_MP(nprocs)
+                cartesian = get_cartesian_class()(nprocs)
             else:
                 cartesian = Cartesian()
 
@@ -590,6 +596,24 @@ def get_array_hashable(arr):
             return np.asarray(arr).view(np.uint8)  # np array
 
 
+def get_array_fingerprint(arr, sampled=False):
+    """Get a fingerprint of the array `arr` for hashing.
+
+    Works with numpy arrays, dask.array.Array, and xarray.DataArray. Numpy
+    arrays are hashed in parallel by :func:`fingerprint_array`, dask arrays
+    are identified by their name. The ``hash`` attribute of a DataArray is
+    used when present.
+    """
+    if isinstance(arr, DataArray) and np.ndarray is not DataArray:
+        if 'hash' in arr.attrs:
+            return arr.attrs['hash']
+        return get_array_fingerprint(arr.data, sampled=sampled)
+    try:
+        return arr.name.encode('utf-8')  # dask array
+    except AttributeError:
+        return fingerprint_array(arr, sampled=sampled)
+
+
 class SwathDefinition(CoordinateDefinition):
     """Swath defined by lons and lats.
 
@@ -627,6 +651,7 @@ class SwathDefinition(CoordinateDefinition):
             raise ValueError('lon and lat arrays must have same shape')
         elif lons.ndim > 2:
             raise ValueError('Only 1 and 2 dimensional swaths are allowed')
+        self._fingerprints = {}
 
     def copy(self):
         """Copy the current swath."""
@@ -677,17 +702,30 @@ class SwathDefinition(CoordinateDefinition):
             self.hash = int(self.update_hash().hexdigest(), 16)
         return self.hash
 
-    def update_hash(self, the_hash=None):
-        """Update the hash."""
+    def update_hash(self, the_hash=None, sampled=None):
+        """Update the hash.
+
+        The lons, lats and mask enter the hash as fingerprints, which are
+        computed once per swath. With `sampled` (default
+        `SWATH_HASH_SAMPLED`), only a sample of the arrays is fingerprinted.
+        """
         if the_hash is None:
             the_hash = hashlib.sha1()
-        the_hash.update(get_array_hashable(self.lons))
-        the_hash.update(get_array_hashable(self.lats))
+        if sampled is None:
+            sampled = SWATH_HASH_SAMPLED
         try:
-            if self.lons.mask is not np.bool_(False):
-                the_hash.update(get_array_hashable(self.lons.mask))
-        except AttributeError:
-            pass
+            fingerprints = self._fingerprints[sampled]
+        except KeyError:
+            fingerprints = [get_array_fingerprint(self.lons, sampled),
+                            get_array_fingerprint(self.lats, sampled)]
+            try:
+                if self.lons.mask is not np.bool_(False):
+                    fingerprints.append(get_array_fingerprint(self.lons.mask, sampled))
+            except AttributeError:
+                pass
+            self._fingerprints[sampled] = fingerprints
+        for fingerprint in fingerprints:
+            the_hash.update(fingerprint)
         return the_hash
 
     def _compute_omerc_parameters(self, ellipsoid):
@@ -1961,7 +1999,7 @@ class AreaDefinition(BaseDefinition):
             return res[:, :, 0], res[:, :, 1]
 
         if nprocs > 1:
-            target_proj = Proj_MP(proj_def)
+            target_proj = get_proj_class()(proj_def)
         else:
             target_proj = Proj(proj_def)
 
@@ -33,6 +33,7 @@ import xarray as xr
 from shapely.geometry import Polygon
 
 from pyresample import CHUNK_SIZE
+from pyresample._chunking import get_target_chunks
 from pyresample.gradient._gradient_search import one_step_gradient_search
 from pyresample.resampler import BaseResampler
 from pyresample.geometry import get_geostationary_bounding_box
@@ -49,8 +50,23 @@ def transform(x_coords, y_coords, src_prj=None, dst_prj=None):
 class GradientSearchResampler(BaseResampler):
     """Resample using gradient search based bilinear interpolation."""
 
-    def __init__(self, source_geo_def, target_geo_def):
-        """Init GradientResampler."""
+    # The mapping of the overlapping source and target chunks
+    precompute_artefacts = ('coverage_status', 'src_slices', 'dst_slices',
+                            'dst_mosaic_locations')
+
+    def __init__(self, source_geo_def, target_geo_def, chunks=None,
+                 memory_limit=None):
+        """Init GradientResampler.
+
+        Args:
+            chunks (int or tuple): Chunk size of the target. Defaults to
+                ``CHUNK_SIZE``.
+            memory_limit (int or str): Memory a single task may use, in bytes
+                or as a string like ``'1GiB'``. The target chunk size is then
+                derived from the size of the source chunks. Can't be combined
+                with `chunks`.
+
+        """
         super(GradientSearchResampler, self).__init__(source_geo_def, target_geo_def)
         import warnings
         warnings.warn("You are using the Gradient Search Resampler, which is still EXPERIMENTAL.")
@@ -70,8 +86,38 @@ class GradientSearchResampler(BaseResampler):
         self.dst_polys = {}
         self.dst_mosaic_locations = None
         self.coverage_status = None
+        self.chunks = chunks
+        self.memory_limit = memory_limit
+
+    def _get_target_chunks(self, datachunks):
+        """Get the chunk size of the target from `chunks` or `memory_limit`."""
+        # Target x/y before and after the transformation, and a float64 result
+        pixel_bytes = 5 * 8
+        # Source x/y, their four gradients and the data of a source chunk
+        fixed_bytes = 7 * 8 * np.prod([np.max(chunk) for chunk in datachunks[-2:]])
+        return get_target_chunks(self.target_geo_def.shape, pixel_bytes,
+                                 chunks=self.chunks, memory_limit=self.memory_limit,
+                                 fixed_bytes=fixed_bytes, default=CHUNK_SIZE)
+
+    def _get_precompute_kwargs(self, data, **kwargs):
+        """Get the data chunks the chunk mappings depend on."""
+        datachunks = self._get_datachunks(data)
+        return {'datachunks': datachunks,
+                'target_chunks': self._get_target_chunks(datachunks)}
+
+    def precompute(self, datachunks=None, target_chunks=None, **kwargs):
+        """Map the overlapping source and target chunks."""
+        self._get_projection_coordinates(datachunks, dst_chunks=target_chunks)
+        if self.coverage_status is None:
+            self.get_chunk_mappings()
 
-    def _get_projection_coordinates(self, datachunks):
+    @staticmethod
+    def _get_datachunks(data):
+        if 'bands' in data.dims:
+            return data.sel(bands=data.coords['bands'][0]).chunks
+        return data.chunks
+
+    def _get_projection_coordinates(self, datachunks, dst_chunks=None):
         """Get projection coordinates."""
         if self.use_input_coords is None:
             try:
@@ -84,15 +130,17 @@ class GradientSearchResampler(BaseResampler):
                     chunks=datachunks)
                 src_prj = pyproj.Proj("+proj=longlat")
                 self.use_input_coords = False
+            if dst_chunks is None:
+                dst_chunks = self._get_target_chunks(datachunks)
             try:
                 self.dst_x, self.dst_y = self.target_geo_def.get_proj_coords(
-                    chunks=CHUNK_SIZE)
+                    chunks=dst_chunks)
                 dst_prj = pyproj.Proj(**self.target_geo_def.proj_dict)
             except AttributeError:
                 if self.use_input_coords is False:
                     raise NotImplementedError('Cannot resample lon/lat to lon/lat with gradient search.')
                 self.dst_x, self.dst_y = self.target_geo_def.get_lonlats(
-                    chunks=CHUNK_SIZE)
+                    chunks=dst_chunks)
                 dst_prj = pyproj.Proj("+proj=longlat")
             if self.use_input_coords:
                 self.dst_x, self.dst_y = transform(
@@ -229,10 +277,7 @@ class GradientSearchResampler(BaseResampler):
 
     def compute(self, data, fill_value=None, **kwargs):
         """Resample the given data using gradient search algorithm."""
-        if 'bands' in data.dims:
-            datachunks = data.sel(bands=data.coords['bands'][0]).chunks
-        else:
-            datachunks = data.chunks
+        datachunks = self._get_datachunks(data)
         data_dims = data.dims
         data_coords = data.coords
 
@@ -372,11 +417,13 @@ def parallel_gradient_search(data, src_x, src_y, dst_x, dst_y,
                 method=method)
             res = da.from_delayed(res, (num_bands, ) + dst_x[i].shape,
                                   dtype=np.float64)
-        if dst_mosaic_locations[i] in chunks:
+        # The locations are arrays when loaded from the cache
+        location = tuple(dst_mosaic_locations[i])
+        if location in chunks:
             if not is_pad:
-                chunks[dst_mosaic_locations[i]].append(res)
+                chunks[location].append(res)
         else:
-            chunks[dst_mosaic_locations[i]] = [res, ]
+            chunks[location] = [res, ]
 
     return _concatenate_chunks(chunks)
 
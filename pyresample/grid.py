@@ -116,7 +116,7 @@ def get_linesample(lons, lats, source_area_def, nprocs=1):
 
     # Proj.4 definition of source area projection
     if nprocs > 1:
-        source_proj = _spatial_mp.Proj_MP(**source_area_def.proj_dict)
+        source_proj = _spatial_mp.get_proj_class()(**source_area_def.proj_dict)
     else:
         source_proj = _spatial_mp.Proj(**source_area_def.proj_dict)
 
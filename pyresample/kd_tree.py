@@ -20,16 +20,25 @@ supported"""
 
 from __future__ import absolute_import
 
+import os
+import shutil
 import sys
+import threading
 import types
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+from functools import partial
+from itertools import product
 from logging import getLogger
 
 import numpy as np
 
 from pykdtree.kdtree import KDTree
-from pyresample import CHUNK_SIZE, _spatial_mp, data_reduce, geometry
+from pyresample import CHUNK_SIZE, _spatial_mp, _weighted_sum, data_reduce, geometry
+from pyresample._caching import ArrayCache
+from pyresample._chunking import get_source_overlap, get_target_chunks
+from pyresample.resampler import hash_dict
 
 logger = getLogger(__name__)
 
@@ -37,6 +46,8 @@ try:
     from xarray import DataArray
     import dask.array as da
     import dask
+    from dask.base import tokenize
+    from dask.highlevelgraph import HighLevelGraph
     if hasattr(dask, 'blockwise'):
         blockwise = da.blockwise
     else:
@@ -46,9 +57,25 @@ except ImportError:
     da = None
     dask = None
 
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
 if sys.version >= '3':
     long = int
 
+# Memory budget in bytes for a single segment of a kd-tree query
+SEGMENT_MEMORY_BUDGET = int(os.getenv('PYRESAMPLE_SEGMENT_MEMORY_BUDGET', 512 * 1024 ** 2))
+# Memory in bytes used for the neighbour weights of weighted resampling
+WEIGHT_BLOCK_BYTES = 16 * 1024 ** 2
+# Cache of the cartesian coordinates of target areas. Set to None to disable
+# caching, or replace by an ArrayCache with a cache_dir to keep the
+# coordinates on disk between runs.
+TARGET_COORDS_CACHE = ArrayCache(
+    cache_dir=os.getenv('PYRESAMPLE_TARGET_COORDS_CACHE_DIR'),
+    max_bytes=int(os.getenv('PYRESAMPLE_TARGET_COORDS_CACHE_BYTES', 256 * 1024 ** 2)))
+
 
 class EmptyResult(ValueError):
     pass
@@ -62,7 +89,8 @@ def resample_nearest(source_geo_def,
                      fill_value=0,
                      reduce_data=True,
                      nprocs=1,
-                     segments=None):
+                     segments=None,
+                     cache=None):
     """Resamples data using kd-tree nearest neighbour approach
 
     Parameters
@@ -91,6 +119,8 @@ def resample_nearest(source_geo_def,
     segments : int or None
         Number of segments to use when resampling.
         If set to None an estimate will be calculated
+    cache : NeighbourInfoCache or None, optional
+        Cache to look up and store the neighbour info in
 
     Returns
     -------
@@ -101,13 +131,14 @@ def resample_nearest(source_geo_def,
     return _resample(source_geo_def, data, target_geo_def, 'nn',
                      radius_of_influence, neighbours=1,
                      epsilon=epsilon, fill_value=fill_value,
-                     reduce_data=reduce_data, nprocs=nprocs, segments=segments)
+                     reduce_data=reduce_data, nprocs=nprocs, segments=segments,
+                     cache=cache)
 
 
 def resample_gauss(source_geo_def, data, target_geo_def,
                    radius_of_influence, sigmas, neighbours=8, epsilon=0,
                    fill_value=0, reduce_data=True, nprocs=1, segments=None,
-                   with_uncert=False):
+                   with_uncert=False, cache=None):
     """Resamples data using kd-tree gaussian weighting neighbour approach.
 
     Parameters
@@ -144,6 +175,8 @@ def resample_gauss(source_geo_def, data, target_geo_def,
         If set to None an estimate will be calculated
     with_uncert : bool, optional
         Calculate uncertainty estimates
+    cache : NeighbourInfoCache or None, optional
+        Cache to look up and store the neighbour info in
 
     Returns
     -------
@@ -181,13 +214,14 @@ def resample_gauss(source_geo_def, data, target_geo_def,
     return _resample(source_geo_def, data, target_geo_def, 'custom',
                      radius_of_influence, neighbours=neighbours,
                      epsilon=epsilon, weight_funcs=weight_funcs, fill_value=fill_value,
-                     reduce_data=reduce_data, nprocs=nprocs, segments=segments, with_uncert=with_uncert)
+                     reduce_data=reduce_data, nprocs=nprocs, segments=segments, with_uncert=with_uncert,
+                     cache=cache)
 
 
 def resample_custom(source_geo_def, data, target_geo_def,
                     radius_of_influence, weight_funcs, neighbours=8,
                     epsilon=0, fill_value=0, reduce_data=True, nprocs=1,
-                    segments=None, with_uncert=False):
+                    segments=None, with_uncert=False, cache=None):
     """Resamples data using kd-tree custom radial weighting neighbour approach
 
     Parameters
@@ -223,6 +257,10 @@ def resample_custom(source_geo_def, data, target_geo_def,
     segments : {int, None}
         Number of segments to use when resampling.
         If set to None an estimate will be calculated
+    with_uncert : bool, optional
+        Calculate uncertainty estimates
+    cache : NeighbourInfoCache or None, optional
+        Cache to look up and store the neighbour info in
 
     Returns
     -------
@@ -246,12 +284,14 @@ def resample_custom(source_geo_def, data, target_geo_def,
                      radius_of_influence, neighbours=neighbours,
                      epsilon=epsilon, weight_funcs=weight_funcs,
                      fill_value=fill_value, reduce_data=reduce_data,
-                     nprocs=nprocs, segments=segments, with_uncert=with_uncert)
+                     nprocs=nprocs, segments=segments, with_uncert=with_uncert,
+                     cache=cache)
 
 
 def _resample(source_geo_def, data, target_geo_def, resample_type,
               radius_of_influence, neighbours=8, epsilon=0, weight_funcs=None,
-              fill_value=0, reduce_data=True, nprocs=1, segments=None, with_uncert=False):
+              fill_value=0, reduce_data=True, nprocs=1, segments=None, with_uncert=False,
+              cache=None):
     """Resamples swath using kd-tree approach"""
 
     valid_input_index, valid_output_index, index_array, distance_array = \
@@ -262,7 +302,8 @@ def _resample(source_geo_def, data, target_geo_def, resample_type,
                            epsilon=epsilon,
                            reduce_data=reduce_data,
                            nprocs=nprocs,
-                           segments=segments)
+                           segments=segments,
+                           cache=cache)
 
     return get_sample_from_neighbour_info(resample_type,
                                           target_geo_def.shape,
@@ -277,7 +318,7 @@ def _resample(source_geo_def, data, target_geo_def, resample_type,
 
 def get_neighbour_info(source_geo_def, target_geo_def, radius_of_influence,
                        neighbours=8, epsilon=0, reduce_data=True,
-                       nprocs=1, segments=None):
+                       nprocs=1, segments=None, cache=None, precision='double'):
     """Returns neighbour info
 
     Parameters
@@ -301,6 +342,17 @@ def get_neighbour_info(source_geo_def, target_geo_def, radius_of_influence,
     segments : int or None
         Number of segments to use when resampling.
         If set to None an estimate will be calculated
+    cache : NeighbourInfoCache or None, optional
+        Cache to look up and store the neighbour info in. When the info for
+        the given geometries and parameters is found in the cache, the
+        kd-tree is neither built nor queried.
+    precision : {'double', 'single'}, optional
+        'single' builds and queries the kd-tree with float32 coordinates and
+        returns float32 distances and int32 indices, halving the memory used.
+        The cartesian coordinates are then only accurate to about half a
+        meter and the distances to a few meters, so the nearest neighbour may
+        differ from 'double' precision where source pixels are equally far
+        from a target pixel within a few meters.
 
     Returns
     -------
@@ -313,12 +365,37 @@ def get_neighbour_info(source_geo_def, target_geo_def, radius_of_influence,
         warnings.warn('Searching for %s neighbours in %s data points' %
                       (neighbours, source_geo_def.size))
 
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.get_key(source_geo_def, target_geo_def,
+                                  radius_of_influence=radius_of_influence,
+                                  neighbours=neighbours, epsilon=epsilon,
+                                  reduce_data=reduce_data, precision=precision)
+        neighbour_info = cache.get_neighbour_info(cache_key)
+        if neighbour_info is not None:
+            return neighbour_info
+
+    neighbour_info = _get_neighbour_info(source_geo_def, target_geo_def,
+                                         radius_of_influence,
+                                         neighbours=neighbours,
+                                         epsilon=epsilon,
+                                         reduce_data=reduce_data,
+                                         nprocs=nprocs, segments=segments,
+                                         precision=precision)
+
+    if cache_key is not None:
+        neighbour_info = cache.put_neighbour_info(cache_key, neighbour_info)
+    return neighbour_info
+
+
+def _get_neighbour_info(source_geo_def, target_geo_def, radius_of_influence,
+                        neighbours=8, epsilon=0, reduce_data=True,
+                        nprocs=1, segments=None, precision='double'):
+    """Calculate neighbour info, see :func:`get_neighbour_info`."""
+    dtype = _get_coordinate_dtype(precision)
     if segments is None:
-        cut_off = 3000000
-        if target_geo_def.size > cut_off:
-            segments = int(target_geo_def.size / cut_off)
-        else:
-            segments = 1
+        segments = _get_segments(target_geo_def, neighbours,
+                                 dtype=source_geo_def.dtype if dtype is None else dtype)
 
     # Find reduced input coordinate set
     valid_input_index, source_lons, source_lats = _get_valid_input_index(source_geo_def, target_geo_def,
@@ -326,47 +403,29 @@ def get_neighbour_info(source_geo_def, target_geo_def, radius_of_influence,
                                                                          radius_of_influence,
                                                                          nprocs=nprocs)
 
-    # Create kd-tree
+    # Create kd-tree. Segments are queried in parallel threads, so the
+    # multiprocessing kd-tree is only used for unsegmented queries
     try:
         resample_kdtree = _create_resample_kdtree(source_lons, source_lats,
                                                   valid_input_index,
-                                                  nprocs=nprocs)
+                                                  nprocs=nprocs if segments == 1 else 1,
+                                                  dtype=dtype)
     except EmptyResult:
         # Handle if all input data is reduced away
         valid_output_index, index_array, distance_array = \
             _create_empty_info(source_geo_def, target_geo_def, neighbours)
-        return (valid_input_index, valid_output_index, index_array,
-                distance_array)
+        return _set_precision(precision, valid_input_index,
+                              valid_output_index, index_array, distance_array)
 
     if segments > 1:
-        # Iterate through segments
-        for i, target_slice in enumerate(geometry._get_slice(segments,
-                                                             target_geo_def.shape)):
-
-            # Query on slice of target coordinates
-            next_voi, next_ia, next_da = \
-                _query_resample_kdtree(resample_kdtree, source_geo_def,
-                                       target_geo_def,
-                                       radius_of_influence, target_slice,
-                                       neighbours=neighbours,
-                                       epsilon=epsilon,
-                                       reduce_data=reduce_data,
-                                       nprocs=nprocs)
-
-            # Build result iteratively
-            if i == 0:
-                # First iteration
-                valid_output_index = next_voi
-                index_array = next_ia
-                distance_array = next_da
-            else:
-                valid_output_index = np.append(valid_output_index, next_voi)
-                if neighbours > 1:
-                    index_array = np.row_stack((index_array, next_ia))
-                    distance_array = np.row_stack((distance_array, next_da))
-                else:
-                    index_array = np.append(index_array, next_ia)
-                    distance_array = np.append(distance_array, next_da)
+        valid_output_index, index_array, distance_array = \
+            _query_resample_kdtree_segments(resample_kdtree, source_geo_def,
+                                            target_geo_def,
+                                            radius_of_influence, segments,
+                                            neighbours=neighbours,
+                                            epsilon=epsilon,
+                                            reduce_data=reduce_data,
+                                            nprocs=nprocs, dtype=dtype)
     else:
         # Query kd-tree with full target coordinate set
         full_slice = slice(None)
@@ -377,18 +436,428 @@ def get_neighbour_info(source_geo_def, target_geo_def, radius_of_influence,
                                    neighbours=neighbours,
                                    epsilon=epsilon,
                                    reduce_data=reduce_data,
-                                   nprocs=nprocs)
+                                   nprocs=nprocs, dtype=dtype)
+
+    _check_neighbours(distance_array, neighbours, radius_of_influence)
+
+    return _set_precision(precision, valid_input_index, valid_output_index,
+                          index_array, distance_array)
 
-    # Check if number of neighbours is potentially too low
+
+def _check_neighbours(distance_array, neighbours, radius_of_influence):
+    """Warn if the number of neighbours is potentially too low."""
     if neighbours > 1:
         if not np.all(np.isinf(distance_array[:, -1])):
             warnings.warn(('Possible more than %s neighbours '
                            'within %s m for some data points') %
                           (neighbours, radius_of_influence))
 
+
+def _get_coordinate_dtype(precision):
+    """Get the dtype of the kd-tree coordinates for `precision`.
+
+    None means that the dtype of the source coordinates is used.
+
+    """
+    if precision == 'single':
+        return np.float32
+    elif precision == 'double':
+        return None
+    raise ValueError("precision must be 'single' or 'double', not %r" % (precision,))
+
+
+def _set_precision(precision, valid_input_index, valid_output_index,
+                   index_array, distance_array):
+    """Convert the neighbour info to the dtypes of `precision`."""
+    if precision == 'single':
+        # Missing neighbours have the number of kd-tree points as index, so
+        # int64 is kept for trees of 2**31 points or more
+        index_dtype = _spatial_mp._get_index_dtype(np.count_nonzero(valid_input_index))
+        if index_dtype == np.int32 and index_array.dtype.itemsize == 4:
+            # uint32 indices below 2**31 are reinterpreted without copying
+            index_array = index_array.view(np.int32)
+        else:
+            index_array = index_array.astype(index_dtype, copy=False)
+        distance_array = distance_array.astype(np.float32, copy=False)
     return valid_input_index, valid_output_index, index_array, distance_array
 
 
+class NeighbourInfoCache(ArrayCache):
+    """Cache for the neighbour info returned by :func:`get_neighbour_info`.
+
+    The neighbour info is stored under a key built from the hashes of the
+    source and target geometries and the query parameters. Only geometries
+    providing an ``update_hash`` method (swaths and areas) can be cached.
+
+    Args:
+        cache_dir (str): Directory to store the neighbour info in as memory
+            mapped ``.npy`` files. If None (default), the info is only kept
+            in memory.
+        max_bytes (int): Size limit of the in-memory part of the cache.
+
+    Example::
+
+        cache = NeighbourInfoCache(cache_dir='/var/cache/pyresample')
+        result = resample_nearest(swath_def, data, area_def, 50000,
+                                  cache=cache)
+
+    """
+
+    names = ('valid_input_index', 'valid_output_index',
+             'index_array', 'distance_array')
+
+    def get_key(self, source_geo_def, target_geo_def, **kwargs):
+        """Get the cache key for the given geometries and query parameters.
+
+        Returns None if the geometries can't be hashed.
+
+        """
+        try:
+            the_hash = source_geo_def.update_hash()
+            target_geo_def.update_hash(the_hash)
+        except AttributeError:
+            logger.debug("Geometry can't be hashed, neighbour info won't be cached")
+            return None
+        hash_dict(kwargs, the_hash)
+        return 'neighbour_info_' + the_hash.hexdigest()
+
+    def get_neighbour_info(self, key):
+        """Get the neighbour info stored under `key`, or None."""
+        if key is None:
+            return None
+        arrays = self.get(key)
+        if arrays is None:
+            return None
+        return tuple(arrays[name] for name in self.names)
+
+    def put_neighbour_info(self, key, neighbour_info):
+        """Store the `neighbour_info` tuple under `key` and return it."""
+        if key is None:
+            return neighbour_info
+        arrays = self.put(key, zip(self.names, neighbour_info))
+        return tuple(arrays[name] for name in self.names)
+
+
+class SourceIndex(object):
+    """KD-tree of a source geometry that can be queried for many targets.
+
+    The cartesian coordinates of the source and the kd-tree are computed
+    once, so resampling the same source to several target geometries doesn't
+    rebuild them for every target. As the tree covers the whole source, the
+    source data reduction is applied to the query results instead of the
+    tree: `valid_input_index` of the returned neighbour info only selects the
+    source pixels that are neighbours of some target pixel.
+
+    Args:
+        source_geo_def: Geometry definition of source
+        nprocs (int): Number of processor cores to be used for the
+            coordinate transformations and the segmented queries
+        precision (str): 'double' (default) or 'single', see
+            :func:`get_neighbour_info`
+
+    Example::
+
+        source_index = SourceIndex(swath_def)
+        for area_def in area_defs:
+            neighbour_info = source_index.query(area_def, 50000, neighbours=1)
+            result = get_sample_from_neighbour_info('nn', area_def.shape,
+                                                    data, *neighbour_info)
+
+    """
+
+    def __init__(self, source_geo_def, nprocs=1, precision='double'):
+        """Build the kd-tree of the source."""
+        self.source_geo_def = source_geo_def
+        self.nprocs = nprocs
+        self.precision = precision
+        self._dtype = _get_coordinate_dtype(precision)
+        # Without a target only the illegal coordinates can be removed
+        self.valid_input_index, source_lons, source_lats = \
+            _get_valid_input_index(source_geo_def, None, False, None,
+                                   nprocs=nprocs)
+        try:
+            self.kdtree = _create_resample_kdtree(source_lons, source_lats,
+                                                  self.valid_input_index,
+                                                  nprocs=1, dtype=self._dtype)
+        except EmptyResult:
+            self.kdtree = None
+
+    def query(self, target_geo_def, radius_of_influence, neighbours=8,
+              epsilon=0, reduce_data=True, segments=None):
+        """Get the neighbour info of the source for `target_geo_def`.
+
+        See :func:`get_neighbour_info` for a description of the arguments
+        and the returned neighbour info.
+
+        """
+        if self.source_geo_def.size < neighbours:
+            warnings.warn('Searching for %s neighbours in %s data points' %
+                          (neighbours, self.source_geo_def.size))
+        if self.kdtree is None:
+            valid_output_index, index_array, distance_array = \
+                _create_empty_info(self.source_geo_def, target_geo_def,
+                                   neighbours)
+            return _set_precision(self.precision, self.valid_input_index,
+                                  valid_output_index, index_array,
+                                  distance_array)
+
+        if segments is None:
+            segments = _get_segments(target_geo_def, neighbours,
+                                     dtype=self.kdtree.data.dtype)
+        if segments > 1:
+            valid_output_index, index_array, distance_array = \
+                _query_resample_kdtree_segments(self.kdtree,
+                                                self.source_geo_def,
+                                                target_geo_def,
+                                                radius_of_influence, segments,
+                                                neighbours=neighbours,
+                                                epsilon=epsilon,
+                                                reduce_data=reduce_data,
+                                                nprocs=self.nprocs,
+                                                dtype=self._dtype)
+        else:
+            valid_output_index, index_array, distance_array = \
+                _query_resample_kdtree(self.kdtree, self.source_geo_def,
+                                       target_geo_def,
+                                       radius_of_influence, slice(None),
+                                       neighbours=neighbours,
+                                       epsilon=epsilon,
+                                       reduce_data=reduce_data,
+                                       nprocs=self.nprocs, dtype=self._dtype)
+        _check_neighbours(distance_array, neighbours, radius_of_influence)
+
+        valid_input_index = self.valid_input_index
+        if reduce_data:
+            valid_input_index, index_array = self._reduce(index_array)
+        return _set_precision(self.precision, valid_input_index,
+                              valid_output_index, index_array, distance_array)
+
+    def _reduce(self, index_array):
+        """Keep only the source pixels that are neighbours of a target pixel.
+
+        The indices into the tree are translated to indices into the
+        reduced source.
+
+        """
+        tree_size = self.kdtree.n
+        is_neighbour = np.zeros(tree_size + 1, dtype=bool)
+        is_neighbour[index_array] = True
+        # Missing neighbours are marked with the size of the tree
+        is_neighbour[tree_size] = False
+        reduced_index = np.cumsum(is_neighbour) - 1
+        # Missing neighbours are now marked with the reduced size
+        reduced_index[tree_size] = reduced_index[tree_size - 1] + 1
+        index_array = reduced_index[index_array].astype(index_array.dtype)
+
+        valid_input_index = np.zeros_like(self.valid_input_index)
+        valid_input_index[self.valid_input_index] = is_neighbour[:tree_size]
+        return valid_input_index, index_array
+
+
+class SwathAccumulator(object):
+    """Resample a swath to an area one granule at a time.
+
+    Every granule added only queries the part of the target area it can
+    reach, found by projecting the boundary of the granule to the target.
+    Nearest neighbour resampling keeps the distance of the sample written to
+    each target pixel, so the closest sample of all granules wins. Gaussian
+    resampling accumulates the weighted sums of the neighbours found in each
+    granule, so that the result only differs from resampling the whole swath
+    where more than `neighbours` source pixels are within reach of a target
+    pixel.
+
+    Masked source pixels are ignored. With several channels, a source pixel
+    is ignored when it's masked in any channel.
+
+    Args:
+        target_geo_def (AreaDefinition): Geometry definition of target
+        radius_of_influence (float): Cut off distance in meters
+        resample_type (str): 'nn' (default) or 'gauss'
+        sigmas (float or list of floats): Sigma of the gauss weighting of
+            each channel. Required for 'gauss' resampling.
+        neighbours (int): The number of neighbours to consider for each
+            target pixel in 'gauss' resampling
+        epsilon (float): Allowed uncertainty in meters
+        fill_value (int, float or None): Value of target pixels without any
+            sample. If None, a masked array is returned by
+            :meth:`get_result`.
+
+    Example::
+
+        accumulator = SwathAccumulator(area_def, 5000)
+        for granule_def, data in granules:
+            accumulator.add(granule_def, data)
+            result = accumulator.get_result()
+
+    """
+
+    def __init__(self, target_geo_def, radius_of_influence,
+                 resample_type='nn', sigmas=None, neighbours=8, epsilon=0,
+                 fill_value=0):
+        """Initialize the empty result."""
+        if not isinstance(target_geo_def, geometry.AreaDefinition):
+            raise TypeError('target_geo_def must be an AreaDefinition')
+        if resample_type not in ('nn', 'gauss'):
+            raise TypeError('Invalid resampling type: %s' % resample_type)
+        if resample_type == 'gauss' and sigmas is None:
+            raise ValueError('sigmas must be supplied when using '
+                             'gauss resampling')
+        self.target_geo_def = target_geo_def
+        self.radius_of_influence = radius_of_influence
+        self.resample_type = resample_type
+        self.sigmas = sigmas
+        self.neighbours = neighbours if resample_type == 'gauss' else 1
+        self.epsilon = epsilon
+        self.fill_value = fill_value
+        # Running results, created with the first granule
+        self._values = None
+        self._distance = None
+        self._weights = None
+        self._channels = None
+
+    def add(self, source_geo_def, data):
+        """Resample a granule and merge it into the running result.
+
+        Args:
+            source_geo_def: Geometry definition of the granule
+            data (numpy array): Data of the granule, with the channels
+                along the last dimension if there are several
+
+        """
+        data_flat = data.reshape((source_geo_def.size, -1))
+        if self._values is None:
+            self._allocate(data, data_flat.shape[1])
+        elif data_flat.shape[1] != self._values.shape[1]:
+            raise ValueError('Granule has %d channels, expected %d' %
+                             (data_flat.shape[1], self._values.shape[1]))
+
+        window = self._get_window(source_geo_def)
+        if window is None:
+            return
+        rows, cols = window
+        mask = np.ma.getmask(data_flat)
+        if mask is not np.ma.nomask:
+            # Masked pixels are excluded from the kd-tree as invalid
+            # coordinates
+            lons, lats = source_geo_def.get_lonlats()
+            lons = np.where(mask.any(axis=1).reshape(lons.shape), np.nan, lons)
+            source_geo_def = geometry.SwathDefinition(lons, lats)
+        valid_input_index, valid_output_index, index_array, distance_array = \
+            get_neighbour_info(source_geo_def, self.target_geo_def[rows, cols],
+                               self.radius_of_influence,
+                               neighbours=self.neighbours,
+                               epsilon=self.epsilon, segments=1)
+
+        # Flat positions of the queried pixels in the target area
+        window_index = (np.arange(rows.start, rows.stop)[:, np.newaxis] *
+                        self.target_geo_def.width +
+                        np.arange(cols.start, cols.stop)).ravel()
+        positions = window_index[valid_output_index]
+        source_positions = np.flatnonzero(valid_input_index)
+        found = index_array < source_positions.size
+        data_flat = np.ma.getdata(data_flat)
+        if self.resample_type == 'nn':
+            self._add_nearest(data_flat, positions, source_positions,
+                              index_array, distance_array, found)
+        else:
+            self._add_gauss(data_flat, positions, source_positions,
+                            index_array, distance_array, found)
+
+    def get_result(self):
+        """Get the result of the granules added so far."""
+        if self._values is None:
+            raise ValueError('No granule has been added yet')
+        shape = self.target_geo_def.shape
+        if self._channels > 1:
+            shape = shape + (self._channels,)
+        if self.resample_type == 'nn':
+            result = self._values.copy()
+            empty = np.isinf(self._distance)[:, np.newaxis]
+        else:
+            empty = self._weights <= 0
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = self._values / self._weights
+        empty = np.broadcast_to(empty, result.shape)
+        if self.fill_value is None:
+            return np.ma.array(result.reshape(shape), mask=empty.reshape(shape))
+        result[empty] = self.fill_value
+        return result.reshape(shape)
+
+    def _allocate(self, data, channels):
+        size = self.target_geo_def.size
+        self._channels = channels
+        if self.resample_type == 'nn':
+            # Nearest neighbour resampling conserves the data type
+            self._values = np.zeros((size, channels), dtype=data.dtype)
+            self._distance = np.full(size, np.inf)
+        else:
+            sigmas = self.sigmas
+            if not isinstance(sigmas, (list, tuple, np.ndarray)):
+                sigmas = [sigmas] * channels
+            if len(sigmas) != channels:
+                raise ValueError('Need one sigma for each of the %d channels' % channels)
+            self.sigmas = np.asarray(sigmas, dtype=np.float64)
+            self._values = np.zeros((size, channels))
+            self._weights = np.zeros((size, channels))
+
+    def _get_window(self, source_geo_def):
+        """Get the rows and columns of the target the granule can reach.
+
+        Returns None if the granule is too far away from the target.
+
+        """
+        target = self.target_geo_def
+        if source_geo_def.ndim == 2 and hasattr(source_geo_def, 'get_edge_lonlats'):
+            lons, lats = source_geo_def.get_edge_lonlats()
+        else:
+            lons, lats = source_geo_def.get_lonlats()
+        lons = np.ma.filled(np.asanyarray(lons, dtype=np.float64), np.nan)
+        lats = np.ma.filled(np.asanyarray(lats, dtype=np.float64), np.nan)
+        with np.errstate(invalid='ignore'):
+            x, y = _spatial_mp.Proj(target.proj_str)(lons.ravel(), lats.ravel())
+        x = np.asarray(x)
+        y = np.asarray(y)
+        full_window = (slice(0, target.height), slice(0, target.width))
+        if not (np.all(np.isfinite(x)) and np.all(np.isfinite(y))):
+            # Parts of the granule can't be projected
+            return full_window
+        cols = (x - target.pixel_upper_left[0]) / target.pixel_size_x
+        rows = (target.pixel_upper_left[1] - y) / target.pixel_size_y
+        # Allow for the distortion of the projection
+        margin = int(np.ceil(2 * self.radius_of_influence /
+                             min(abs(target.pixel_size_x), abs(target.pixel_size_y)))) + 1
+        row_start = max(int(np.floor(rows.min())) - margin, 0)
+        row_stop = min(int(np.ceil(rows.max())) + margin + 1, target.height)
+        col_start = max(int(np.floor(cols.min())) - margin, 0)
+        col_stop = min(int(np.ceil(cols.max())) + margin + 1, target.width)
+        if row_start >= row_stop or col_start >= col_stop:
+            return None
+        return slice(row_start, row_stop), slice(col_start, col_stop)
+
+    def _add_nearest(self, data, positions, source_positions, index_array,
+                     distance_array, found):
+        positions = positions[found]
+        distance = distance_array[found]
+        closer = distance < self._distance[positions]
+        positions = positions[closer]
+        self._distance[positions] = distance[closer]
+        self._values[positions] = data[source_positions[index_array[found][closer]]]
+
+    def _add_gauss(self, data, positions, source_positions, index_array,
+                   distance_array, found):
+        if index_array.ndim == 1:
+            index_array = index_array[:, np.newaxis]
+            distance_array = distance_array[:, np.newaxis]
+            found = found[:, np.newaxis]
+        # Set out of bounds distance to 1 in order to avoid numerical Inf
+        distance = np.where(found, distance_array, 1)
+        index = source_positions[np.where(found, index_array, 0)]
+        for j, sigma in enumerate(self.sigmas):
+            weights = np.where(found, np.exp(-distance ** 2 / sigma ** 2), 0)
+            self._values[positions, j] += (weights * data[index, j]).sum(axis=1)
+            self._weights[positions, j] += weights.sum(axis=1)
+
+
 def _get_valid_input_index(source_geo_def,
                            target_geo_def,
                            reduce_data,
@@ -473,7 +942,8 @@ def _get_valid_output_index(source_geo_def, target_geo_def, target_lons,
 def _create_resample_kdtree(source_lons,
                             source_lats,
                             valid_input_index,
-                            nprocs=1):
+                            nprocs=1,
+                            dtype=None):
     """Set up kd tree on input"""
     """
     if not isinstance(source_geo_def, geometry.BaseDefinition):
@@ -487,9 +957,12 @@ def _create_resample_kdtree(source_lons,
 
     source_lons_valid = source_lons[valid_input_index]
     source_lats_valid = source_lats[valid_input_index]
+    if dtype is not None:
+        source_lons_valid = source_lons_valid.astype(dtype, copy=False)
+        source_lats_valid = source_lats_valid.astype(dtype, copy=False)
 
     if nprocs > 1:
-        cartesian = _spatial_mp.Cartesian_MP(nprocs)
+        cartesian = _spatial_mp.get_cartesian_class()(nprocs)
     else:
         cartesian = _spatial_mp.Cartesian()
 
@@ -501,7 +974,7 @@ def _create_resample_kdtree(source_lons,
 
     # Build kd-tree on input
     if nprocs > 1:
-        resample_kdtree = _spatial_mp.cKDTree_MP(input_coords, nprocs=nprocs)
+        resample_kdtree = _spatial_mp.get_kdtree_class()(input_coords, nprocs=nprocs)
     else:
         resample_kdtree = KDTree(input_coords)
 
@@ -516,7 +989,8 @@ def _query_resample_kdtree(resample_kdtree,
                            neighbours=8,
                            epsilon=0,
                            reduce_data=True,
-                           nprocs=1):
+                           nprocs=1,
+                           dtype=None):
     """Query kd-tree on slice of target coordinates"""
 
     # Check validity of input
@@ -529,9 +1003,44 @@ def _query_resample_kdtree(resample_kdtree,
     elif not isinstance(epsilon, (long, int, float)):
         raise TypeError('epsilon must be number')
 
+    if dtype is None:
+        dtype = source_geo_def.dtype
+    if isinstance(target_geo_def, geometry.AreaDefinition) and \
+            TARGET_COORDS_CACHE is not None:
+        # Areas are never reduced, so their coordinates don't depend on
+        # the source
+        valid_output_index, output_coords = \
+            _get_cached_target_coords(target_geo_def, data_slice, dtype,
+                                      nprocs=nprocs)
+    else:
+        valid_output_index, output_coords = \
+            _get_target_coords(source_geo_def, target_geo_def, data_slice,
+                               dtype, reduce_data, radius_of_influence,
+                               nprocs=nprocs)
+
+    # pykdtree requires query points have same data type as kdtree.
+    try:
+        dt = resample_kdtree.data.dtype
+    except AttributeError:
+        # use a sensible default
+        dt = np.dtype('d')
+    output_coords = np.asarray(output_coords, dtype=dt)
+
+    # Query kd-tree
+    distance_array, index_array = resample_kdtree.query(output_coords,
+                                                        k=neighbours,
+                                                        eps=epsilon,
+                                                        distance_upper_bound=radius_of_influence)
+
+    return valid_output_index, index_array, distance_array
+
+
+def _get_target_coords(source_geo_def, target_geo_def, data_slice, dtype,
+                       reduce_data, radius_of_influence, nprocs=1):
+    """Get the valid output index and cartesian coordinates of the valid target pixels."""
     # Get sliced target coordinates
     target_lons, target_lats = target_geo_def.get_lonlats(nprocs=nprocs,
-                                                          data_slice=data_slice, dtype=source_geo_def.dtype)
+                                                          data_slice=data_slice, dtype=dtype)
 
     # Find indiced of reduced target coordinates
     valid_output_index = _get_valid_output_index(source_geo_def,
@@ -543,7 +1052,7 @@ def _query_resample_kdtree(resample_kdtree,
 
     # Get cartesian target coordinates and select reduced set
     if nprocs > 1:
-        cartesian = _spatial_mp.Cartesian_MP(nprocs)
+        cartesian = _spatial_mp.get_cartesian_class()(nprocs)
     else:
         cartesian = _spatial_mp.Cartesian()
 
@@ -552,20 +1061,104 @@ def _query_resample_kdtree(resample_kdtree,
 
     output_coords = cartesian.transform_lonlats(target_lons_valid,
                                                 target_lats_valid)
+    return valid_output_index, output_coords
 
-    # pykdtree requires query points have same data type as kdtree.
-    try:
-        dt = resample_kdtree.data.dtype
-    except AttributeError:
-        # use a sensible default
-        dt = np.dtype('d')
-    output_coords = np.asarray(output_coords, dtype=dt)
 
-    # Query kd-tree
-    distance_array, index_array = resample_kdtree.query(output_coords,
-                                                        k=neighbours,
-                                                        eps=epsilon,
-                                                        distance_upper_bound=radius_of_influence)
+def _get_cached_target_coords(target_geo_def, data_slice, dtype, nprocs=1):
+    """Get the target coordinates of an area from `TARGET_COORDS_CACHE`."""
+    the_hash = target_geo_def.update_hash()
+    hash_dict({'dtype': np.dtype(dtype).str, 'data_slice': repr(data_slice)},
+              the_hash)
+    key = 'target_coords_' + the_hash.hexdigest()
+    arrays = TARGET_COORDS_CACHE.get(key)
+    if arrays is None:
+        valid_output_index, output_coords = \
+            _get_target_coords(None, target_geo_def, data_slice, dtype,
+                               False, None, nprocs=nprocs)
+        arrays = TARGET_COORDS_CACHE.put(key, {'valid_output_index': valid_output_index,
+                                               'coords': output_coords})
+    # The valid output index is handed out to the caller, who may modify it
+    return np.array(arrays['valid_output_index']), arrays['coords']
+
+
+def _get_segments(target_geo_def, neighbours, dtype=np.float64):
+    """Get the number of segments keeping each query within the memory budget.
+
+    The estimate covers the target lon/lat and cartesian coordinates and the
+    index and distance arrays of every target pixel.
+
+    """
+    itemsize = np.dtype(dtype).itemsize
+    bytes_per_pixel = 5 * itemsize + neighbours * (itemsize + 8)
+    segments = int(np.ceil(target_geo_def.size * bytes_per_pixel /
+                           float(SEGMENT_MEMORY_BUDGET)))
+    return max(segments, 1)
+
+
+def _query_resample_kdtree_segments(resample_kdtree,
+                                    source_geo_def,
+                                    target_geo_def,
+                                    radius_of_influence,
+                                    segments,
+                                    neighbours=8,
+                                    epsilon=0,
+                                    reduce_data=True,
+                                    nprocs=1,
+                                    dtype=None):
+    """Query kd-tree on segments of target rows using a pool of `nprocs` threads.
+
+    Every segment writes its result to the part of the preallocated output
+    arrays starting at the segment's offset in the target. The results are
+    then moved together so that only valid output pixels are kept.
+
+    """
+    target_size = target_geo_def.size
+    row_size = target_size // target_geo_def.shape[0]
+    valid_output_index = np.zeros(target_size, dtype=bool)
+    outputs = {}
+    lock = threading.Lock()
+
+    def query_segment(target_slice):
+        next_voi, next_ia, next_da = \
+            _query_resample_kdtree(resample_kdtree, source_geo_def,
+                                   target_geo_def,
+                                   radius_of_influence, target_slice,
+                                   neighbours=neighbours,
+                                   epsilon=epsilon,
+                                   reduce_data=reduce_data,
+                                   nprocs=1, dtype=dtype)
+        with lock:
+            if not outputs:
+                # The result types depend on the kd-tree implementation
+                outputs['index'] = np.empty((target_size,) + next_ia.shape[1:],
+                                            dtype=next_ia.dtype)
+                outputs['distance'] = np.empty((target_size,) + next_da.shape[1:],
+                                               dtype=next_da.dtype)
+        row_slice = target_slice[0] if isinstance(target_slice, tuple) else target_slice
+        start = row_slice.start * row_size
+        size = next_ia.shape[0]
+        valid_output_index[start:start + next_voi.size] = next_voi
+        outputs['index'][start:start + size] = next_ia
+        outputs['distance'][start:start + size] = next_da
+        return start, size
+
+    target_slices = geometry._get_slice(segments, target_geo_def.shape)
+    with ThreadPoolExecutor(max_workers=nprocs) as executor:
+        segment_positions = list(executor.map(query_segment, target_slices))
+
+    index_array = outputs['index']
+    distance_array = outputs['distance']
+    # Move the valid results of each segment to follow the previous ones
+    offset = 0
+    for start, size in segment_positions:
+        if start != offset:
+            index_array[offset:offset + size] = index_array[start:start + size]
+            distance_array[offset:offset + size] = distance_array[start:start + size]
+        offset += size
+    if offset < target_size:
+        # Copies release the buffers sized for the whole target
+        index_array = index_array[:offset].copy()
+        distance_array = distance_array[:offset].copy()
 
     return valid_output_index, index_array, distance_array
 
@@ -696,145 +1289,41 @@ def get_sample_from_neighbour_info(resample_type, output_shape, data,
         conserve_input_data_type = True
         input_data_type = new_data.dtype
 
-    # Handle masked array input
-    is_masked_data = False
+    # Handle masked array input. The mask is resampled along with the data
+    new_mask = None
     if np.ma.is_masked(new_data):
-        # Add the mask as channels to the dataset
-        is_masked_data = True
-        new_data = np.column_stack((new_data.data, new_data.mask))
+        new_mask = new_data.mask
+        new_data = new_data.data
 
-    if new_data.ndim > 1:  # Multiple channels or masked input
+    if new_data.ndim > 1:  # Multiple channels
         output_shape = list(output_shape)
         output_shape.append(new_data.shape[1])
 
-    # Prepare weight_funcs argument for handeling mask data
-    if weight_funcs is not None and is_masked_data:
-        if is_multi_channel:
-            weight_funcs = weight_funcs * 2
-        else:
-            weight_funcs = (weight_funcs,) * 2
-
     # Handle request for masking intead of using fill values
     use_masked_fill_value = False
     if fill_value is None:
         use_masked_fill_value = True
         fill_value = _get_fill_mask_value(new_data.dtype)
+    # Pixels without neighbours are masked for nonzero fill values
+    mask_fill_value = fill_value != 0
 
     # Resample based on kd-tree query result
+    result_mask = None
     if resample_type == 'nn' or neighbours == 1:
         # Get nearest neighbour using array indexing
         index_mask = (index_array == input_size)
         new_index_array = np.where(index_mask, 0, index_array)
-        result = new_data[new_index_array].copy()
+        result = new_data[new_index_array]
         result[index_mask] = fill_value
+        if new_mask is not None:
+            result_mask = new_mask[new_index_array]
+            result_mask[index_mask] = mask_fill_value
     else:
-        # Calculate result using weighting.
-        # Note: the code below has low readability in order
-        #       to avoid looping over numpy arrays
-
-        # Get neighbours and masks of valid indices
-        ch_neighbour_list = []
-        index_mask_list = []
-        for i in range(neighbours):  # Iterate over number of neighbours
-            # Make working copy neighbour index and
-            # set out of bounds indices to zero
-            index_ni = index_array[:, i].copy()
-            index_mask_ni = (index_ni == input_size)
-            index_ni[index_mask_ni] = 0
-
-            # Get channel data for the corresponing indices
-            ch_ni = new_data[index_ni]
-            ch_neighbour_list.append(ch_ni)
-            index_mask_list.append(index_mask_ni)
-
-        # Calculate weights
-        weight_list = []
-        for i in range(neighbours):  # Iterate over number of neighbours
-            # Make working copy of neighbour distances and
-            # set out of bounds distance to 1 in order to avoid numerical Inf
-            distance = distance_array[:, i].copy()
-            distance[index_mask_list[i]] = 1
-
-            if new_data.ndim > 1:  # More than one channel in data set.
-                # Calculate weights for each channel
-                weights = []
-                num_weights = valid_output_index.sum()
-                num_channels = new_data.shape[1]
-                for j in range(num_channels):
-                    calc_weight = weight_funcs[j](distance)
-                    # Turn a scalar weight into a numpy array
-                    # (no effect if calc_weight already is an array)
-                    expanded_calc_weight = np.ones(num_weights) * calc_weight
-                    weights.append(expanded_calc_weight)
-
-                # Collect weights for all channels for neighbour number
-                weight_list.append(np.column_stack(weights))
-            else:  # Only one channel
-                weights = weight_funcs(distance)
-                weight_list.append(weights)
-
-        result = 0
-        norm = 0
-        count = 0
-        norm_sqr = 0
-        stddev = 0
-
-        # Calculate result
-        for i in range(neighbours):  # Iterate over number of neighbours
-            # Find invalid indices to be masked of from calculation
-            if new_data.ndim > 1:  # More than one channel in data set.
-                inv_index_mask = np.expand_dims(
-                    np.invert(index_mask_list[i]), axis=1)
-            else:  # Only one channel
-                inv_index_mask = np.invert(index_mask_list[i])
-
-            # Aggregate result and norm
-            weights_tmp = inv_index_mask * weight_list[i]
-            result += weights_tmp * ch_neighbour_list[i]
-            norm += weights_tmp
-
-        # Normalize result and set fillvalue
-        result_valid_index = (norm > 0)
-        result[result_valid_index] /= norm[result_valid_index]
-
-        if with_uncert:  # Calculate uncertainties
-            # 2. pass to calculate standard deviation
-            for i in range(neighbours):  # Iterate over number of neighbours
-                # Find invalid indices to be masked of from calculation
-                if new_data.ndim > 1:  # More than one channel in data set.
-                    inv_index_mask = np.expand_dims(
-                        np.invert(index_mask_list[i]), axis=1)
-                else:  # Only one channel
-                    inv_index_mask = np.invert(index_mask_list[i])
-
-                # Aggregate stddev information
-                weights_tmp = inv_index_mask * weight_list[i]
-                count += inv_index_mask
-                norm_sqr += weights_tmp ** 2
-                values = inv_index_mask * ch_neighbour_list[i]
-                stddev += weights_tmp * (values - result) ** 2
-
-            # Calculate final stddev
-            new_valid_index = (count > 1)
-            if stddev.ndim >= 2:
-                # If given more than 1 input data array
-                new_valid_index = new_valid_index[:, 0]
-                for i in range(stddev.shape[-1]):
-                    v1 = norm[new_valid_index, i]
-                    v2 = norm_sqr[new_valid_index, i]
-                    stddev[new_valid_index, i] = np.sqrt(
-                        (v1 / (v1 ** 2 - v2)) * stddev[new_valid_index, i])
-                    stddev[~new_valid_index, i] = np.NaN
-            else:
-                # If given single input data array
-                v1 = norm[new_valid_index]
-                v2 = norm_sqr[new_valid_index]
-                stddev[new_valid_index] = np.sqrt(
-                    (v1 / (v1 ** 2 - v2)) * stddev[new_valid_index])
-                stddev[~new_valid_index] = np.NaN
-
-        # Add fill values
-        result[np.invert(result_valid_index)] = fill_value
+        # Calculate result using weighting
+        result, stddev, count, result_mask = \
+            _get_weighted_sum(new_data, index_array, distance_array,
+                              input_size, weight_funcs, fill_value,
+                              with_uncert=with_uncert, mask=new_mask)
 
     # Create full result
     if new_data.ndim > 1:  # More than one channel
@@ -842,14 +1331,20 @@ def get_sample_from_neighbour_info(resample_type, output_shape, data,
     else:  # One channel
         output_raw_shape = output_size
 
-    full_result = np.ones(output_raw_shape) * fill_value
+    full_result = np.full(output_raw_shape, fill_value, dtype=np.float64)
     full_result[valid_output_index] = result
     result = full_result
+    if result_mask is not None:
+        full_mask = np.full(output_raw_shape, mask_fill_value, dtype=bool)
+        full_mask[valid_output_index] = result_mask
+        result_mask = full_mask
 
     if with_uncert:  # Add fill values for uncertainty
-        full_stddev = np.ones(output_raw_shape) * np.nan
+        full_stddev = np.full(output_raw_shape, np.nan)
         full_count = np.zeros(output_raw_shape)
         full_stddev[valid_output_index] = stddev
+        if new_data.ndim > 1:
+            count = count[:, np.newaxis]
         full_count[valid_output_index] = count
         stddev = full_stddev
         count = full_count
@@ -857,19 +1352,15 @@ def get_sample_from_neighbour_info(resample_type, output_shape, data,
         stddev = stddev.reshape(output_shape)
         count = count.reshape(output_shape)
 
-        if is_masked_data:  # Ignore uncert computation of masks
-            stddev = _remask_data(stddev, is_to_be_masked=False)
-            count = _remask_data(count, is_to_be_masked=False)
-
         # Set masks for invalid stddev
         stddev = np.ma.array(stddev, mask=np.isnan(stddev))
 
     # Reshape resampled data to correct shape
     result = result.reshape(output_shape)
 
-    # Remap mask channels to create masked output
-    if is_masked_data:
-        result = _remask_data(result)
+    # Create masked output from the resampled mask
+    if result_mask is not None:
+        result = np.ma.array(result, mask=result_mask.reshape(output_shape))
 
     # Create masking of fill values
     if use_masked_fill_value:
@@ -888,6 +1379,263 @@ def get_sample_from_neighbour_info(resample_type, output_shape, data,
         return result
 
 
+def get_sample_from_neighbour_info_batch(resample_type, output_shape, channels,
+                                         valid_input_index, valid_output_index,
+                                         index_array, distance_array=None,
+                                         weight_funcs=None, fill_value=0,
+                                         out=None):
+    """Resamples several datasets of the same swath based on neighbour info
+
+    Unlike :func:`get_sample_from_neighbour_info` the channels are not
+    stacked: each one is gathered directly from the source array into its own
+    output array. Masks of masked arrays are resampled as separate boolean
+    arrays.
+
+    Parameters
+    ----------
+    resample_type : {'nn', 'custom'}
+        'nn': Use nearest neighbour resampling
+        'custom': Resample based on weight_funcs
+    output_shape : (int, int)
+        Shape of output as (rows, cols)
+    channels : list or dict of numpy arrays
+        Source datasets, each with the size of the source geometry.
+        Masked arrays are supported.
+    valid_input_index : numpy array
+        valid_input_index from get_neighbour_info
+    valid_output_index : numpy array
+        valid_output_index from get_neighbour_info
+    index_array : numpy array
+        index_array from get_neighbour_info
+    distance_array : numpy array, optional
+        distance_array from get_neighbour_info
+        Not needed for 'nn' resample type
+    weight_funcs : function object, or list or dict of function objects, optional
+        Weight function f(dist) to use for all channels, or one weight
+        function per channel given in the same way as `channels`.
+        Must be supplied when using 'custom' resample type
+    fill_value : int, float, numpy floating, numpy integer or None, optional
+        Set undetermined pixels to this value.
+        If fill_value is None masked arrays are returned
+        with undetermined pixels masked
+    out : list or dict of numpy arrays, optional
+        C-contiguous arrays of shape `output_shape` to write the results to,
+        given in the same way as `channels`
+
+    Returns
+    -------
+    result : list or dict of numpy arrays
+        Source datasets resampled to target geometry, in the same container
+        type as `channels`. Nearest neighbour resampling conserves the data
+        type, weighted resampling returns float64 unless `out` is given.
+    """
+    if isinstance(channels, dict):
+        names = list(channels.keys())
+    else:
+        names = list(range(len(channels)))
+        channels = list(channels)
+
+    valid_types = ('nn', 'custom')
+    if resample_type not in valid_types:
+        raise TypeError('Invalid resampling type: %s' % resample_type)
+    if resample_type == 'custom' and weight_funcs is None:
+        raise ValueError('weight_funcs must be supplied when using '
+                         'custom resampling')
+    if resample_type == 'nn' and index_array.ndim > 1 and index_array.shape[1] > 1:
+        raise ValueError('index_array contains more neighbours than '
+                         'just the nearest')
+    for name in names:
+        if channels[name].size != valid_input_index.size:
+            raise ValueError('Mismatch between geometry and dataset %s' % str(name))
+    if callable(weight_funcs):
+        weight_funcs = dict.fromkeys(names, weight_funcs)
+
+    output_size = int(np.prod(output_shape))
+    valid_output_index = valid_output_index.ravel()
+    # Neighbour indices into the full, unreduced source arrays, so that the
+    # channels never need to be reduced by valid_input_index
+    source_positions = np.flatnonzero(valid_input_index)
+    index_mask = index_array >= source_positions.size
+    if source_positions.size > 0:
+        source_index = source_positions[np.where(index_mask, 0, index_array)]
+    else:
+        source_index = np.zeros(index_array.shape, dtype=np.intp)
+
+    results = {}
+    if resample_type == 'nn' or index_array.ndim == 1:
+        # Gather through an index covering all output pixels, so that each
+        # channel is taken directly into its output array
+        gather_index = np.zeros(output_size, dtype=np.intp)
+        gather_index[valid_output_index] = source_index.reshape(-1)
+        fill_mask = np.ones(output_size, dtype=bool)
+        fill_mask[valid_output_index] = index_mask.reshape(-1)
+        for name in names:
+            data = channels[name]
+            if resample_type == 'nn':
+                dtype = data.dtype
+            else:
+                dtype = np.float64
+            result = _get_output_array(out, name, output_shape, dtype)
+            result_flat = result.reshape(-1)
+            source = np.ma.getdata(data).reshape(-1)
+            if source.dtype == result.dtype:
+                np.take(source, gather_index, out=result_flat)
+            else:
+                # np.take only writes to outputs of the source type
+                result_flat[:] = source[gather_index]
+            result_flat[fill_mask] = _get_batch_fill_value(fill_value, result.dtype)
+            mask = None
+            if np.ma.getmask(data) is not np.ma.nomask:
+                mask = np.take(np.ma.getmaskarray(data).reshape(-1), gather_index)
+                mask[fill_mask] = fill_value is None
+            elif fill_value is None:
+                mask = fill_mask.copy()
+            results[name] = _mask_result(result, mask, output_shape)
+    else:
+        output_positions = np.flatnonzero(valid_output_index)
+        source_index[index_mask] = -1
+        # Set out of bounds distance to 1 in order to avoid numerical Inf
+        distance_array = np.where(index_mask, 1, distance_array)
+        neighbours = index_array.shape[1]
+        block_size = max(WEIGHT_BLOCK_BYTES // (8 * neighbours), 1)
+        for name in names:
+            data = channels[name]
+            result = _get_output_array(out, name, output_shape, np.float64)
+            result_flat = result.reshape(-1)
+            result_flat[~valid_output_index] = _get_batch_fill_value(fill_value, result.dtype)
+            mask = None
+            data_mask = np.ma.getmask(data)
+            if data_mask is not np.ma.nomask:
+                data_mask = data_mask.reshape(-1)
+                mask = ~valid_output_index if fill_value is None else np.zeros(output_size, dtype=bool)
+            elif fill_value is None:
+                mask = ~valid_output_index
+            channel_data = np.ma.getdata(data).reshape(-1, 1)
+            if channel_data.dtype not in (np.float32, np.float64):
+                channel_data = channel_data.astype(np.float64)
+            block_result = np.empty((min(block_size, output_positions.size), 1))
+            for start in range(0, output_positions.size, block_size):
+                block = slice(start, min(start + block_size, output_positions.size))
+                block_index = source_index[block]
+                weights = weight_funcs[name](distance_array[block])
+                weights = np.broadcast_to(np.asarray(weights, dtype=np.float64),
+                                          block_index.shape)
+                block_out = block_result[:block_index.shape[0]]
+                _weighted_sum.weighted_sum(channel_data, block_index,
+                                           weights[np.newaxis], block_out,
+                                           _get_batch_fill_value(fill_value, result.dtype))
+                positions = output_positions[block]
+                result_flat[positions] = block_out[:, 0]
+                if mask is None:
+                    continue
+                valid = block_index >= 0
+                if fill_value is None:
+                    # Pixels without positive weights are undetermined
+                    norm = np.where(valid, weights, 0).sum(axis=1)
+                    mask[positions] = norm <= 0
+                if data_mask is not np.ma.nomask:
+                    # All pixels affected by masked pixels are masked out
+                    masked = valid & (weights != 0) & data_mask[np.where(valid, block_index, 0)]
+                    mask[positions] |= masked.any(axis=1)
+            results[name] = _mask_result(result, mask, output_shape)
+
+    if isinstance(channels, dict):
+        return results
+    return [results[name] for name in names]
+
+
+def _get_output_array(out, name, output_shape, dtype):
+    """Get the output array of a channel for the batch resampling."""
+    if out is None:
+        return np.empty(output_shape, dtype=dtype)
+    result = out[name]
+    if tuple(result.shape) != tuple(output_shape):
+        raise ValueError('Output array of %s has shape %s, expected %s' %
+                         (str(name), str(result.shape), str(tuple(output_shape))))
+    if not result.flags.c_contiguous:
+        raise ValueError('Output array of %s must be C-contiguous' % str(name))
+    return result
+
+
+def _get_batch_fill_value(fill_value, dtype):
+    """Get the value written to undetermined pixels."""
+    if fill_value is None:
+        return _get_fill_mask_value(dtype)
+    return fill_value
+
+
+def _mask_result(result, mask, output_shape):
+    """Attach the boolean `mask` to `result` without copying the data."""
+    if mask is None:
+        return result
+    return np.ma.array(result, mask=mask.reshape(output_shape), copy=False)
+
+
+def _get_weighted_sum(new_data, index_array, distance_array, input_size,
+                      weight_funcs, fill_value, with_uncert=False, mask=None):
+    """Calculate the weighted average of the neighbours of each output pixel.
+
+    The output pixels are handled in blocks, so that the weights never take
+    more than `WEIGHT_BLOCK_BYTES` of memory. If the `mask` of the data is
+    given, output pixels with a positive weight on a masked neighbour are
+    masked in the returned result mask.
+
+    """
+    num_out, neighbours = index_array.shape
+    if new_data.ndim > 1:
+        channel_data = new_data
+    else:
+        channel_data = new_data[:, np.newaxis]
+        weight_funcs = [weight_funcs]
+        if mask is not None:
+            mask = mask[:, np.newaxis]
+    if channel_data.dtype not in (np.float32, np.float64):
+        channel_data = channel_data.astype(np.float64)
+    channels = channel_data.shape[1]
+
+    result = np.empty((num_out, channels))
+    if with_uncert:
+        stddev = np.empty((num_out, channels))
+        count = np.empty(num_out)
+    else:
+        stddev = None
+        count = None
+    if mask is not None:
+        # Boolean arrays are handed to the kernel as bytes without copying
+        mask = mask.view(np.uint8)
+        result_mask = np.empty((num_out, channels), dtype=bool)
+    else:
+        result_mask = None
+
+    block_size = max(WEIGHT_BLOCK_BYTES // (8 * neighbours * channels), 1)
+    weights = np.empty((channels, min(block_size, num_out), neighbours))
+    for start in range(0, num_out, block_size):
+        block = slice(start, min(start + block_size, num_out))
+        index_mask = index_array[block] >= input_size
+        block_index = np.where(index_mask, -1, index_array[block]).astype(np.intp)
+        # Set out of bounds distance to 1 in order to avoid numerical Inf
+        distance = np.where(index_mask, 1, distance_array[block])
+        block_weights = weights[:, :block_index.shape[0]]
+        for j in range(channels):
+            # Scalar weights are broadcast to all neighbours
+            block_weights[j] = weight_funcs[j](distance)
+        _weighted_sum.weighted_sum(
+            channel_data, block_index, block_weights, result[block],
+            fill_value,
+            stddev=stddev[block] if with_uncert else None,
+            count=count[block] if with_uncert else None,
+            mask=mask,
+            result_mask=result_mask[block].view(np.uint8) if mask is not None else None)
+
+    if new_data.ndim == 1:
+        result = result[:, 0]
+        if with_uncert:
+            stddev = stddev[:, 0]
+        if mask is not None:
+            result_mask = result_mask[:, 0]
+    return result, stddev, count, result_mask
+
+
 def lonlat2xyz(lons, lats):
     R = 6370997.0
     x_coords = R * np.cos(np.deg2rad(lats)) * np.cos(np.deg2rad(lons))
@@ -902,7 +1650,7 @@ def lonlat2xyz(lons, lats):
 def query_no_distance(target_lons, target_lats, valid_output_index,
                       mask=None, valid_input_index=None,
                       neighbours=None, epsilon=None, radius=None,
-                      kdtree=None):
+                      kdtree=None, index_dtype=np.int64):
     """Query the kdtree. No distances are returned.
 
     NOTE: Dask array arguments must always come before other keyword arguments
@@ -911,13 +1659,246 @@ def query_no_distance(target_lons, target_lats, valid_output_index,
     """
     voi = valid_output_index
     shape = voi.shape + (neighbours,)
+    distance_array, index_array = _query_valid_targets(
+        target_lons, target_lats, voi, mask, valid_input_index,
+        neighbours, epsilon, radius, kdtree)
+
+    # KDTree query returns out-of-bounds neighbors as `len(arr)`
+    # which is an invalid index, we mask those out so -1 represents
+    # invalid values
+    # voi is 2D (trows, tcols)
+    # index_array is 2D (valid output pixels, neighbors)
+    # there are as many Trues in voi as rows in index_array
+    good_pixels = index_array < kdtree.n
+    res_ia = np.empty(shape, dtype=index_dtype)
+    mask = np.zeros(shape, dtype=bool)
+    mask[voi, :] = good_pixels
+    res_ia[mask] = index_array[good_pixels]
+    res_ia[~mask] = -1
+    return res_ia
+
+
+def query_with_distance(target_lons, target_lats, valid_output_index,
+                        mask=None, valid_input_index=None,
+                        neighbours=None, epsilon=None, radius=None,
+                        kdtree=None):
+    """Query the kdtree. Indices and distances are returned together.
+
+    The result has the shape (rows, cols, neighbours, 2) and holds the
+    index of the neighbours in ``[..., 0]`` and their distance in
+    ``[..., 1]``, so that a single `da.blockwise` call yields both. Missing
+    neighbours have the index -1 and an infinite distance. Indices are
+    stored as float64, which represents them exactly.
+
+    NOTE: Dask array arguments must always come before other keyword arguments
+          for `da.blockwise` arguments to work.
+
+    """
+    voi = valid_output_index
+    distance_array, index_array = _query_valid_targets(
+        target_lons, target_lats, voi, mask, valid_input_index,
+        neighbours, epsilon, radius, kdtree)
+
+    good_pixels = index_array < kdtree.n
+    res = np.empty(voi.shape + (neighbours, 2))
+    res[..., 0] = -1
+    res[..., 1] = np.inf
+    res_valid = res[voi]
+    res_valid[good_pixels, 0] = index_array[good_pixels]
+    res_valid[good_pixels, 1] = distance_array[good_pixels]
+    res[voi] = res_valid
+    return res
+
+
+def query_kdtree_forest(target_lons, target_lats, valid_output_index,
+                        *trees, neighbours=None, epsilon=None, radius=None,
+                        index_dtype=np.int64, with_distance=False):
+    """Query the kd-trees of several source chunks and merge the results.
+
+    Each of `trees` is a kd-tree built by :func:`_create_chunk_kdtree`
+    together with the index of its points among all valid source pixels,
+    or None for chunks without valid pixels. The closest `neighbours` of
+    all trees are returned like :func:`query_no_distance`, or like
+    :func:`query_with_distance` when `with_distance` is True.
+
+    """
+    voi = valid_output_index
+    voir = voi.ravel()
+    coords = lonlat2xyz(target_lons.ravel()[voir], target_lats.ravel()[voir])
+    num_valid = coords.shape[0]
+    # Start with missing neighbours, so that there are always enough
+    distances = [np.full((num_valid, neighbours), np.inf)]
+    indices = [np.full((num_valid, neighbours), -1, dtype=np.int64)]
+    for tree in trees:
+        if tree is None or num_valid == 0:
+            continue
+        kdtree, reduced_index = tree
+        distance_array, index_array = kdtree.query(
+            coords.astype(kdtree.data.dtype, copy=False),
+            k=neighbours,
+            eps=epsilon,
+            distance_upper_bound=radius)
+        if index_array.ndim == 1:
+            index_array = index_array[:, None]
+            distance_array = distance_array[:, None]
+        good_pixels = index_array < kdtree.n
+        index_array = np.where(good_pixels, index_array, 0)
+        indices.append(np.where(good_pixels, reduced_index[index_array], -1))
+        distances.append(np.where(good_pixels, distance_array, np.inf))
+    distances = np.concatenate(distances, axis=1)
+    indices = np.concatenate(indices, axis=1)
+    closest = np.argsort(distances, axis=1, kind='stable')[:, :neighbours]
+    distances = np.take_along_axis(distances, closest, axis=1)
+    indices = np.take_along_axis(indices, closest, axis=1)
+
+    shape = voi.shape + (neighbours,)
+    if with_distance:
+        res = np.empty(shape + (2,))
+        res[..., 0] = -1
+        res[..., 1] = np.inf
+        res[voi, :, 0] = indices
+        res[voi, :, 1] = distances
+        return res
+    res_ia = np.full(shape, -1, dtype=index_dtype)
+    res_ia[voi] = indices
+    return res_ia
+
+
+def _get_chunk_spheres(lons, lats):
+    """Get the delayed bounding spheres of the chunks of lon/lat arrays."""
+    get_sphere = dask.delayed(_get_bounding_sphere, pure=True)
+    return [get_sphere(lon_block, lat_block) for lon_block, lat_block in
+            zip(lons.to_delayed().ravel(), lats.to_delayed().ravel())]
+
+
+def _create_chunk_kdtree(lons, lats, valid_input_index, reduced_index,
+                         mask=None, dtype=None):
+    """Build the kd-tree of the valid pixels of a source chunk.
+
+    Returns the tree and the index of its points among all valid source
+    pixels, or None if the chunk has no valid pixels.
+
+    """
+    valid = valid_input_index
+    if mask is not None:
+        valid = valid & ~mask
+    if not valid.any():
+        return None
+    if dtype is not None:
+        lons = lons.astype(dtype)
+        lats = lats.astype(dtype)
+    coords = lonlat2xyz(lons[valid], lats[valid]).astype(dtype or np.float64)
+    return KDTree(coords), reduced_index[valid]
+
+
+def _get_bounding_sphere(lons, lats):
+    """Get the center and radius of a sphere around the valid pixels in ECEF coordinates."""
+    valid = (lons >= -180) & (lons <= 180) & (lats <= 90) & (lats >= -90)
+    if not valid.any():
+        return None
+    coords = lonlat2xyz(lons[valid], lats[valid])
+    center = coords.mean(axis=0)
+    return center, np.sqrt(((coords - center) ** 2).sum(axis=1)).max()
+
+
+def _get_boundary_ring(lons, lats):
+    """Get the ECEF coordinates of a closed lon/lat boundary, or None if it has invalid points."""
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    valid = (lons >= -180) & (lons <= 180) & (lats <= 90) & (lats >= -90)
+    if lons.size == 0 or not valid.all():
+        return None
+    return lonlat2xyz(lons, lats)
+
+
+def _get_ring_spacing(ring):
+    """Get the largest distance between consecutive points of a closed ring."""
+    steps = np.diff(np.concatenate((ring, ring[:1])), axis=0)
+    return np.sqrt((steps ** 2).sum(axis=1)).max()
+
+
+def _crosses_ring(start, end, ring):
+    """Check if the great circle arc from `start` to `end` crosses `ring` an odd number of times."""
+    edge_ends = np.roll(ring, -1, axis=0)
+    arc_normal = np.cross(start, end)
+    edge_normals = np.cross(ring, edge_ends)
+    straddles = (((ring @ arc_normal) * (edge_ends @ arc_normal) < 0) &
+                 ((edge_normals @ start) * (edge_normals @ end) < 0))
+    # The great circles meet in two opposite points, the arcs must share one
+    intersections = np.cross(arc_normal, edge_normals)
+    same_side = (np.sign(intersections @ (start + end)) ==
+                 np.sign((intersections * (ring + edge_ends)).sum(axis=1)))
+    return np.count_nonzero(straddles & same_side) % 2 == 1
+
+
+def _get_covered_chunks(source_ring, source_center, chunk_rings, chunk_centers,
+                        radius):
+    """Find the target chunks that may have source pixels within `radius`.
+
+    A target chunk is covered if its boundary comes within `radius` of the
+    source boundary, or if one of the boundaries lies inside the other. The
+    boundaries are closed rings of ECEF points, and the distances between
+    them are widened by half their point spacing, so that no covered chunk
+    is missed. Chunks without a ring or center are always covered.
+
+    """
+    source_tree = KDTree(source_ring)
+    source_spacing = _get_ring_spacing(source_ring)
+    covered = np.ones(len(chunk_rings), dtype=bool)
+    for i, (ring, center) in enumerate(zip(chunk_rings, chunk_centers)):
+        if ring is None or center is None:
+            continue
+        tolerance = (source_spacing + _get_ring_spacing(ring)) / 2
+        distance, _ = source_tree.query(ring, k=1)
+        if distance.min() <= radius + tolerance:
+            continue
+        # The boundaries don't cross, so a single point tells if one is inside the other
+        covered[i] = (not _crosses_ring(source_center, ring[0], source_ring) or
+                      not _crosses_ring(center, source_ring[0], ring))
+    return covered
+
+
+def _fill_uncovered_blocks(arr, covered, fill_value, geo_axes=(0, 1)):
+    """Replace the blocks of `arr` in target chunks that aren't `covered` by constant blocks.
+
+    The replaced blocks don't depend on the original tasks, so those are
+    left out when the array is computed.
+
+    """
+    name = 'fill-uncovered-' + tokenize(arr, covered, fill_value, geo_axes)
+    dsk = {}
+    for block in np.ndindex(*arr.numblocks):
+        if covered[tuple(block[axis] for axis in geo_axes)]:
+            dsk[(name,) + block] = (arr.name,) + block
+        else:
+            shape = tuple(chunks[b] for chunks, b in zip(arr.chunks, block))
+            dsk[(name,) + block] = (np.full, shape, fill_value, arr.dtype)
+    graph = HighLevelGraph.from_collections(name, dsk, dependencies=[arr])
+    return da.Array(graph, name, arr.chunks, dtype=arr.dtype)
+
+
+def _get_reduced_index(valid_input_index):
+    """Get the index of each pixel among the valid pixels, in flattened order."""
+    if valid_input_index.ndim == 1:
+        return da.cumsum(valid_input_index) - 1
+    row_counts = valid_input_index.sum(axis=1)
+    row_offsets = da.cumsum(row_counts) - row_counts
+    return row_offsets[:, None] + da.cumsum(valid_input_index, axis=1) - 1
+
+
+def _query_valid_targets(target_lons, target_lats, voi, mask,
+                         valid_input_index, neighbours, epsilon, radius,
+                         kdtree):
+    """Query the kdtree for the valid target pixels of a block."""
     voir = voi.ravel()
     if mask is not None:
         mask = mask.ravel()[valid_input_index.ravel()]
     target_lons_valid = target_lons.ravel()[voir]
     target_lats_valid = target_lats.ravel()[voir]
 
-    coords = lonlat2xyz(target_lons_valid, target_lats_valid)
+    # pykdtree requires query points have same data type as kdtree.
+    coords = lonlat2xyz(target_lons_valid, target_lats_valid).astype(
+        kdtree.data.dtype, copy=False)
     distance_array, index_array = kdtree.query(
         coords,
         k=neighbours,
@@ -927,20 +1908,8 @@ def query_no_distance(target_lons, target_lats, valid_output_index,
 
     if index_array.ndim == 1:
         index_array = index_array[:, None]
-
-    # KDTree query returns out-of-bounds neighbors as `len(arr)`
-    # which is an invalid index, we mask those out so -1 represents
-    # invalid values
-    # voi is 2D (trows, tcols)
-    # index_array is 2D (valid output pixels, neighbors)
-    # there are as many Trues in voi as rows in index_array
-    good_pixels = index_array < kdtree.n
-    res_ia = np.empty(shape, dtype=np.int)
-    mask = np.zeros(shape, dtype=np.bool)
-    mask[voi, :] = good_pixels
-    res_ia[mask] = index_array[good_pixels]
-    res_ia[~mask] = -1
-    return res_ia
+        distance_array = distance_array[:, None]
+    return distance_array, index_array
 
 
 def _my_index(index_arr, vii, data_arr, vii_slices=None, ia_slices=None,
@@ -957,13 +1926,137 @@ def _my_index(index_arr, vii, data_arr, vii_slices=None, ia_slices=None,
     return res
 
 
+def _my_weighted_sum(index_arr, distance_arr, vii, data_arr, geo_axis=0,
+                     weight_funcs=None, fill_value=np.nan, with_uncert=False,
+                     dtype=np.float64):
+    """Helper function for weighted 'get_sample_from_neighbour_info'.
+
+    The geolocation dimensions of `data_arr` are flattened to the single
+    axis `geo_axis`, all other dimensions are handled as channels. With
+    `with_uncert` the result and the standard deviation are stacked along a
+    new last axis.
+
+    """
+    new_data = np.moveaxis(data_arr, geo_axis, 0)[vii.ravel()]
+    channel_shape = new_data.shape[1:]
+    new_data = new_data.reshape(new_data.shape[0], int(np.prod(channel_shape)))
+    input_size = new_data.shape[0]
+    rows, cols, neighbours = index_arr.shape
+    index_array = index_arr.reshape(-1, neighbours)
+    index_array = np.where(index_array < 0, input_size, index_array)
+    distance_array = distance_arr.reshape(-1, neighbours)
+
+    result, stddev, _, _ = _get_weighted_sum(
+        new_data, index_array, distance_array, input_size, weight_funcs,
+        fill_value, with_uncert=with_uncert)
+
+    def _to_output(arr):
+        arr = arr.reshape((rows, cols) + channel_shape).astype(dtype, copy=False)
+        return np.moveaxis(arr, (0, 1), (geo_axis, geo_axis + 1))
+
+    if with_uncert:
+        return np.stack((_to_output(result), _to_output(stddev)), axis=-1)
+    return _to_output(result)
+
+
+def _plan_chunk_gather(index_arr, source_positions, geo_shape, geo_chunks):
+    """Find the source chunks referenced by a block of the index array.
+
+    Args:
+        index_arr: Block of the index array into the valid source pixels, -1
+            for missing neighbours
+        source_positions: Flat position of each valid source pixel in the
+            source geolocation dimensions
+        geo_shape: Shape of the source geolocation dimensions
+        geo_chunks: Dask chunks of the source geolocation dimensions
+
+    Returns:
+        The block indices of the referenced source chunks along the
+        geolocation dimensions, and the index array translated to the
+        concatenation of those chunks, each flattened over the geolocation
+        dimensions.
+
+    """
+    valid = index_arr >= 0
+    coords = np.unravel_index(source_positions[index_arr[valid]], geo_shape)
+    chunk_coords = []
+    local_coords = []
+    for coord, chunks in zip(coords, geo_chunks):
+        starts = np.cumsum((0,) + chunks[:-1])
+        chunk_coord = np.searchsorted(starts, coord, side='right') - 1
+        chunk_coords.append(chunk_coord)
+        local_coords.append(coord - starts[chunk_coord])
+    num_chunks = tuple(len(chunks) for chunks in geo_chunks)
+    chunk_ids, inverse = np.unique(np.ravel_multi_index(chunk_coords, num_chunks),
+                                   return_inverse=True)
+    blocks = [tuple(int(b) for b in block)
+              for block in zip(*np.unravel_index(chunk_ids, num_chunks))]
+
+    # Flat position inside the chunk and offset of the chunk in the gathered data
+    local_pos = np.zeros(inverse.size, dtype=np.intp)
+    chunk_sizes = np.ones(len(blocks), dtype=np.intp)
+    stride = np.ones(inverse.size, dtype=np.intp)
+    for dim in reversed(range(len(geo_shape))):
+        dim_chunks = np.asarray(geo_chunks[dim])
+        local_pos += local_coords[dim] * stride
+        stride *= dim_chunks[chunk_coords[dim]]
+        chunk_sizes *= dim_chunks[[block[dim] for block in blocks]]
+    offsets = np.cumsum(chunk_sizes) - chunk_sizes
+
+    local_index = np.full(index_arr.shape, -1, dtype=np.intp)
+    local_index[valid] = offsets[inverse] + local_pos
+    return blocks, local_index
+
+
+def _gather_sample_block(local_index, distance_arr, blocks, channel_shape,
+                         geo_axis=0, num_geo_dims=1, fill_value=np.nan,
+                         weight_funcs=None, with_uncert=False, dtype=None):
+    """Sample a target block from the source chunks it references.
+
+    The source chunks are flattened over their geolocation dimensions and
+    concatenated in the order :func:`_plan_chunk_gather` returned them.
+
+    """
+    flat_blocks = [block.reshape(block.shape[:geo_axis] + (-1,) +
+                                 block.shape[geo_axis + num_geo_dims:])
+                   for block in blocks]
+    if flat_blocks:
+        data = np.concatenate(flat_blocks, axis=geo_axis)
+    else:
+        data = np.empty(channel_shape[:geo_axis] + (0,) + channel_shape[geo_axis:],
+                        dtype=dtype)
+
+    if weight_funcs is not None:
+        vii = np.ones(data.shape[geo_axis], dtype=bool)
+        return _my_weighted_sum(local_index, distance_arr, vii, data,
+                                geo_axis=geo_axis, weight_funcs=weight_funcs,
+                                fill_value=fill_value, with_uncert=with_uncert,
+                                dtype=dtype)
+
+    # Missing neighbours point to an appended fill value
+    fill = np.full(channel_shape[:geo_axis] + (1,) + channel_shape[geo_axis:],
+                   fill_value, dtype=data.dtype)
+    data = np.concatenate((data, fill), axis=geo_axis)
+    local_index = np.where(local_index < 0, data.shape[geo_axis] - 1, local_index)
+    return np.take(data, local_index[..., 0], axis=geo_axis)
+
+
+NEIGHBOUR_INFO_NAMES = ('valid_input_index', 'valid_output_index',
+                        'index_array', 'distance_array')
+
+
 class XArrayResamplerNN(object):
     def __init__(self,
                  source_geo_def,
                  target_geo_def,
                  radius_of_influence=None,
                  neighbours=1,
-                 epsilon=0):
+                 epsilon=0,
+                 precision='double',
+                 kdtree_forest=False,
+                 skip_empty_chunks=False,
+                 chunks=None,
+                 memory_limit=None):
         """
 
         Parameters
@@ -978,10 +2071,34 @@ class XArrayResamplerNN(object):
             and target geometry definition.
         neighbours : int, optional
             The number of neigbours to consider for each grid point.
-            Default 1. Currently 1 is the only supported number.
+            Default 1. More than one neighbour requires weight functions
+            when sampling, see :meth:`get_sample_from_neighbour_info`.
         epsilon : float, optional
             Allowed uncertainty in meters. Increasing uncertainty
             reduces execution time
+        precision : {'double', 'single'}, optional
+            'single' builds and queries the kd-tree with float32
+            coordinates and returns an int32 index array, see
+            :func:`get_neighbour_info`
+        kdtree_forest : bool, optional
+            Build one kd-tree per source chunk instead of a single tree over
+            all source pixels. The trees are built in parallel, and each
+            target chunk only queries the trees of the source chunks whose
+            bounding spheres are within `radius_of_influence`. The bounding
+            spheres are computed in :meth:`get_neighbour_info`.
+        skip_empty_chunks : bool, optional
+            Compare the boundary of the source with the boundary of each
+            target chunk in :meth:`get_neighbour_info`, and fill the target
+            chunks that can't have neighbours within `radius_of_influence`
+            without querying the kd-tree or sampling the data. Only used for
+            2D sources and `AreaDefinition` targets.
+        chunks : int or tuple, optional
+            Chunk size of the target arrays. Defaults to ``CHUNK_SIZE``.
+        memory_limit : int or str, optional
+            Memory a single target chunk task may use, in bytes or as a
+            string like ``'1GiB'``. The chunk size is then derived from the
+            number of neighbours, the precision and the estimated number of
+            source pixels per target pixel. Can't be combined with `chunks`.
 
         """
         if DataArray is None:
@@ -994,6 +2111,14 @@ class XArrayResamplerNN(object):
         self.delayed_kdtree = None
         self.neighbours = neighbours
         self.epsilon = epsilon
+        self.precision = precision
+        self._dtype = _get_coordinate_dtype(precision)
+        self.kdtree_forest = kdtree_forest
+        self.skip_empty_chunks = skip_empty_chunks
+        self._coverage = None
+        self.chunks = chunks
+        self.memory_limit = memory_limit
+        self._target_chunks = None
         self.source_geo_def = source_geo_def
         self.target_geo_def = target_geo_def
         if radius_of_influence is None:
@@ -1023,20 +2148,185 @@ class XArrayResamplerNN(object):
             radius_of_influence = 10000
         return radius_of_influence
 
+    def _get_task_memory(self):
+        """Estimate the memory of a target chunk task per pixel and in total."""
+        coord_size = np.dtype(self._dtype or np.float64).itemsize
+        index_size = 4 if self.precision == 'single' else 8
+        # Coordinates and index of a kd-tree point
+        tree_bytes = 3 * coord_size + 8
+        # Target lon/lats, their cartesian coordinates and validity
+        pixel_bytes = 5 * coord_size + 1
+        # Query results and the stored index and distance arrays
+        pixel_bytes += self.neighbours * (2 * coord_size + 8 + index_size)
+        if self.neighbours > 1:
+            # query_with_distance stacks indices and distances as float64
+            pixel_bytes += self.neighbours * 16
+        # Result and source data gathered for it, assuming float64 data
+        overlap = get_source_overlap(self.source_geo_def, self.target_geo_def)
+        pixel_bytes += 8 + overlap * 8
+        if self.kdtree_forest:
+            # Only the trees of the overlapping source chunks are queried
+            return pixel_bytes + overlap * tree_bytes, 0
+        return pixel_bytes, self.source_geo_def.size * tree_bytes
+
+    def _get_target_chunks(self):
+        """Get the chunk size of the target arrays from `chunks` or `memory_limit`."""
+        if self._target_chunks is None:
+            pixel_bytes = fixed_bytes = 0
+            if self.memory_limit is not None:
+                pixel_bytes, fixed_bytes = self._get_task_memory()
+            self._target_chunks = get_target_chunks(
+                self.target_geo_def.shape, pixel_bytes, chunks=self.chunks,
+                memory_limit=self.memory_limit, fixed_bytes=fixed_bytes,
+                default=CHUNK_SIZE)
+        return self._target_chunks
+
     def _create_resample_kdtree(self, chunks=CHUNK_SIZE):
         """Set up kd tree on input"""
         source_lons, source_lats = self.source_geo_def.get_lonlats(
             chunks=chunks)
         valid_input_idx = ((source_lons >= -180) & (source_lons <= 180) &
                            (source_lats <= 90) & (source_lats >= -90))
+        if self._dtype is not None:
+            source_lons = source_lons.astype(self._dtype)
+            source_lats = source_lats.astype(self._dtype)
         input_coords = lonlat2xyz(source_lons, source_lats)
         input_coords = input_coords[valid_input_idx.ravel(), :]
 
         # Build kd-tree on input
-        input_coords = input_coords.astype(np.float)
+        input_coords = input_coords.astype(self._dtype or np.float64)
         delayed_kdtree = dask.delayed(KDTree, pure=True)(input_coords)
         return valid_input_idx, delayed_kdtree
 
+    def _create_resample_kdtree_forest(self, chunks=CHUNK_SIZE, mask=None):
+        """Set up a kd-tree for each chunk of the input."""
+        source_lons, source_lats = self.source_geo_def.get_lonlats(
+            chunks=chunks)
+        valid_input_idx = ((source_lons >= -180) & (source_lons <= 180) &
+                           (source_lats <= 90) & (source_lats >= -90))
+        reduced_idx = _get_reduced_index(valid_input_idx)
+        blocks = [source_lons.to_delayed().ravel(),
+                  source_lats.to_delayed().ravel(),
+                  valid_input_idx.to_delayed().ravel(),
+                  reduced_idx.rechunk(valid_input_idx.chunks).to_delayed().ravel()]
+        if mask is not None:
+            blocks.append(mask.rechunk(valid_input_idx.chunks).to_delayed().ravel())
+        create_tree = dask.delayed(_create_chunk_kdtree, pure=True)
+        delayed_kdtrees = [create_tree(*chunk_blocks, dtype=self._dtype)
+                           for chunk_blocks in zip(*blocks)]
+        spheres = dask.compute(*_get_chunk_spheres(source_lons, source_lats))
+        return valid_input_idx, delayed_kdtrees, spheres
+
+    def _query_resample_kdtree_forest(self, resample_kdtrees, source_spheres,
+                                      tlons, tlats, valid_oi, covered=None):
+        """Query the kd-trees near each chunk of target coordinates."""
+        target_spheres = _get_chunk_spheres(tlons, tlats)
+        if covered is not None:
+            target_spheres = [sphere if is_covered else None for sphere, is_covered
+                              in zip(target_spheres, covered.ravel())]
+        target_spheres = dask.compute(*target_spheres)
+        with_distance = self.neighbours > 1
+        index_dtype = np.int32 if self.precision == 'single' else np.int64
+        func = partial(query_kdtree_forest, neighbours=self.neighbours,
+                       epsilon=self.epsilon, radius=self.radius_of_influence,
+                       index_dtype=index_dtype, with_distance=with_distance)
+        name = 'query-kdtree-forest-' + tokenize(
+            tlons, tlats, valid_oi, resample_kdtrees, self.neighbours,
+            self.epsilon, self.radius_of_influence, index_dtype)
+        extra_blocks = (0, 0) if with_distance else (0,)
+        dsk = {}
+        for block, target_sphere in zip(np.ndindex(*tlons.numblocks), target_spheres):
+            trees = []
+            if target_sphere is not None:
+                for tree, source_sphere in zip(resample_kdtrees, source_spheres):
+                    if source_sphere is None:
+                        continue
+                    center_distance = np.sqrt(((target_sphere[0] - source_sphere[0]) ** 2).sum())
+                    if center_distance <= target_sphere[1] + source_sphere[1] + self.radius_of_influence:
+                        trees.append(tree.key)
+            dsk[(name,) + block + extra_blocks] = (
+                func, (tlons.name,) + block, (tlats.name,) + block,
+                (valid_oi.name,) + block) + tuple(trees)
+        chunks = tlons.chunks + ((self.neighbours,),)
+        dtype = index_dtype
+        if with_distance:
+            chunks += ((2,),)
+            dtype = np.float64
+        graph = HighLevelGraph.from_collections(
+            name, dsk, dependencies=[tlons, tlats, valid_oi] + list(resample_kdtrees))
+        res = da.Array(graph, name, chunks, dtype=dtype)
+        if not with_distance:
+            return res, None
+        return (res[..., 0].astype(index_dtype),
+                res[..., 1].astype(self._dtype or np.float64))
+
+    def _get_covered_target_chunks(self, row_chunks, col_chunks):
+        """Find the target chunks that may have neighbours in the source.
+
+        Only the boundaries of the source and of the target chunks are
+        computed. Returns a boolean array with one element per target chunk,
+        or None if the coverage can't be determined this way.
+
+        """
+        if not isinstance(self.target_geo_def, geometry.AreaDefinition) or \
+                self.source_geo_def.ndim != 2:
+            return None
+        rows, cols = self.source_geo_def.shape
+        lons, lats = self.source_geo_def.get_bbox_lonlats()
+        center = self.source_geo_def.get_lonlats(data_slice=(rows // 2, cols // 2))
+        lons, lats, center = dask.compute(lons, lats, center)
+        source_ring = _get_boundary_ring(np.concatenate(lons), np.concatenate(lats))
+        source_center = _get_boundary_ring(*center)
+        if source_ring is None or source_center is None:
+            logger.debug("Source boundary is not valid, querying all target chunks")
+            return None
+
+        row_stops = np.cumsum(row_chunks)
+        row_starts = row_stops - row_chunks
+        col_stops = np.cumsum(col_chunks)
+        col_starts = col_stops - col_chunks
+        num_rows, num_cols = len(row_chunks), len(col_chunks)
+        # Target rows and columns on the chunk edges
+        row_lons, row_lats = self.target_geo_def.get_lonlats(
+            data_slice=(np.concatenate((row_starts, row_stops - 1)), slice(None)),
+            dtype=np.float64)
+        col_lons, col_lats = self.target_geo_def.get_lonlats(
+            data_slice=(slice(None), np.concatenate((col_starts, col_stops - 1))),
+            dtype=np.float64)
+        center_lons, center_lats = self.target_geo_def.get_lonlats(
+            data_slice=((row_starts + row_stops) // 2, slice(None)), dtype=np.float64)
+        center_cols = (col_starts + col_stops) // 2
+        center_lons, center_lats = center_lons[:, center_cols], center_lats[:, center_cols]
+
+        chunk_rings = []
+        chunk_centers = []
+        for i, j in product(range(num_rows), range(num_cols)):
+            row_slice = slice(row_starts[i], row_stops[i])
+            col_slice = slice(col_starts[j], col_stops[j])
+            ring_lons = (row_lons[i, col_slice], col_lons[row_slice, num_cols + j],
+                         row_lons[num_rows + i, col_slice][::-1], col_lons[row_slice, j][::-1])
+            ring_lats = (row_lats[i, col_slice], col_lats[row_slice, num_cols + j],
+                         row_lats[num_rows + i, col_slice][::-1], col_lats[row_slice, j][::-1])
+            chunk_rings.append(_get_boundary_ring(np.concatenate(ring_lons),
+                                                  np.concatenate(ring_lats)))
+            center = _get_boundary_ring(center_lons[i, j], center_lats[i, j])
+            chunk_centers.append(None if center is None else center[0])
+        covered = _get_covered_chunks(source_ring, source_center[0], chunk_rings,
+                                      chunk_centers, self.radius_of_influence)
+        logger.debug("Source covers %d of %d target chunks",
+                     np.count_nonzero(covered), covered.size)
+        return covered.reshape(num_rows, num_cols)
+
+    def _fill_uncovered_chunks(self, arr, dims, fill_value):
+        """Fill the target chunks of `arr` that have no neighbours in the source."""
+        if self._coverage is None or fill_value is None:
+            return arr
+        chunks, covered = self._coverage
+        geo_axes = (dims.index('y'), dims.index('x'))
+        if tuple(arr.chunks[axis] for axis in geo_axes) != chunks:
+            return arr
+        return _fill_uncovered_blocks(arr, covered, fill_value, geo_axes=geo_axes)
+
     def query_resample_kdtree(self,
                               resample_kdtree,
                               tlons,
@@ -1052,16 +2342,161 @@ class XArrayResamplerNN(object):
             args = (mask, dims, self.valid_input_index, dims)
         # res.shape = rows, cols, neighbors
         # j=rows, i=cols, k=neighbors, m=source rows, n=source cols
-        res = blockwise(query_no_distance, 'jik', tlons, 'ji', tlats, 'ji',
+        index_dtype = np.int32 if self.precision == 'single' else np.int64
+        if self.neighbours == 1:
+            res = blockwise(query_no_distance, 'jik', tlons, 'ji', tlats, 'ji',
+                            valid_oi, 'ji', *args, kdtree=resample_kdtree,
+                            neighbours=self.neighbours, epsilon=self.epsilon,
+                            radius=self.radius_of_influence, dtype=index_dtype,
+                            index_dtype=index_dtype,
+                            new_axes={'k': self.neighbours}, concatenate=True)
+            return res, None
+
+        # Distances are needed for weighting multiple neighbours
+        # l=index and distance
+        res = blockwise(query_with_distance, 'jikl', tlons, 'ji', tlats, 'ji',
                         valid_oi, 'ji', *args, kdtree=resample_kdtree,
                         neighbours=self.neighbours, epsilon=self.epsilon,
-                        radius=self.radius_of_influence, dtype=np.int,
-                        new_axes={'k': self.neighbours}, concatenate=True)
-        return res, None
+                        radius=self.radius_of_influence, dtype=np.float64,
+                        new_axes={'k': self.neighbours, 'l': 2},
+                        concatenate=True)
+        index_arr = res[..., 0].astype(index_dtype)
+        distance_arr = res[..., 1].astype(self._dtype or np.float64)
+        return index_arr, distance_arr
+
+    def get_hash(self):
+        """Get a hash of the geometries and search parameters of the neighbour info."""
+        the_hash = self.source_geo_def.update_hash()
+        self.target_geo_def.update_hash(the_hash)
+        hash_dict({'radius_of_influence': float(self.radius_of_influence),
+                   'neighbours': self.neighbours,
+                   'epsilon': self.epsilon,
+                   'precision': self.precision}, the_hash)
+        return the_hash.hexdigest()
+
+    def save_neighbour_info(self, filename):
+        """Save the neighbour info computed by :meth:`get_neighbour_info`.
+
+        The arrays are written as chunked, compressed zarr arrays, or to a
+        compressed numpy ``.npz`` file if `filename` ends with ``.npz``.
+        Without zarr, a directory of uncompressed ``.npy`` files is written
+        instead, which :meth:`load_neighbour_info` memory maps.
+
+        """
+        if self.index_array is None:
+            raise ValueError("No neighbour info to save, call "
+                             "'get_neighbour_info' first")
+        arrays = {name: getattr(self, name) for name in NEIGHBOUR_INFO_NAMES
+                  if getattr(self, name) is not None}
+        if filename.endswith('.npz'):
+            np.savez_compressed(filename,
+                                **dict(zip(arrays, dask.compute(*arrays.values()))))
+            return
+        if zarr is None:
+            os.makedirs(filename, exist_ok=True)
+            for name, arr in zip(arrays, dask.compute(*arrays.values())):
+                np.save(os.path.join(filename, name + '.npy'), arr)
+            return
+        # Computing all arrays at once queries the kd-tree only once
+        dask.compute(*[da.to_zarr(da.asarray(arr).rechunk(self._get_info_chunks(name, arr.ndim)),
+                                  filename, component=name, overwrite=True, compute=False)
+                       for name, arr in arrays.items()])
+
+    def load_neighbour_info(self, filename):
+        """Load neighbour info saved by :meth:`save_neighbour_info`.
+
+        Zarr arrays and directories of ``.npy`` files are loaded lazily, so
+        that only the chunks needed for the resampling are read. ``.npz``
+        files are compressed and are read into memory at once.
+
+        Returns
+        -------
+        (valid_input_index, valid_output_index,
+        index_array, distance_array) : tuple of dask arrays
+            Neighbour resampling info
 
-    def get_neighbour_info(self, mask=None):
+        """
+        if filename.endswith('.npz'):
+            with np.load(filename) as fid:
+                arrays = {name: da.from_array(fid[name],
+                                              chunks=self._get_info_chunks(name, fid[name].ndim))
+                          for name in fid.files}
+        elif os.path.isfile(os.path.join(filename, 'index_array.npy')):
+            arrays = {}
+            for name in NEIGHBOUR_INFO_NAMES:
+                path = os.path.join(filename, name + '.npy')
+                if os.path.isfile(path):
+                    arr = np.load(path, mmap_mode='r')
+                    arrays[name] = da.from_array(
+                        arr, chunks=self._get_info_chunks(name, arr.ndim))
+        else:
+            if zarr is None:
+                raise ImportError("Missing 'zarr' dependency")
+            group = zarr.open_group(filename, mode='r')
+            arrays = {name: da.from_zarr(group[name],
+                                         chunks=self._get_info_chunks(name, group[name].ndim))
+                      for name in group.array_keys()}
+        for name in NEIGHBOUR_INFO_NAMES:
+            setattr(self, name, arrays.get(name))
+        self._coverage = None
+        return (self.valid_input_index,
+                self.valid_output_index,
+                self.index_array,
+                self.distance_array)
+
+    def _get_info_chunks(self, name, ndim):
+        """Get the chunks of the saved or loaded neighbour info array `name`.
+
+        The target arrays are chunked like the target of the resampler,
+        with whole neighbour dimensions.
+
+        """
+        if name == 'valid_input_index':
+            return CHUNK_SIZE
+        chunks = self._get_target_chunks()
+        if not isinstance(chunks, tuple):
+            chunks = (chunks, chunks)
+        return (chunks + (-1,) * ndim)[:ndim]
+
+    def _get_cache_filename(self, cache_dir, mask):
+        """Get the filename of the cached neighbour info, or None if it can't be cached."""
+        if cache_dir is None:
+            return None
+        if mask is not None:
+            logger.warning("Neighbour info depends on the mask, it will not "
+                           "be cached.")
+            return None
+        # Both zarr and the .npy directory written without zarr load lazily
+        fmt = '.zarr' if zarr is not None else ''
+        return os.path.join(cache_dir, 'nn_lut-' + self.get_hash() + fmt)
+
+    def _save_cache(self, filename):
+        """Save the neighbour info to the cache without exposing partial files."""
+        dirname, basename = os.path.split(filename)
+        tmp_filename = os.path.join(dirname, '.tmp-%d-%s' % (os.getpid(), basename))
+        self.save_neighbour_info(tmp_filename)
+        try:
+            os.replace(tmp_filename, filename)
+        except OSError:
+            # Another process saved the same neighbour info first
+            if os.path.isdir(tmp_filename):
+                shutil.rmtree(tmp_filename, ignore_errors=True)
+            else:
+                os.remove(tmp_filename)
+
+    def get_neighbour_info(self, mask=None, cache_dir=None):
         """Return neighbour info.
 
+        Parameters
+        ----------
+        mask : xarray.DataArray, optional
+            Source pixels to leave out of the search
+        cache_dir : str, optional
+            Directory for neighbour info keyed on the hash of the geometries
+            and search parameters, see :meth:`get_hash`. Existing neighbour
+            info is loaded lazily from there, otherwise it is computed and
+            saved. Not used when `mask` is given.
+
         Returns
         -------
         (valid_input_index, valid_output_index,
@@ -1069,38 +2504,76 @@ class XArrayResamplerNN(object):
             Neighbour resampling info
 
         """
+        cache_filename = self._get_cache_filename(cache_dir, mask)
+        if cache_filename is not None and os.path.exists(cache_filename):
+            logger.debug("Loading neighbour info from %s", cache_filename)
+            return self.load_neighbour_info(cache_filename)
+
         if self.source_geo_def.size < self.neighbours:
             warnings.warn('Searching for %s neighbours in %s data points' %
                           (self.neighbours, self.source_geo_def.size))
 
         # Create kd-tree
         chunks = mask.chunks if mask is not None else CHUNK_SIZE
-        valid_input_idx, resample_kdtree = self._create_resample_kdtree(
-            chunks=chunks)
+        if mask is not None:
+            assert (mask.shape == self.source_geo_def.shape), \
+                "'mask' must be the same shape as the source geo definition"
+            mask = mask.data
+        if self.kdtree_forest:
+            valid_input_idx, resample_kdtree, source_spheres = \
+                self._create_resample_kdtree_forest(chunks=chunks, mask=mask)
+        else:
+            valid_input_idx, resample_kdtree = self._create_resample_kdtree(
+                chunks=chunks)
         self.valid_input_index = valid_input_idx
         self.delayed_kdtree = resample_kdtree
 
-        # TODO: Add 'chunks' keyword argument to this method and use it
-        target_lons, target_lats = self.target_geo_def.get_lonlats(chunks=CHUNK_SIZE)
+        target_lons, target_lats = self.target_geo_def.get_lonlats(
+            chunks=self._get_target_chunks())
+        if self._dtype is not None:
+            target_lons = target_lons.astype(self._dtype)
+            target_lats = target_lats.astype(self._dtype)
         valid_output_idx = ((target_lons >= -180) & (target_lons <= 180) &
                             (target_lats <= 90) & (target_lats >= -90))
-
-        if mask is not None:
-            assert (mask.shape == self.source_geo_def.shape), \
-                "'mask' must be the same shape as the source geo definition"
-            mask = mask.data
-        index_arr, distance_arr = self.query_resample_kdtree(
-            resample_kdtree, target_lons, target_lats, valid_output_idx, mask)
+        covered = None
+        if self.skip_empty_chunks:
+            covered = self._get_covered_target_chunks(*target_lons.chunks)
+
+        if self.kdtree_forest:
+            # Masked source pixels are left out of the trees
+            index_arr, distance_arr = self._query_resample_kdtree_forest(
+                resample_kdtree, source_spheres, target_lons, target_lats,
+                valid_output_idx, covered=covered)
+        else:
+            index_arr, distance_arr = self.query_resample_kdtree(
+                resample_kdtree, target_lons, target_lats, valid_output_idx,
+                mask)
+
+        if covered is not None:
+            # Target chunks without neighbours need no lon/lats and no query
+            valid_output_idx = _fill_uncovered_blocks(valid_output_idx, covered, False)
+            index_arr = _fill_uncovered_blocks(index_arr, covered, -1)
+            if distance_arr is not None:
+                distance_arr = _fill_uncovered_blocks(distance_arr, covered, np.inf)
+            self._coverage = (target_lons.chunks, covered)
+        else:
+            self._coverage = None
 
         self.valid_output_index, self.index_array = valid_output_idx, index_arr
         self.distance_array = distance_arr
 
+        if cache_filename is not None:
+            self._save_cache(cache_filename)
+            return self.load_neighbour_info(cache_filename)
+
         return (self.valid_input_index,
                 self.valid_output_index,
                 self.index_array,
                 self.distance_array)
 
-    def get_sample_from_neighbour_info(self, data, fill_value=np.nan):
+    def get_sample_from_neighbour_info(self, data, fill_value=np.nan,
+                                       weight_funcs=None, with_uncert=False,
+                                       gather_chunks=False):
         """Get the pixels matching the target area.
 
         This method should work for any dimensionality of the provided data
@@ -1110,11 +2583,18 @@ class XArrayResamplerNN(object):
         ``('y', 'x')``.
 
         This method also attempts to preserve chunk sizes of dask arrays,
-        but does require loading/sharing the fully computed source data before
-        it can actually compute the values to write to the destination array.
-        This can result in large memory usage for large source data arrays,
-        but is a necessary evil until fancier indexing is supported by dask
-        and/or pykdtree.
+        but by default does require loading/sharing the fully computed source
+        data before it can actually compute the values to write to the
+        destination array. This can result in large memory usage for large
+        source data arrays. With `gather_chunks` the neighbour info is
+        computed first to find the source chunks referenced by each target
+        chunk, and each target chunk only depends on those source chunks.
+
+        When the resampler uses more than one neighbour, the neighbours of
+        each target pixel are averaged with the weights given by
+        `weight_funcs`, like the ``'custom'`` resampling of
+        :func:`get_sample_from_neighbour_info`. The target chunks are
+        computed independently.
 
         Args:
             data (xarray.DataArray): Source data pixels to sample
@@ -1123,25 +2603,39 @@ class XArrayResamplerNN(object):
                 integer array then the maximum value for that integer type is
                 used, but otherwise, NaN is used and can be detected in the
                 result with ``res.isnull()``.
+            weight_funcs (callable or list of callables): Weight function
+                f(dist) of the neighbours, or one weight function per channel
+                when the data has dimensions besides the geolocation
+                dimensions. Required for more than one neighbour.
+            with_uncert (bool): Also return the weighted standard deviation
+                and the number of neighbours of each pixel. Only available
+                for more than one neighbour.
+            gather_chunks (bool): Compute the neighbour info now and let
+                every target chunk load only the source chunks it references.
+                Memory then scales with the overlap of the chunks instead of
+                the source size.
 
         Returns:
-            dask.array.Array: The resampled array. The dtype of the array will
-                be the same as the input data. Pixels with no matching data from
+            xarray.DataArray: The resampled array. The dtype of the array will
+                be the same as the input data, or float64 for weighted
+                resampling of integer data. Pixels with no matching data from
                 the input array will be filled (see the `fill_value` parameter
-                description above).
+                description above). With `with_uncert` the standard deviation
+                and the ``('y', 'x')`` neighbour count are returned as well.
         """
-        if fill_value is not None and np.isnan(fill_value) and \
-                np.issubdtype(data.dtype, np.integer):
+        weighted = self.neighbours > 1
+        if weighted and weight_funcs is None:
+            raise ValueError('weight_funcs must be supplied when resampling '
+                             'with more than one neighbour')
+        if with_uncert and not weighted:
+            raise ValueError('with_uncert requires more than one neighbour')
+
+        if not weighted and fill_value is not None and \
+                np.isnan(fill_value) and np.issubdtype(data.dtype, np.integer):
             fill_value = _get_fill_mask_value(data.dtype)
             logger.warning("Fill value incompatible with integer data "
                            "using {:d} instead.".format(fill_value))
 
-        # Convert back to 1 neighbor
-        if self.neighbours > 1:
-            raise NotImplementedError("Nearest neighbor resampling can not "
-                                      "handle more than 1 neighbor yet.")
-        # Convert from multiple neighbor shape to 1 neighbor
-        ia = self.index_array[:, :, 0]
         vii = self.valid_input_index
 
         if isinstance(self.source_geo_def, geometry.SwathDefinition):
@@ -1170,8 +2664,8 @@ class XArrayResamplerNN(object):
         coords = {c: c_var for c, c_var in data.coords.items()
                   if not contain_coords(c_var, src_geo_dims + dst_geo_dims)}
         try:
-            # TODO: Add 'chunks' kwarg
-            coord_x, coord_y = self.target_geo_def.get_proj_vectors(chunks=CHUNK_SIZE)
+            coord_x, coord_y = self.target_geo_def.get_proj_vectors(
+                chunks=self._get_target_chunks())
             coords['y'] = coord_y
             coords['x'] = coord_x
         except AttributeError:
@@ -1211,19 +2705,24 @@ class XArrayResamplerNN(object):
         dst_dim_to_ind = src_dim_to_ind.copy()
         dst_dim_to_ind['y'] = i + 1
         dst_dim_to_ind['x'] = i + 2
-        # FUTURE: when we allow more than one neighbor
-        # neighbors_dim = i + 3
+        neighbors_dim = i + 3
 
         new_data = data.data.reshape(flat_src_shape)
         vii = vii.ravel()
         dst_adims = [dst_dim_to_ind[dim] for dim in dst_dims]
         ia_adims = [dst_dim_to_ind[dim] for dim in dst_geo_dims]
-        # FUTURE: when we allow more than one neighbor add neighbors dimension
-        # dst_adims.append(neighbors_dim)
-        # ia_adims.append(neighbors_dim)
-        # FUTURE: when we allow more than one neighbor we need to add
-        #         the new axis to blockwise:
-        #         `new_axes={neighbor_dim: self.neighbors}`
+        if gather_chunks:
+            return self._get_gathered_sample(
+                data, first_dim_idx, num_dims, dst_dims, coords,
+                weight_funcs if weighted else None, fill_value, with_uncert)
+        if weighted:
+            return self._get_weighted_sample(
+                data, new_data, vii, flat_adim, src_adims, dst_dims,
+                dst_adims, ia_adims + [neighbors_dim], coords, weight_funcs,
+                fill_value, with_uncert)
+
+        # Convert from multiple neighbor shape to 1 neighbor
+        ia = self.index_array[:, :, 0]
         # FUTURE: if/when dask can handle index arrays that are dask arrays
         #         then we can avoid all of this complicated blockwise stuff
         res = blockwise(_my_index, dst_adims,
@@ -1233,11 +2732,147 @@ class XArrayResamplerNN(object):
                         vii_slices=vii_slices, ia_slices=ia_slices,
                         fill_value=fill_value,
                         dtype=new_data.dtype, concatenate=True)
+        res = self._fill_uncovered_chunks(res, dst_dims, fill_value)
         res = DataArray(res, dims=dst_dims, coords=coords,
                         attrs=deepcopy(data.attrs))
 
         return res
 
+    def _get_weighted_sample(self, data, new_data, vii, flat_adim, src_adims,
+                             dst_dims, dst_adims, ia_adims, coords,
+                             weight_funcs, fill_value, with_uncert):
+        """Average the neighbours of each target pixel chunk by chunk."""
+        geo_axis = flat_adim[0]
+        new_data, weight_funcs, dtype = _prepare_weighted_data(
+            new_data, geo_axis, 1, weight_funcs)
+        out_adims = list(dst_adims)
+        new_axes = {}
+        if with_uncert:
+            # result and stddev are stacked along a new last axis
+            stack_dim = ia_adims[-1] + 1
+            out_adims.append(stack_dim)
+            new_axes[stack_dim] = 2
+        res = blockwise(_my_weighted_sum, out_adims,
+                        self.index_array, ia_adims,
+                        self.distance_array, ia_adims,
+                        vii, flat_adim,
+                        new_data, src_adims,
+                        geo_axis=geo_axis, weight_funcs=weight_funcs,
+                        fill_value=fill_value, with_uncert=with_uncert,
+                        dtype=dtype, new_axes=new_axes, concatenate=True)
+        return self._wrap_weighted_result(res, data, dst_dims, coords,
+                                          with_uncert, fill_value)
+
+    def _wrap_weighted_result(self, res, data, dst_dims, coords, with_uncert,
+                              fill_value):
+        """Wrap the result of weighted resampling as DataArrays."""
+        attrs = deepcopy(data.attrs)
+        if not with_uncert:
+            res = self._fill_uncovered_chunks(res, dst_dims, fill_value)
+            return DataArray(res, dims=dst_dims, coords=coords, attrs=attrs)
+
+        result = self._fill_uncovered_chunks(res[..., 0], dst_dims, fill_value)
+        stddev = self._fill_uncovered_chunks(res[..., 1], dst_dims, np.nan)
+        result = DataArray(result, dims=dst_dims, coords=coords,
+                           attrs=attrs)
+        stddev = DataArray(stddev, dims=dst_dims, coords=coords,
+                           attrs=deepcopy(attrs))
+        count = (self.index_array >= 0).sum(axis=2)
+        count = DataArray(count, dims=('y', 'x'),
+                          coords={c: coords[c] for c in ('y', 'x') if c in coords})
+        return result, stddev, count
+
+    def _get_gathered_sample(self, data, geo_axis, num_geo_dims, dst_dims,
+                             coords, weight_funcs, fill_value, with_uncert):
+        """Sample the data with every target chunk depending only on the source chunks it references."""
+        src_data = data.data
+        if weight_funcs is not None:
+            src_data, weight_funcs, dtype = _prepare_weighted_data(
+                src_data, geo_axis, num_geo_dims, weight_funcs)
+            vii, index_arr, distance_arr = dask.compute(
+                self.valid_input_index, self.index_array, self.distance_array)
+        else:
+            dtype = src_data.dtype
+            vii, index_arr = dask.compute(self.valid_input_index,
+                                          self.index_array[:, :, :1])
+            distance_arr = None
+        source_positions = np.flatnonzero(vii.ravel())
+        geo_slice = slice(geo_axis, geo_axis + num_geo_dims)
+        geo_shape = src_data.shape[geo_slice]
+        geo_chunks = src_data.chunks[geo_slice]
+        channel_axes = [ax for ax in range(src_data.ndim)
+                        if not geo_axis <= ax < geo_axis + num_geo_dims]
+        channel_chunks = [src_data.chunks[ax] for ax in channel_axes]
+
+        token = tokenize(src_data, index_arr, distance_arr, fill_value,
+                         with_uncert, weight_funcs, dtype)
+        name = 'gather-sample-' + token
+        index_name = 'gather-index-' + token
+        distance_name = 'gather-distance-' + token
+        func = partial(_gather_sample_block, geo_axis=geo_axis,
+                       num_geo_dims=num_geo_dims, fill_value=fill_value,
+                       weight_funcs=weight_funcs, with_uncert=with_uncert,
+                       dtype=dtype)
+        stack_block = (0,) if with_uncert else ()
+        dsk = {}
+        row_chunks, col_chunks = self.index_array.chunks[:2]
+        row_starts = np.cumsum((0,) + row_chunks)
+        col_starts = np.cumsum((0,) + col_chunks)
+        for trow, tcol in product(range(len(row_chunks)), range(len(col_chunks))):
+            target_block = (slice(row_starts[trow], row_starts[trow + 1]),
+                            slice(col_starts[tcol], col_starts[tcol + 1]))
+            blocks, local_index = _plan_chunk_gather(
+                index_arr[target_block], source_positions, geo_shape, geo_chunks)
+            dsk[(index_name, trow, tcol)] = local_index
+            distance_key = None
+            if distance_arr is not None:
+                distance_key = (distance_name, trow, tcol)
+                dsk[distance_key] = distance_arr[target_block]
+            for channel_block in product(*[range(len(c)) for c in channel_chunks]):
+                channel_shape = tuple(c[b] for c, b in zip(channel_chunks, channel_block))
+                before, after = channel_block[:geo_axis], channel_block[geo_axis:]
+                source_keys = [(src_data.name,) + before + block + after
+                               for block in blocks]
+                out_key = (name,) + before + (trow, tcol) + after + stack_block
+                dsk[out_key] = (func, (index_name, trow, tcol), distance_key,
+                                source_keys, channel_shape)
+
+        out_chunks = (src_data.chunks[:geo_axis] + (row_chunks, col_chunks) +
+                      src_data.chunks[geo_axis + num_geo_dims:])
+        if with_uncert:
+            out_chunks += ((2,),)
+        graph = HighLevelGraph.from_collections(name, dsk, dependencies=[src_data])
+        res = da.Array(graph, name, out_chunks, dtype=dtype)
+        if weight_funcs is not None:
+            return self._wrap_weighted_result(res, data, dst_dims, coords,
+                                              with_uncert, fill_value)
+        return DataArray(res, dims=dst_dims, coords=coords,
+                         attrs=deepcopy(data.attrs))
+
+
+def _prepare_weighted_data(data, geo_axis, num_geo_dims, weight_funcs):
+    """Get the data, weight functions and output dtype of weighted resampling.
+
+    All channels of a target chunk are computed together, so the data is
+    rechunked to a single chunk along the non-geolocation dimensions.
+
+    """
+    channel_axes = [ax for ax in range(data.ndim)
+                    if not geo_axis <= ax < geo_axis + num_geo_dims]
+    data = data.rechunk({ax: -1 for ax in channel_axes})
+    num_channels = int(np.prod([data.shape[ax] for ax in channel_axes]))
+    if callable(weight_funcs):
+        weight_funcs = [weight_funcs] * num_channels
+    elif len(weight_funcs) != num_channels:
+        raise ValueError('Expected %d weight functions, got %d' %
+                         (num_channels, len(weight_funcs)))
+
+    if np.issubdtype(data.dtype, np.floating):
+        dtype = data.dtype
+    else:
+        dtype = np.dtype(np.float64)
+    return data, weight_funcs, dtype
+
 
 def _get_fill_mask_value(data_dtype):
     """Return the maximum value of dtype."""
@@ -1249,20 +2884,3 @@ def _get_fill_mask_value(data_dtype):
         raise TypeError('Type %s is unsupported for masked fill values' %
                         data_dtype.type)
     return fill_value
-
-
-def _remask_data(data, is_to_be_masked=True):
-    """Interprets half the array as mask for the other half"""
-
-    channels = data.shape[-1]
-    if is_to_be_masked:
-        mask = data[..., (channels // 2):]
-        # All pixels affected by masked pixels are masked out
-        mask = (mask != 0)
-        data = np.ma.array(data[..., :(channels // 2)], mask=mask)
-    else:
-        data = data[..., :(channels // 2)]
-
-    if data.shape[-1] == 1:
-        data = data.reshape(data.shape[:-1])
-    return data
@@ -24,11 +24,25 @@
 import hashlib
 import json
 import os
+from collections import OrderedDict
+from logging import getLogger
 
 import numpy as np
 
+from pyresample._caching import ArrayCache
 from pyresample.geometry import SwathDefinition
 
+logger = getLogger(__name__)
+
+# Size limits of the precompute caches: in memory for each cache, and on
+# disk for each cache_dir (unlimited if not set)
+PRECOMPUTE_CACHE_BYTES = int(os.getenv('PYRESAMPLE_PRECOMPUTE_CACHE_BYTES', 256 * 1024 ** 2))
+PRECOMPUTE_CACHE_DISK_BYTES = os.getenv('PYRESAMPLE_PRECOMPUTE_CACHE_DISK_BYTES')
+if PRECOMPUTE_CACHE_DISK_BYTES is not None:
+    PRECOMPUTE_CACHE_DISK_BYTES = int(PRECOMPUTE_CACHE_DISK_BYTES)
+
+_precompute_caches = {}
+
 
 def hash_dict(the_dict, the_hash=None):
     """Calculate a hash for a dictionary."""
@@ -38,8 +52,55 @@ def hash_dict(the_dict, the_hash=None):
     return the_hash
 
 
+def get_precompute_cache(cache_dir=None):
+    """Get the cache of the precompute artefacts of the resamplers.
+
+    There is one cache per `cache_dir`, shared by all resamplers. With
+    `cache_dir` None, the artefacts are only kept in memory.
+
+    """
+    try:
+        return _precompute_caches[cache_dir]
+    except KeyError:
+        cache = ArrayCache(cache_dir=cache_dir, max_bytes=PRECOMPUTE_CACHE_BYTES,
+                           max_disk_bytes=PRECOMPUTE_CACHE_DISK_BYTES)
+        return _precompute_caches.setdefault(cache_dir, cache)
+
+
+def _get_json_params(params):
+    """Make the values of `params` JSON serializable for hashing.
+
+    Arrays and other objects are replaced by their dask token. Returns None
+    if dask isn't available to tokenize them.
+
+    """
+    json_params = {}
+    for key, val in params.items():
+        try:
+            json.dumps(val)
+        except TypeError:
+            try:
+                from dask.base import tokenize
+            except ImportError:
+                return None
+            val = tokenize(val)
+        json_params[key] = val
+    return json_params
+
+
 class BaseResampler(object):
-    """Base abstract resampler class."""
+    """Base abstract resampler class.
+
+    Subclasses listing the attributes set by `precompute` in
+    `precompute_artefacts` get them cached by `resample`, in memory and, if
+    a `cache_dir` is given, on disk. The artefacts have to be numpy arrays,
+    or lists convertible to them, and are restored as (read-only) arrays.
+    Everything they depend on besides the geometries has to be passed to
+    `precompute` as keyword arguments, see `_get_precompute_kwargs`.
+
+    """
+
+    precompute_artefacts = ()
 
     def __init__(self, source_geo_def, target_geo_def):
         """Initialize resampler with geolocation information.
@@ -104,25 +165,130 @@ class BaseResampler(object):
         Returns (xarray.DataArray): Data resampled to the target area
 
         """
+        if self._use_mask_area(mask_area):
+            kwargs['mask'] = self._get_mask(data)
+
+        precompute_kwargs = self._get_precompute_kwargs(data, **kwargs)
+        cache_id = self._cached_precompute(cache_dir=cache_dir, **precompute_kwargs)
+        return self.compute(data, cache_id=cache_id, **kwargs)
+
+    def resample_many(self, datasets, cache_dir=None, mask_area=None,
+                      compute=False, **kwargs):
+        """Resample several datasets sharing the source geolocation.
+
+        The datasets are grouped by their mask and precompute arguments,
+        e.g. the chunks of the data for some resamplers. Each group computes
+        its mask and calls `precompute` once, then `compute` is called for
+        all its members. Masks are compared by their dask token, so datasets
+        derived from the same array share their mask.
+
+        Args:
+            datasets (list or dict): DataArrays to be resampled
+            cache_dir (str): directory to cache precomputed results
+            mask_area (bool): Mask geolocation data where data values are
+                              invalid, see `resample`.
+            compute (bool): Compute the results in one dask graph, so the
+                            work they share is only done once. Otherwise the
+                            results are returned lazily, and should be
+                            computed together with ``dask.compute``.
+            kwargs: Passed to `precompute` and `compute`
+
+        Returns: The resampled datasets, as a list or as a dict with the
+        keys of `datasets`.
+
+        """
+        from dask.base import tokenize
+
+        if isinstance(datasets, dict):
+            keys = list(datasets.keys())
+            datasets = list(datasets.values())
+        else:
+            keys = None
+        use_mask = self._use_mask_area(mask_area)
+
+        groups = OrderedDict()
+        for idx, data in enumerate(datasets):
+            data_kwargs = kwargs.copy()
+            if use_mask:
+                data_kwargs['mask'] = self._get_mask(data)
+            precompute_kwargs = self._get_precompute_kwargs(data, **data_kwargs)
+            group_key = tokenize(data_kwargs.get('mask'), precompute_kwargs)
+            group = groups.setdefault(group_key, (data_kwargs, precompute_kwargs, []))
+            group[2].append(idx)
+
+        results = [None] * len(datasets)
+        for data_kwargs, precompute_kwargs, members in groups.values():
+            cache_id = self._cached_precompute(cache_dir=cache_dir, **precompute_kwargs)
+            for idx in members:
+                results[idx] = self.compute(datasets[idx], cache_id=cache_id, **data_kwargs)
+        logger.debug("Resampled %d datasets in %d groups", len(datasets), len(groups))
+
+        if compute:
+            import dask
+            results = list(dask.compute(*results))
+        if keys is not None:
+            return OrderedDict(zip(keys, results))
+        return results
+
+    def _use_mask_area(self, mask_area):
         # default is to mask areas for SwathDefinitions
-        if mask_area is None and isinstance(
-                self.source_geo_def, SwathDefinition):
-            mask_area = True
-
-        if mask_area:
-            if isinstance(self.source_geo_def, SwathDefinition):
-                geo_dims = self.source_geo_def.lons.dims
-            else:
-                geo_dims = ('y', 'x')
-            flat_dims = [dim for dim in data.dims if dim not in geo_dims]
-            if np.issubdtype(data.dtype, np.integer):
-                kwargs['mask'] = data == data.attrs.get('_FillValue', np.iinfo(data.dtype.type).max)
-            else:
-                kwargs['mask'] = data.isnull()
-            kwargs['mask'] = kwargs['mask'].all(dim=flat_dims)
+        if mask_area is None:
+            return isinstance(self.source_geo_def, SwathDefinition)
+        return mask_area
+
+    def _get_mask(self, data):
+        """Get the mask of the geolocation where all values of `data` are invalid."""
+        if isinstance(self.source_geo_def, SwathDefinition):
+            geo_dims = self.source_geo_def.lons.dims
+        else:
+            geo_dims = ('y', 'x')
+        flat_dims = [dim for dim in data.dims if dim not in geo_dims]
+        if np.issubdtype(data.dtype, np.integer):
+            mask = data == data.attrs.get('_FillValue', np.iinfo(data.dtype.type).max)
+        else:
+            mask = data.isnull()
+        return mask.all(dim=flat_dims)
+
+    def _get_precompute_kwargs(self, data, **kwargs):
+        """Get the keyword arguments of `precompute` for resampling `data`.
+
+        Subclasses whose precompute artefacts depend on more than the
+        keyword arguments of `resample`, e.g. on the chunks of the data,
+        add it here.
 
+        """
+        return kwargs
+
+    def _cached_precompute(self, cache_dir=None, **kwargs):
+        """Get the precompute artefacts from the cache or call `precompute`."""
+        if not self.precompute_artefacts:
+            return self.precompute(cache_dir=cache_dir, **kwargs)
+        key = self._get_precompute_key(**kwargs)
+        if key is None:
+            return self.precompute(cache_dir=cache_dir, **kwargs)
+        cache = get_precompute_cache(cache_dir)
+        arrays = cache.get(key)
+        if arrays is not None and set(arrays) == set(self.precompute_artefacts):
+            logger.debug("Using cached precompute artefacts %s", key)
+            for name, arr in arrays.items():
+                setattr(self, name, arr)
+            return key
         cache_id = self.precompute(cache_dir=cache_dir, **kwargs)
-        return self.compute(data, cache_id=cache_id, **kwargs)
+        cache.put(key, {name: np.asarray(getattr(self, name))
+                        for name in self.precompute_artefacts})
+        return cache_id if cache_id is not None else key
+
+    def _get_precompute_key(self, **kwargs):
+        """Get the cache key of the precompute artefacts, or None if they can't be cached."""
+        params = _get_json_params(kwargs)
+        if params is None:
+            return None
+        try:
+            hash_str = self.get_hash(resampler=self.__class__.__name__, **params)
+        except AttributeError:
+            logger.debug("Geometry can't be hashed, precompute artefacts won't be cached")
+            return None
+        return 'precompute_' + hash_str
 
     def _create_cache_filename(self, cache_dir=None, prefix='',
                                fmt='.zarr', **kwargs):
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020 PyTroll developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Testing the automatic selection of the resampling method."""
+
+import importlib
+import unittest
+from unittest import mock
+
+import dask.array as da
+import numpy as np
+import xarray as xr
+
+from pyresample import create_area_def
+from pyresample.geometry import SwathDefinition
+
+
+def _get_area(shape):
+    return create_area_def('test', {'proj': 'stere', 'lat_0': 60, 'lon_0': 10},
+                           area_extent=(-5e5, -5e5, 5e5, 5e5), shape=shape)
+
+
+def _get_swath(shape):
+    lons, lats = _get_area(shape).get_lonlats()
+    lons = xr.DataArray(da.from_array(lons, chunks=100), dims=('y', 'x'))
+    lats = xr.DataArray(da.from_array(lats, chunks=100), dims=('y', 'x'))
+    return SwathDefinition(lons, lats)
+
+
+def _get_data(shape):
+    data = np.arange(np.prod(shape), dtype=np.float64).reshape(shape)
+    return xr.DataArray(da.from_array(data, chunks=100), dims=('y', 'x'))
+
+
+class TestSelectMethod(unittest.TestCase):
+    """Test the select_method function."""
+
+    def test_resolution_ratio(self):
+        """Test that the quality constraints depend on the resolution ratio."""
+        from pyresample.auto import select_method
+
+        data = _get_data((100, 100))
+        selection = select_method(data, _get_area((100, 100)), _get_area((20, 20)))
+        self.assertEqual(selection.method, 'bucket')
+        self.assertAlmostEqual(selection.overlap, 25., places=0)
+        self.assertEqual(selection.estimates['nearest'].rejection,
+                         "aliases when downsampling")
+        self.assertIn("selected bucket", str(selection))
+
+        # EWA isn't selected automatically
+        selection = select_method(data, _get_swath((100, 100)), _get_area((20, 20)))
+        self.assertEqual(selection.method, 'bucket')
+        self.assertNotIn('ewa', selection.estimates)
+
+        selection = select_method(data, _get_area((100, 100)), _get_area((200, 200)))
+        self.assertEqual(selection.method, 'gradient')
+        self.assertEqual(selection.estimates['bucket'].rejection,
+                         "leaves gaps when upsampling")
+
+        # Without quality constraints the fastest method is used
+        selection = select_method(data, _get_area((100, 100)), _get_area((20, 20)),
+                                  quality='fast')
+        self.assertEqual(selection.method, 'gradient')
+
+    def test_budget(self):
+        """Test that methods over budget are rejected."""
+        from pyresample.auto import select_method
+
+        data = _get_data((100, 100))
+        source = _get_area((100, 100))
+        target = _get_area((200, 200))
+        selection = select_method(data, source, target, quality='fast')
+        memory = selection.estimates['gradient'].memory
+        selection = select_method(data, source, target, budget={'memory': memory - 1},
+                                  quality='fast')
+        self.assertEqual(selection.method, 'bucket')
+        self.assertEqual(selection.estimates['gradient'].rejection, "over memory budget")
+        selection = select_method(data, source, target, budget={'memory': '1GiB'})
+        self.assertEqual(selection.method, 'gradient')
+        with self.assertRaises(ValueError):
+            select_method(data, source, target, budget={'time': 0})
+        with self.assertRaises(ValueError):
+            select_method(data, source, target, budget={'cpus': 1})
+        with self.assertRaises(ValueError):
+            select_method(data, source, target, quality='best')
+
+    def test_unavailable_method(self):
+        """Test that methods whose modules can't be imported are rejected."""
+        from pyresample.auto import select_method
+
+        def import_module(name):
+            if name == 'pyresample.gradient':
+                raise ImportError
+            return importlib.import_module(name)
+
+        data = _get_data((100, 100))
+        with mock.patch('pyresample.auto.import_module', import_module):
+            selection = select_method(data, _get_swath((100, 100)), _get_area((100, 100)))
+        self.assertEqual(selection.estimates['gradient'].rejection, "not available")
+        self.assertEqual(selection.method, 'bucket')
+
+
+class TestResample(unittest.TestCase):
+    """Test the resample function."""
+
+    def test_resample(self):
+        """Test resampling with a given and a selected method."""
+        from pyresample import resample
+
+        data = _get_data((100, 100))
+        source = _get_swath((100, 100))
+        target = _get_area((50, 50))
+        with self.assertLogs('pyresample.auto', level='INFO') as logs:
+            res = resample(data, source, target, quality='fast')
+        self.assertIn("selected gradient", logs.output[0])
+        self.assertEqual(res.shape, (50, 50))
+        self.assertTrue(np.isfinite(res.values[25, 25]))
+
+        res = resample(data, source, target, method='nearest')
+        self.assertEqual(res.shape, (50, 50))
+        self.assertIn(res.values[25, 25], data.values[50:52, 50:52])
+
+        res = resample(data, source, target, method='bucket')
+        self.assertEqual(res.shape, (50, 50))
+        np.testing.assert_allclose(res.values[25, 25], data.values[50:52, 50:52].mean())
+
+        # EWA is computed lazily in a single task
+        calls = []
+
+        def ewa_block(*args):
+            calls.append(args)
+            return np.ones((50, 50))
+
+        with mock.patch('pyresample.auto._ewa_block', ewa_block):
+            res = resample(data, source, target, method='ewa')
+            self.assertIsInstance(res.data, da.Array)
+            self.assertEqual(calls, [])
+            np.testing.assert_array_equal(res.values, 1)
+        np.testing.assert_array_equal(calls[0][0], data.values)
+
+        with self.assertRaises(ValueError):
+            resample(data, source, target, method='cubic')
@@ -377,6 +377,26 @@ class TestNumpyBilinear(unittest.TestCase):
         self.assertEqual(shp[0:2], self.target_def.shape)
         self.assertEqual(shp[-1], 2)
 
+    def test_class_resample_method_single_precision(self):
+        """Test resampling with single precision look-up tables."""
+        from pyresample.bilinear import NumpyBilinearResampler
+
+        resampler = NumpyBilinearResampler(self.source_def,
+                                           self.target_def,
+                                           50e5,
+                                           neighbours=32,
+                                           epsilon=0,
+                                           precision='single')
+        res = resampler.resample(self.data1)
+        self.assertEqual(resampler.bilinear_s.dtype, np.float32)
+        self.assertEqual(resampler.bilinear_t.dtype, np.float32)
+        self.assertEqual(resampler.slices_x.dtype, np.int32)
+        self.assertEqual(resampler.slices_y.dtype, np.int32)
+        self.assertEqual(resampler._resample_kdtree.data.dtype, np.float32)
+        self.assertEqual(res.shape, self.target_def.shape)
+        self.assertAlmostEqual(res.sum(), 12, 5)
+        self.assertEqual((res == 0).sum(), 4)
+
     def test_create_empty_bil_info(self):
         """Test creation of empty bilinear info."""
         from pyresample.bilinear import NumpyBilinearResampler
@@ -392,6 +412,57 @@ class TestNumpyBilinear(unittest.TestCase):
         self.assertEqual(resampler._valid_input_index.shape, (self.source_def.size,))
         self.assertTrue(resampler._valid_input_index.dtype == np.bool)
 
+    def test_save_and_load_bil_info(self):
+        """Test saving and loading the resampling info."""
+        import os
+        from tempfile import TemporaryDirectory
+        from pyresample.bilinear import NumpyBilinearResampler
+        from pyresample.bilinear._numpy_resampler import CACHE_INDICES
+
+        resampler = NumpyBilinearResampler(self.source_def, self.target_def, 50e5)
+        with self.assertRaises(ValueError):
+            resampler.save_resampling_info('test.npz')
+        res = resampler.resample(self.data1)
+
+        with TemporaryDirectory() as tempdir:
+            for filename in ('test.npz', 'test'):
+                filename = os.path.join(tempdir, filename)
+                resampler.save_resampling_info(filename)
+                new_resampler = NumpyBilinearResampler(self.source_def, self.target_def, 50e5)
+                new_resampler.load_resampling_info(filename)
+                for attr in CACHE_INDICES:
+                    np.testing.assert_array_equal(getattr(resampler, attr),
+                                                  getattr(new_resampler, attr))
+                np.testing.assert_array_equal(
+                    new_resampler.get_sample_from_bil_info(self.data1, fill_value=0), res)
+            self.assertIsInstance(new_resampler.bilinear_s, np.memmap)
+            with self.assertRaises(IOError):
+                new_resampler.load_resampling_info(os.path.join(tempdir, 'missing'))
+
+    def test_cached_bil_info(self):
+        """Test reusing the resampling info from a cache directory."""
+        import os
+        from tempfile import TemporaryDirectory
+        from pyresample.bilinear import NumpyBilinearResampler
+
+        with TemporaryDirectory() as tempdir:
+            resampler = NumpyBilinearResampler(self.source_def, self.target_def, 50e5)
+            res = resampler.resample(self.data1, cache_dir=tempdir)
+            filename = os.path.join(tempdir, 'bil_lut-' + resampler.get_hash())
+            self.assertEqual(os.listdir(tempdir), [os.path.basename(filename)])
+
+            new_resampler = NumpyBilinearResampler(self.source_def, self.target_def, 50e5)
+            with mock.patch.object(new_resampler, '_get_valid_input_index_and_kdtree') as compute:
+                new_res = new_resampler.resample(self.data1, cache_dir=tempdir)
+            compute.assert_not_called()
+            self.assertIsInstance(new_resampler.bilinear_s, np.memmap)
+            np.testing.assert_array_equal(res, new_res)
+
+            # Other parameters don't use the same look-up tables
+            other_resampler = NumpyBilinearResampler(self.source_def, self.target_def, 50e5,
+                                                     neighbours=16)
+            self.assertNotEqual(other_resampler.get_hash(), resampler.get_hash())
+
 
 class TestXarrayBilinear(unittest.TestCase):
     """Test Xarra/Dask -based bilinear interpolation."""
@@ -1067,6 +1138,30 @@ class TestXarrayBilinear(unittest.TestCase):
         self.assertEqual(np.sum(res), 12)
         self.assertEqual((res == 0).sum(), 4)
 
+    def test_target_chunks(self):
+        """Test the chunks of the resampled data."""
+        from pyresample.bilinear import XArrayBilinearResampler
+
+        resampler = XArrayBilinearResampler(self.source_def, self.target_def,
+                                            50e5, chunks=2)
+        res = resampler.resample(self.data1)
+        self.assertEqual(res.data.chunks, ((2, 2), (2, 2)))
+
+        resampler = XArrayBilinearResampler(self.source_def, self.target_def,
+                                            50e5, memory_limit='1GB')
+        pixel_bytes, fixed_bytes = resampler._get_task_memory()
+        self.assertGreater(pixel_bytes, 0)
+        self.assertGreater(fixed_bytes, 0)
+        res = resampler.resample(self.data1)
+        self.assertEqual(res.data.chunks, ((4,), (4,)))
+
+        # The parameters of BilinearBase keep their positions
+        resampler = XArrayBilinearResampler(self.source_def, self.target_def,
+                                            50e5, 16, 0.5)
+        self.assertEqual(resampler._neighbours, 16)
+        self.assertEqual(resampler._epsilon, 0.5)
+        self.assertIsNone(resampler._chunks)
+
     def test_save_and_load_bil_info(self):
         """Test saving and loading the resampling info."""
         import os
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020 PyTroll developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Testing the _caching module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pyresample._caching import ArrayCache
+
+
+class TestArrayCache(unittest.TestCase):
+    """Test the ArrayCache class."""
+
+    def setUp(self):
+        """Create a temporary cache directory."""
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary cache directory."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_memory_only(self):
+        """Test storing and retrieving arrays in memory."""
+        cache = ArrayCache()
+        self.assertIsNone(cache.get('key'))
+        arr = np.arange(10)
+        cache.put('key', {'arr': arr})
+        self.assertIn('key', cache)
+        self.assertIs(cache.get('key')['arr'], arr)
+        self.assertEqual(cache.nbytes, arr.nbytes)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are dropped first."""
+        arr = np.zeros(100, dtype=np.uint8)
+        cache = ArrayCache(max_bytes=250)
+        cache.put('a', {'arr': arr})
+        cache.put('b', {'arr': arr})
+        cache.get('a')
+        cache.put('c', {'arr': arr})
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.nbytes, 200)
+        # Entries larger than the cache are not kept
+        cache.put('d', {'arr': np.zeros(300, dtype=np.uint8)})
+        self.assertNotIn('d', cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_disk(self):
+        """Test storing arrays on disk as memory maps."""
+        cache = ArrayCache(cache_dir=self.cache_dir)
+        arrays = {'ints': np.arange(10), 'bools': np.ones(3, dtype=bool)}
+        res = cache.put('key', arrays)
+        self.assertIsInstance(res['ints'], np.memmap)
+        self.assertTrue(os.path.isfile(os.path.join(self.cache_dir, 'key', 'ints.npy')))
+        # No temporary files left behind
+        self.assertEqual(os.listdir(self.cache_dir), ['key'])
+
+        new_cache = ArrayCache(cache_dir=self.cache_dir)
+        self.assertIn('key', new_cache)
+        res = new_cache.get('key')
+        np.testing.assert_array_equal(res['ints'], arrays['ints'])
+        np.testing.assert_array_equal(res['bools'], arrays['bools'])
+        self.assertFalse(res['ints'].flags.writeable)
+        # Loaded entries are kept in memory
+        self.assertEqual(len(new_cache), 1)
+
+    def test_hit_counts(self):
+        """Test counting the lookups found and not found in the cache."""
+        cache = ArrayCache(cache_dir=self.cache_dir)
+        cache.get('key')
+        cache.put('key', {'arr': np.arange(10)})
+        cache.get('key')
+        new_cache = ArrayCache(cache_dir=self.cache_dir)
+        new_cache.get('key')
+        new_cache.get('key')
+        self.assertEqual((cache.hits, cache.misses, cache.disk_hits), (1, 1, 0))
+        stats = new_cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['disk_hits']), (2, 0, 1))
+
+    def test_disk_eviction(self):
+        """Test that the least recently used entries are removed from disk."""
+        arr = np.zeros(1000, dtype=np.uint8)
+        cache = ArrayCache(cache_dir=self.cache_dir, max_disk_bytes=2500)
+        cache.put('a', {'arr': arr})
+        cache.put('b', {'arr': arr})
+        # Loading marks 'a' as recently used
+        os.utime(os.path.join(self.cache_dir, 'a'), (0, 0))
+        os.utime(os.path.join(self.cache_dir, 'b'), (1, 1))
+        ArrayCache(cache_dir=self.cache_dir).get('a')
+        cache.put('c', {'arr': arr})
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['a', 'c'])
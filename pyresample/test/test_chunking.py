@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020 PyTroll developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Testing the _chunking module."""
+
+import unittest
+from unittest import mock
+
+from pyresample._chunking import get_source_overlap, get_target_chunks
+
+
+class TestGetTargetChunks(unittest.TestCase):
+    """Test the get_target_chunks function."""
+
+    def test_explicit_chunks(self):
+        """Test that explicit chunks are used as they are."""
+        self.assertEqual(get_target_chunks((1000, 1000), 100, chunks=(100, 200)),
+                         (100, 200))
+        self.assertEqual(get_target_chunks((1000, 1000), 100, default=300), 300)
+        with self.assertRaises(ValueError):
+            get_target_chunks((1000, 1000), 100, chunks=100, memory_limit=10000)
+
+    def test_memory_limit(self):
+        """Test deriving the chunk size from a memory limit."""
+        self.assertEqual(get_target_chunks((1000, 1000), 100, memory_limit=10000 * 100),
+                         100)
+        self.assertEqual(get_target_chunks((1000, 1000), 100, memory_limit='1MB',
+                                           fixed_bytes=190000),
+                         90)
+        # Chunks are never larger than the target
+        self.assertEqual(get_target_chunks((1000, 50), 1, memory_limit='1GB'), 1000)
+        with self.assertRaises(ValueError):
+            get_target_chunks((1000, 1000), 100, memory_limit=1000, fixed_bytes=1000)
+
+    def test_source_overlap(self):
+        """Test estimating the source pixels per target pixel."""
+        source = mock.MagicMock()
+        source.geocentric_resolution.return_value = 1000.
+        target = mock.MagicMock()
+        target.geocentric_resolution.return_value = 3000.
+        self.assertEqual(get_source_overlap(source, target), 9.)
+        source.geocentric_resolution.side_effect = RuntimeError
+        self.assertEqual(get_source_overlap(source, target), 1.)
@@ -452,6 +452,44 @@ class Test(unittest.TestCase):
 
         self.assertIsInstance(hash(swath_def), int)
 
+    def test_swath_hash_fingerprint(self):
+        """Test the fingerprints of the swath geolocation in the hash."""
+        import xarray as xr
+        lons, lats = np.meshgrid(np.linspace(0, 10, 300), np.linspace(50, 60, 200))
+
+        def get_hash(lons, lats, **kwargs):
+            return geometry.SwathDefinition(lons, lats).update_hash(**kwargs).hexdigest()
+
+        self.assertEqual(get_hash(lons, lats), get_hash(lons.copy(), lats.copy()))
+        changed = lats.copy()
+        changed[101, 151] += 1e-6
+        self.assertNotEqual(get_hash(lons, lats), get_hash(lons, changed))
+        # The sampled fingerprint doesn't see all the pixels
+        with patch('pyresample._hashing.SAMPLE_SIZE', 100):
+            self.assertEqual(get_hash(lons, lats, sampled=True),
+                             get_hash(lons, changed, sampled=True))
+            self.assertNotEqual(get_hash(lons, lats, sampled=True), get_hash(lons, lats))
+        # Several blocks are hashed in parallel
+        with patch('pyresample._hashing.CHUNK_BYTES', 1000):
+            self.assertEqual(get_hash(lons, lats), get_hash(lons, lats))
+            self.assertNotEqual(get_hash(lons, lats), get_hash(lons, changed))
+
+        # Fingerprints are computed once per swath
+        swath_def = geometry.SwathDefinition(xr.DataArray(lons), xr.DataArray(lats))
+        with patch('pyresample.geometry.fingerprint_array',
+                   wraps=geometry.fingerprint_array) as fingerprint_array:
+            swath_def.update_hash()
+            swath_def.update_hash()
+            self.assertEqual(fingerprint_array.call_count, 2)
+        # but aren't written to the attributes of the DataArrays, which
+        # would be kept by their subsets
+        self.assertNotIn('hash', swath_def.lons.attrs)
+        self.assertEqual(swath_def.update_hash().hexdigest(), get_hash(lons, lats))
+        subset = geometry.SwathDefinition(swath_def.lons.isel(dim_0=slice(0, 10)),
+                                          swath_def.lats.isel(dim_0=slice(0, 10)))
+        self.assertNotEqual(subset.update_hash().hexdigest(), swath_def.update_hash().hexdigest())
+        self.assertEqual(subset.update_hash().hexdigest(), get_hash(lons[:10], lats[:10]))
+
     def test_area_equal(self):
         """Test areas equality."""
         area_def = geometry.AreaDefinition('areaD', 'Europe (3km, HRV, VTC)', 'areaD',
@@ -203,6 +203,32 @@ class TestGradientResampler(unittest.TestCase):
         assert res.shape == self.dst_area.shape
         assert np.allclose(res, 1)
 
+    def test_resample_cached_chunk_mappings(self):
+        """Resample area to area, reusing the cached chunk mappings."""
+        import shutil
+        import tempfile
+        from pyresample.gradient import GradientSearchResampler
+        from pyresample.resampler import get_precompute_cache
+        data = xr.DataArray(da.ones(self.src_area.shape, dtype=np.float64,
+                                    chunks=50), dims=['y', 'x'])
+        cache_dir = tempfile.mkdtemp()
+        try:
+            res = self.resampler.resample(data, cache_dir=cache_dir, method='bil')
+            cache = get_precompute_cache(cache_dir)
+            self.assertEqual(cache.misses, 1)
+
+            resampler = GradientSearchResampler(self.src_area, self.dst_area)
+            with mock.patch.object(resampler, 'get_chunk_mappings') as get_chunk_mappings:
+                res2 = resampler.resample(data, cache_dir=cache_dir, method='bil')
+            get_chunk_mappings.assert_not_called()
+            self.assertEqual(cache.hits, 1)
+            np.testing.assert_array_equal(resampler.coverage_status,
+                                          self.resampler.coverage_status)
+            np.testing.assert_allclose(res2.compute(scheduler='single-threaded'),
+                                       res.compute(scheduler='single-threaded'))
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
     def test_resample_area_to_area_2d_fill_value(self):
         """Resample area to area, 2d, use fill value."""
         data = xr.DataArray(da.full(self.src_area.shape, np.nan,
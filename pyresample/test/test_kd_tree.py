@@ -1,4 +1,6 @@
 import os
+import shutil
+import tempfile
 import numpy as np
 
 from pyresample import geometry, kd_tree, utils
@@ -192,6 +194,267 @@ class Test(unittest.TestCase):
         expected = 15874591.0
         self.assertEqual(cross_sum, expected)
 
+    def test_neighbour_info_segments(self):
+        lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
+        lats = np.fromfunction(lambda y, x: 75 - y, (50, 10))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        with catch_warnings(UserWarning):
+            expected = kd_tree.get_neighbour_info(swath_def, self.area_def,
+                                                  50000, neighbours=4,
+                                                  segments=1)
+            for nprocs in (1, 3):
+                res = kd_tree.get_neighbour_info(swath_def, self.area_def,
+                                                 50000, neighbours=4,
+                                                 segments=7, nprocs=nprocs)
+                for res_arr, exp_arr in zip(res, expected):
+                    np.testing.assert_array_equal(res_arr, exp_arr)
+
+    def test_get_segments(self):
+        self.assertEqual(kd_tree._get_segments(self.area_def, 8), 1)
+        with mock.patch('pyresample.kd_tree.SEGMENT_MEMORY_BUDGET', 800 * 800 * 168 // 4):
+            self.assertEqual(kd_tree._get_segments(self.area_def, 8), 4)
+            self.assertEqual(kd_tree._get_segments(self.area_def, 1), 2)
+            with mock.patch('pyresample.kd_tree._query_resample_kdtree_segments',
+                            wraps=kd_tree._query_resample_kdtree_segments) as query:
+                with catch_warnings(UserWarning):
+                    kd_tree.get_neighbour_info(self.tswath, self.area_def,
+                                               50000, neighbours=8)
+                self.assertEqual(query.call_args[0][4], 4)
+
+    def test_nearest_cache(self):
+        import shutil
+        import tempfile
+        data = np.fromfunction(lambda y, x: y * x, (50, 10))
+        lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
+        lats = np.fromfunction(lambda y, x: 75 - y, (50, 10))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = kd_tree.NeighbourInfoCache(cache_dir=cache_dir)
+            res = kd_tree.resample_nearest(swath_def, data.ravel(),
+                                           self.area_def, 50000, segments=1,
+                                           cache=cache)
+            self.assertEqual(res.sum(), 15874591.0)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            # A warm cache doesn't build the kd-tree
+            cache = kd_tree.NeighbourInfoCache(cache_dir=cache_dir)
+            with mock.patch('pyresample.kd_tree._create_resample_kdtree') as create:
+                res = kd_tree.resample_nearest(swath_def, data.ravel(),
+                                               self.area_def, 50000, segments=1,
+                                               cache=cache)
+                create.assert_not_called()
+            self.assertEqual(res.sum(), 15874591.0)
+
+            # Other parameters don't hit the cache
+            kd_tree.resample_nearest(swath_def, data.ravel(),
+                                     self.area_def, 60000, segments=1,
+                                     cache=cache)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_gauss_cache_memory(self):
+        data = np.fromfunction(lambda y, x: (y + x) * 10 ** -5, (5000, 100))
+        lons = np.fromfunction(
+            lambda y, x: 3 + (10.0 / 100) * x, (5000, 100))
+        lats = np.fromfunction(
+            lambda y, x: 75 - (50.0 / 5000) * y, (5000, 100))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        cache = kd_tree.NeighbourInfoCache()
+        with catch_warnings(UserWarning):
+            expected = kd_tree.resample_gauss(swath_def, data.ravel(),
+                                              self.area_def, 50000, 25000,
+                                              segments=1, cache=cache)
+            self.assertEqual(len(cache), 1)
+            with mock.patch('pyresample.kd_tree._create_resample_kdtree') as create:
+                res = kd_tree.resample_gauss(swath_def, data.ravel(),
+                                             self.area_def, 50000, 25000,
+                                             segments=1, cache=cache)
+                create.assert_not_called()
+        np.testing.assert_array_equal(res, expected)
+
+    def test_cache_unhashable_geometry(self):
+        cache = kd_tree.NeighbourInfoCache()
+        res = kd_tree.resample_nearest(self.tswath, self.tdata.ravel(),
+                                       self.tgrid, 100000, reduce_data=False,
+                                       segments=1, cache=cache)
+        self.assertEqual(res[0], 2)
+        self.assertEqual(len(cache), 0)
+
+    def test_source_index(self):
+        data = np.fromfunction(lambda y, x: y * x, (50, 10))
+        lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
+        lats = np.fromfunction(lambda y, x: 75 - y, (50, 10))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        source_index = kd_tree.SourceIndex(swath_def)
+        swath_target = geometry.SwathDefinition(lons=lons[::2, ::2] + 0.1,
+                                                lats=lats[::2, ::2])
+        for target_geo_def in (self.area_def, swath_target):
+            for reduce_data in (True, False):
+                info = source_index.query(target_geo_def, 50000, neighbours=1,
+                                          reduce_data=reduce_data)
+                res = kd_tree.get_sample_from_neighbour_info(
+                    'nn', target_geo_def.shape, data, *info)
+                expected = kd_tree.resample_nearest(swath_def, data,
+                                                    target_geo_def, 50000,
+                                                    reduce_data=reduce_data)
+                np.testing.assert_array_equal(res, expected)
+        # Only the source pixels used as neighbours are kept
+        valid_input_index, _, index_array, _ = source_index.query(
+            self.area_def, 50000, neighbours=1)
+        self.assertEqual(valid_input_index.sum(), np.unique(index_array).size - 1)
+
+        with catch_warnings(UserWarning):
+            info = source_index.query(self.area_def, 50000, neighbours=4,
+                                      segments=3)
+        res = kd_tree.get_sample_from_neighbour_info(
+            'custom', self.area_def.shape, data, *info,
+            weight_funcs=lambda r: np.exp(-r ** 2 / 25000.0 ** 2))
+        with catch_warnings(UserWarning):
+            expected = kd_tree.resample_gauss(swath_def, data, self.area_def,
+                                              50000, 25000, neighbours=4)
+        np.testing.assert_allclose(res, expected)
+
+    def test_neighbour_info_single_precision(self):
+        data = np.fromfunction(lambda y, x: (y + x) * 10 ** -6, (5000, 100))
+        lons = np.fromfunction(
+            lambda y, x: 3 + (10.0 / 100) * x, (5000, 100))
+        lats = np.fromfunction(
+            lambda y, x: 75 - (50.0 / 5000) * y, (5000, 100))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        for neighbours in (1, 8):
+            with catch_warnings(UserWarning):
+                double = kd_tree.get_neighbour_info(swath_def, self.area_def,
+                                                    50000, neighbours=neighbours)
+                single = kd_tree.get_neighbour_info(swath_def, self.area_def,
+                                                    50000, neighbours=neighbours,
+                                                    precision='single')
+            self.assertEqual(single[2].dtype, np.int32)
+            self.assertEqual(single[3].dtype, np.float32)
+            np.testing.assert_array_equal(single[0], double[0])
+            np.testing.assert_array_equal(single[1], double[1])
+            # Distances are accurate to a few meters, so the order of
+            # neighbours may only change in rare cases
+            self.assertLess((single[2] != double[2]).mean(), 1e-3)
+            valid = np.isfinite(double[3]) & np.isfinite(single[3])
+            np.testing.assert_allclose(single[3][valid], double[3][valid], atol=5)
+            if neighbours == 1:
+                res = kd_tree.get_sample_from_neighbour_info(
+                    'nn', self.area_def.shape, data, *single[:3])
+                expected = kd_tree.get_sample_from_neighbour_info(
+                    'nn', self.area_def.shape, data, *double[:3])
+                self.assertLess((res != expected).mean(), 1e-3)
+
+        source_index = kd_tree.SourceIndex(swath_def, precision='single')
+        info = source_index.query(self.area_def, 50000, neighbours=1)
+        self.assertEqual(source_index.kdtree.data.dtype, np.float32)
+        self.assertEqual(info[2].dtype, np.int32)
+        self.assertRaises(ValueError, kd_tree.get_neighbour_info, swath_def,
+                          self.area_def, 50000, precision='half')
+
+        # Indices of trees with 2**31 points or more don't fit in int32
+        index_array = np.array([[2 ** 31 - 1, 2 ** 31]], dtype=np.uint32)
+        for num_points, dtype in ((2 ** 31 - 1, np.int32), (2 ** 31, np.int64)):
+            valid_input_index = np.broadcast_to(True, (num_points,))
+            info = kd_tree._set_precision('single', valid_input_index, None,
+                                          index_array, np.zeros((1, 2)))
+            self.assertEqual(info[2].dtype, dtype)
+        np.testing.assert_array_equal(info[2], [[2 ** 31 - 1, 2 ** 31]])
+
+    def test_swath_accumulator(self):
+        data = np.fromfunction(lambda y, x: (y + x) * 10 ** -6, (500, 100))
+        lons = np.fromfunction(
+            lambda y, x: 3 + (10.0 / 100) * x, (500, 100))
+        lats = np.fromfunction(
+            lambda y, x: 75 - (50.0 / 500) * y, (500, 100))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        granules = [(geometry.SwathDefinition(lons[i:i + 100], lats[i:i + 100]),
+                     data[i:i + 100]) for i in range(0, 500, 100)]
+
+        accumulator = kd_tree.SwathAccumulator(self.area_def, 50000,
+                                               fill_value=None)
+        with mock.patch.object(kd_tree, 'get_neighbour_info',
+                               wraps=kd_tree.get_neighbour_info) as gni:
+            for granule_def, granule in granules:
+                accumulator.add(granule_def, granule)
+        # Only the part of the target reached by each granule is queried
+        for call_args in gni.call_args_list:
+            self.assertLess(call_args[0][1].size, self.area_def.size / 2)
+        res = accumulator.get_result()
+        expected = kd_tree.resample_nearest(swath_def, data, self.area_def,
+                                            50000, fill_value=None)
+        np.testing.assert_array_equal(res.mask, expected.mask)
+        np.testing.assert_array_equal(res, expected)
+
+        accumulator = kd_tree.SwathAccumulator(self.area_def, 15000,
+                                               resample_type='gauss',
+                                               sigmas=[5000, 10000],
+                                               neighbours=16)
+        for granule_def, granule in granules:
+            accumulator.add(granule_def, np.dstack((granule, granule)))
+        res = accumulator.get_result()
+        self.assertEqual(res.shape, (800, 800, 2))
+        with catch_warnings(UserWarning):
+            expected = kd_tree.resample_gauss(swath_def, np.dstack((data, data)),
+                                              self.area_def, 15000,
+                                              [5000, 10000], neighbours=16)
+        np.testing.assert_allclose(res, expected, atol=1e-12)
+
+    def test_swath_accumulator_masked(self):
+        data = np.fromfunction(lambda y, x: y * x + 1, (50, 10))
+        lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
+        lats = np.fromfunction(lambda y, x: 75 - y, (50, 10))
+        accumulator = kd_tree.SwathAccumulator(self.area_def, 50000)
+        masked_accumulator = kd_tree.SwathAccumulator(self.area_def, 50000)
+        for i in range(0, 50, 10):
+            granule_def = geometry.SwathDefinition(lons[i:i + 10], lats[i:i + 10])
+            granule = np.ma.array(data[i:i + 10], mask=(i == 20))
+            masked_accumulator.add(granule_def, granule)
+            if i != 20:
+                accumulator.add(granule_def, granule.data)
+        np.testing.assert_array_equal(masked_accumulator.get_result(),
+                                      accumulator.get_result())
+        # Granules outside of the target area are skipped
+        granule_def = geometry.SwathDefinition(lons[:10] + 180, lats[:10])
+        with mock.patch.object(kd_tree, 'get_neighbour_info') as gni:
+            accumulator.add(granule_def, data[:10])
+        gni.assert_not_called()
+
+    def test_target_coords_cache(self):
+        from pyresample._caching import ArrayCache
+        data = np.fromfunction(lambda y, x: y * x, (50, 10))
+        lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
+        lats = np.fromfunction(lambda y, x: 75 - y, (50, 10))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        with mock.patch('pyresample.kd_tree.TARGET_COORDS_CACHE', None):
+            expected = kd_tree.resample_nearest(swath_def, data, self.area_def,
+                                                50000, segments=1)
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with mock.patch('pyresample.kd_tree.TARGET_COORDS_CACHE',
+                            ArrayCache(cache_dir=cache_dir)):
+                res = kd_tree.resample_nearest(swath_def, data, self.area_def,
+                                               50000, segments=1)
+                np.testing.assert_array_equal(res, expected)
+                self.assertEqual(len(kd_tree.TARGET_COORDS_CACHE), 1)
+            # The coordinates are loaded from disk by a new cache
+            with mock.patch('pyresample.kd_tree.TARGET_COORDS_CACHE',
+                            ArrayCache(cache_dir=cache_dir)), \
+                    mock.patch('pyresample.kd_tree._get_target_coords',
+                               wraps=kd_tree._get_target_coords) as get_coords:
+                res = kd_tree.resample_nearest(swath_def, data, self.area_def,
+                                               50000, segments=1)
+                get_coords.assert_not_called()
+                np.testing.assert_array_equal(res, expected)
+                # Other dtypes and segments get their own entries
+                kd_tree.resample_nearest(swath_def, data, self.area_def,
+                                         50000, segments=2)
+                self.assertEqual(get_coords.call_count, 2)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
     def test_nearest_remap(self):
         data = np.fromfunction(lambda y, x: y * x, (50, 10))
         lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
@@ -268,6 +531,34 @@ class Test(unittest.TestCase):
         expected = 4872.8100353517921
         self.assertAlmostEqual(cross_sum, expected)
 
+    def test_gauss_read_only(self):
+        """Test weighted resampling of read-only data."""
+        data = np.fromfunction(lambda y, x: (y + x) * 10 ** -6, (500, 100))
+        lons = np.fromfunction(
+            lambda y, x: 3 + (10.0 / 100) * x, (500, 100))
+        lats = np.fromfunction(
+            lambda y, x: 75 - (50.0 / 500) * y, (500, 100))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        with catch_warnings(UserWarning):
+            info = kd_tree.get_neighbour_info(swath_def, self.area_def,
+                                              50000, segments=1)
+        for dtype in (np.float32, np.float64):
+            channel = data.astype(dtype)
+            read_only = channel.copy()
+            read_only.setflags(write=False)
+            with catch_warnings(UserWarning):
+                expected = kd_tree.resample_gauss(swath_def, channel, self.area_def,
+                                                  50000, 25000, segments=1)
+                res = kd_tree.resample_gauss(swath_def, read_only, self.area_def,
+                                             50000, 25000, segments=1)
+            np.testing.assert_array_equal(res, expected)
+            res = kd_tree.get_sample_from_neighbour_info_batch(
+                'custom', (800, 800), [read_only], *info,
+                weight_funcs=[lambda r: 1 / r])
+            expected = kd_tree.get_sample_from_neighbour_info(
+                'custom', (800, 800), channel, *info, weight_funcs=lambda r: 1 / r)
+            np.testing.assert_allclose(res[0], expected)
+
     def test_gauss_fwhm(self):
         data = np.fromfunction(lambda y, x: (y + x) * 10 ** -5, (5000, 100))
         lons = np.fromfunction(
@@ -338,6 +629,66 @@ class Test(unittest.TestCase):
             self.assertAlmostEqual(cross_sum_stddev, e_stddev)
         self.assertAlmostEqual(cross_sum_counts, expected_counts)
 
+    def test_gauss_multi_uncert_blocks(self):
+        data = np.fromfunction(lambda y, x: (y + x) * 10 ** -6, (5000, 100))
+        lons = np.fromfunction(
+            lambda y, x: 3 + (10.0 / 100) * x, (5000, 100))
+        lats = np.fromfunction(
+            lambda y, x: 75 - (50.0 / 5000) * y, (5000, 100))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        data_multi = np.column_stack((data.ravel(), data.ravel(),
+                                      data.ravel())).astype(np.float32)
+        with catch_warnings(UserWarning):
+            expected = kd_tree.resample_gauss(swath_def, data_multi,
+                                              self.area_def, 50000,
+                                              [25000, 15000, 10000],
+                                              segments=1, with_uncert=True)
+            # Blocks of 1000 output pixels for 8 neighbours and 3 channels
+            with mock.patch('pyresample.kd_tree.WEIGHT_BLOCK_BYTES', 1000 * 8 * 8 * 3):
+                res = kd_tree.resample_gauss(swath_def, data_multi,
+                                             self.area_def, 50000,
+                                             [25000, 15000, 10000],
+                                             segments=1, with_uncert=True)
+        for res_arr, exp_arr in zip(res, expected):
+            np.testing.assert_array_equal(res_arr, exp_arr)
+        self.assertAlmostEqual(res[0].sum(), 1461.8429990248171, 3)
+
+    def test_weighted_sum(self):
+        from pyresample._weighted_sum import weighted_sum
+        data = np.array([[1., 10.], [2., 20.], [4., 40.]], dtype=np.float32)
+        index_array = np.array([[0, 1, -1], [-1, -1, -1], [2, -1, -1]], dtype=np.intp)
+        weights = np.ones((2, 3, 3))
+        weights[:, 0, 1] = 3
+        result = np.empty((3, 2))
+        stddev = np.empty((3, 2))
+        count = np.empty(3)
+        weighted_sum(data, index_array, weights, result, -1.,
+                     stddev=stddev, count=count)
+        np.testing.assert_allclose(result, [[1.75, 17.5], [-1, -1], [4, 40]])
+        np.testing.assert_array_equal(count, [2, 0, 1])
+        # sqrt((4 / (16 - 10)) * (0.75 ** 2 + 3 * 0.25 ** 2))
+        np.testing.assert_allclose(stddev[0], [0.70710678, 7.0710678])
+        self.assertTrue(np.isnan(stddev[1:]).all())
+
+    def test_weighted_sum_uncert_large_offset(self):
+        from pyresample._weighted_sum import weighted_sum
+        rng = np.random.RandomState(0)
+        values = 1e9 + rng.rand(8)
+        weights = rng.rand(8)
+        result = np.empty((1, 1))
+        stddev = np.empty((1, 1))
+        count = np.empty(1)
+        weighted_sum(values[:, np.newaxis], np.arange(8)[np.newaxis, :],
+                     weights[np.newaxis, np.newaxis, :], result, 0.,
+                     stddev=stddev, count=count)
+        norm = weights.sum()
+        mean = (weights * values).sum() / norm
+        sqr_sum = (weights * (values - 1e9 - (mean - 1e9)) ** 2).sum()
+        expected = np.sqrt(norm / (norm ** 2 - (weights ** 2).sum()) * sqr_sum)
+        self.assertEqual(count[0], 8)
+        self.assertAlmostEqual(result[0, 0], mean)
+        np.testing.assert_allclose(stddev[0, 0], expected, rtol=1e-6)
+
     def test_gauss_multi_mp(self):
         data = np.fromfunction(lambda y, x: (y + x) * 10 ** -6, (5000, 100))
         lons = np.fromfunction(
@@ -514,6 +865,29 @@ class Test(unittest.TestCase):
         self.assertTrue(np.array_equal(expected_mask, res.mask))
         self.assertAlmostEqual(cross_sum, expected, places=3)
 
+    def test_masked_multi_channel_mask(self):
+        data = np.ones((50, 10, 2), dtype=np.float32)
+        lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
+        lats = np.fromfunction(lambda y, x: 75 - y, (50, 10))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        mask = np.zeros((50, 10, 2), dtype=bool)
+        mask[:, 5:, 1] = True
+        masked_data = np.ma.array(data, mask=mask)
+        res_nn = kd_tree.resample_nearest(swath_def, masked_data, self.area_def,
+                                          50000, fill_value=None, segments=1)
+        res_gauss = kd_tree.resample_gauss(swath_def, masked_data, self.area_def,
+                                           50000, [25000, 25000], fill_value=None,
+                                           segments=1)
+        nn_mask = np.ma.getmaskarray(res_nn)
+        gauss_mask = np.ma.getmaskarray(res_gauss)
+        # Channels are masked independently of each other
+        self.assertTrue(np.all(nn_mask[..., 1] >= nn_mask[..., 0]))
+        self.assertGreater(nn_mask[..., 1].sum(), nn_mask[..., 0].sum())
+        # Gauss masks every pixel with a masked neighbour
+        self.assertTrue(np.all(gauss_mask[..., 1] >= nn_mask[..., 1]))
+        self.assertEqual(res_nn.dtype, np.float32)
+        np.testing.assert_allclose(res_gauss[..., 0].compressed(), 1, rtol=1e-6)
+
     def test_masked_fill_float(self):
         data = np.ones((50, 10))
         lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
@@ -693,6 +1067,93 @@ class Test(unittest.TestCase):
         expected = 1461.8428378742638
         self.assertAlmostEqual(cross_sum, expected)
 
+    def test_nearest_from_sample_batch(self):
+        data = np.fromfunction(lambda y, x: y * x, (50, 10))
+        masked_data = np.ma.array(data.astype(np.float32), mask=data > 100)
+        int_data = (data % 7).astype(np.int16)
+        lons = np.fromfunction(lambda y, x: 3 + x, (50, 10))
+        lats = np.fromfunction(lambda y, x: 75 - y, (50, 10))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        info = kd_tree.get_neighbour_info(swath_def, self.area_def, 50000,
+                                          neighbours=1, segments=1)
+        channels = {'data': data, 'masked': masked_data, 'int': int_data}
+        out = {'data': np.empty((800, 800)),
+               'masked': np.empty((800, 800), dtype=np.float32),
+               'int': np.empty((800, 800), dtype=np.int16)}
+        for fill_value in (0, None):
+            res = kd_tree.get_sample_from_neighbour_info_batch(
+                'nn', (800, 800), channels, *info, fill_value=fill_value, out=out)
+            for name, channel in channels.items():
+                expected = kd_tree.get_sample_from_neighbour_info(
+                    'nn', (800, 800), channel, *info, fill_value=fill_value)
+                self.assertEqual(res[name].dtype, channel.dtype)
+                self.assertTrue(np.shares_memory(np.ma.getdata(res[name]), out[name]))
+                np.testing.assert_array_equal(np.ma.getmaskarray(res[name]),
+                                              np.ma.getmaskarray(expected))
+                np.testing.assert_array_equal(res[name], expected)
+
+        # Output arrays of another type than the channels
+        uint8_data = (data % 200).astype(np.uint8)
+        res = kd_tree.get_sample_from_neighbour_info_batch(
+            'nn', (800, 800), [uint8_data, int_data], *info, fill_value=0,
+            out=[np.empty((800, 800), dtype=np.float32), np.empty((800, 800))])
+        for channel, result in zip([uint8_data, int_data], res):
+            expected = kd_tree.get_sample_from_neighbour_info(
+                'nn', (800, 800), channel, *info, fill_value=0)
+            np.testing.assert_array_equal(result, expected)
+        self.assertEqual(res[0].dtype, np.float32)
+        self.assertEqual(res[1].dtype, np.float64)
+
+        res = kd_tree.get_sample_from_neighbour_info_batch(
+            'nn', (800, 800), [data, int_data], *info)
+        self.assertIsInstance(res, list)
+        self.assertEqual(len(res), 2)
+        self.assertRaises(ValueError, kd_tree.get_sample_from_neighbour_info_batch,
+                          'nn', (800, 800), [data], *info, out=[np.empty((800, 799))])
+
+    def test_custom_from_sample_batch(self):
+        def wf1(dist):
+            return 1 - dist / 100000.0
+
+        def wf2(dist):
+            return 1
+
+        data = np.fromfunction(lambda y, x: (y + x) * 10 ** -6, (500, 100))
+        masked_data = np.ma.array(data, mask=data > 3e-4)
+        lons = np.fromfunction(
+            lambda y, x: 3 + (10.0 / 100) * x, (500, 100))
+        lats = np.fromfunction(
+            lambda y, x: 75 - (50.0 / 500) * y, (500, 100))
+        swath_def = geometry.SwathDefinition(lons=lons, lats=lats)
+        with catch_warnings(UserWarning):
+            info = kd_tree.get_neighbour_info(swath_def, self.area_def,
+                                              50000, segments=1)
+        channels = [data, masked_data, data.astype(np.int32)]
+        weight_funcs = [wf1, wf2, wf2]
+        for fill_value in (0, None):
+            res = kd_tree.get_sample_from_neighbour_info_batch(
+                'custom', (800, 800), channels, *info,
+                weight_funcs=weight_funcs, fill_value=fill_value)
+            for channel, wf, result in zip(channels, weight_funcs, res):
+                expected = kd_tree.get_sample_from_neighbour_info(
+                    'custom', (800, 800), channel, *info,
+                    weight_funcs=wf, fill_value=fill_value)
+                np.testing.assert_array_equal(np.ma.getmaskarray(result),
+                                              np.ma.getmaskarray(expected))
+                np.testing.assert_allclose(result, expected)
+
+        # A single neighbour gathers channels of any type into float64
+        info = kd_tree.get_neighbour_info(swath_def, self.area_def, 50000,
+                                          neighbours=1, segments=1)
+        channels = [data.astype(np.float32), (data * 1e5).astype(np.int16)]
+        res = kd_tree.get_sample_from_neighbour_info_batch(
+            'custom', (800, 800), channels, *info, weight_funcs=wf2, fill_value=0)
+        for channel, result in zip(channels, res):
+            expected = kd_tree.get_sample_from_neighbour_info(
+                'nn', (800, 800), channel, *info, fill_value=0)
+            self.assertEqual(result.dtype, np.float64)
+            np.testing.assert_array_equal(result, expected)
+
     def test_masked_multi_from_sample(self):
         data = np.ones((50, 10))
         data[:, 5:] = 2
@@ -904,6 +1365,26 @@ class TestXArrayResamplerNN(unittest.TestCase):
         expected = 27706753.0
         self.assertEqual(cross_sum, expected)
 
+    def test_nearest_area_2d_to_area_1n_single_precision(self):
+        """Test 2D area definition to 2D area definition in single precision."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        data = self.data_2d.rename({'my_dim_y': 'y', 'my_dim_x': 'x'})
+        resampler = XArrayResamplerNN(self.src_area_2d, self.area_def,
+                                      radius_of_influence=50000,
+                                      neighbours=1, precision='single')
+        ninfo = resampler.get_neighbour_info()
+        self.assertEqual(ninfo[2].dtype, np.int32)
+        self.assertEqual(ninfo[2].compute().dtype, np.int32)
+        res = resampler.get_sample_from_neighbour_info(data).values
+        resampler = XArrayResamplerNN(self.src_area_2d, self.area_def,
+                                      radius_of_influence=50000,
+                                      neighbours=1)
+        resampler.get_neighbour_info()
+        expected = resampler.get_sample_from_neighbour_info(data).values
+        # Only target pixels with two equally close source pixels differ
+        same = (res == expected) | (np.isnan(res) & np.isnan(expected))
+        self.assertGreater(same.mean(), 0.999)
+
     def test_nearest_area_2d_to_area_1n_no_roi(self):
         """Test 2D area definition to 2D area definition; 1 neighbor, no radius of influence."""
         from pyresample.kd_tree import XArrayResamplerNN
@@ -972,7 +1453,6 @@ class TestXArrayResamplerNN(unittest.TestCase):
         expected = 83120259.0
         self.assertEqual(cross_sum, expected)
 
-    @unittest.skipIf(True, "Multiple neighbors not supported yet")
     def test_nearest_swath_1d_mask_to_grid_8n(self):
         """Test 1D swath definition to 2D grid definition; 8 neighbors."""
         from pyresample.kd_tree import XArrayResamplerNN
@@ -983,12 +1463,257 @@ class TestXArrayResamplerNN(unittest.TestCase):
                                       neighbours=8)
         data = self.tdata_1d
         ninfo = resampler.get_neighbour_info(mask=data.isnull())
-        for val in ninfo[:3]:
-            # vii, ia, voi
+        for val in ninfo:
+            # vii, voi, ia, da
             self.assertIsInstance(val, da.Array)
-        res = resampler.get_sample_from_neighbour_info(data)
+        with self.assertRaises(ValueError):
+            resampler.get_sample_from_neighbour_info(data)
+
+        def weight_func(dist):
+            return 1 / dist
+
+        res = resampler.get_sample_from_neighbour_info(
+            data, weight_funcs=weight_func)
         self.assertIsInstance(res, xr.DataArray)
         self.assertIsInstance(res.data, da.Array)
-        # actual = res.values
-        # expected = TODO
-        # np.testing.assert_allclose(actual, expected)
+        swath_def = geometry.SwathDefinition(lons=self.tlons_1d.values,
+                                             lats=self.tlats_1d.values)
+        grid_def = geometry.GridDefinition(lons=np.asarray(self.tgrid.lons),
+                                           lats=np.asarray(self.tgrid.lats))
+        expected = kd_tree.resample_custom(swath_def, data.values, grid_def,
+                                           100000, weight_func, neighbours=8,
+                                           fill_value=np.nan)
+        np.testing.assert_allclose(res.values, expected)
+
+        res, stddev, count = resampler.get_sample_from_neighbour_info(
+            data, weight_funcs=weight_func, with_uncert=True)
+        np.testing.assert_allclose(res.values, expected)
+        self.assertEqual(stddev.shape, res.shape)
+        self.assertEqual(count.dims, ('y', 'x'))
+        np.testing.assert_array_equal(count.values[:, 0], 3)
+        np.testing.assert_array_equal(count.values[:, 2], 2)
+        self.assertEqual(count.values[2, 1], 0)
+
+    def test_gather_chunks(self):
+        """Test sampling target chunks from the source chunks they need."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        from dask.core import get_dependencies
+        for neighbours, weight_funcs in ((1, None), (4, lambda r: 1 / r)):
+            resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                          radius_of_influence=50000,
+                                          neighbours=neighbours)
+            resampler.get_neighbour_info()
+            resampler.index_array = resampler.index_array.rechunk((200, 200, -1))
+            if weight_funcs is not None:
+                resampler.distance_array = resampler.distance_array.rechunk((200, 200, -1))
+            for data in (self.data_3d, self.data_2d):
+                expected = resampler.get_sample_from_neighbour_info(
+                    data, weight_funcs=weight_funcs)
+                res = resampler.get_sample_from_neighbour_info(
+                    data, weight_funcs=weight_funcs, gather_chunks=True)
+                self.assertEqual(res.dims, expected.dims)
+                self.assertEqual(res.data.chunks, expected.data.chunks)
+                np.testing.assert_array_equal(res.values, expected.values)
+
+            graph = res.data.__dask_graph__()
+            source_name = self.data_2d.data.name
+            num_source_chunks = np.prod(self.data_2d.data.numblocks)
+            num_deps = [len([dep for dep in get_dependencies(graph, out_key)
+                             if dep[0] == source_name])
+                        for key in res.data.__dask_keys__() for out_key in key]
+            self.assertGreater(max(num_deps), 0)
+            self.assertLess(max(num_deps), num_source_chunks)
+
+    def test_gather_chunks_weight_funcs(self):
+        """Test that gathered samples of different weight functions don't collide."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        import dask
+        resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                      radius_of_influence=50000, neighbours=4)
+        resampler.get_neighbour_info()
+        weight_funcs = (lambda r: 1 / r, lambda r: np.exp(-r ** 2 / 25000. ** 2))
+        results = dask.compute(*[resampler.get_sample_from_neighbour_info(
+            self.data_2d, weight_funcs=weight_func, gather_chunks=True).data
+            for weight_func in weight_funcs])
+        for weight_func, res in zip(weight_funcs, results):
+            expected = resampler.get_sample_from_neighbour_info(
+                self.data_2d, weight_funcs=weight_func)
+            np.testing.assert_array_equal(res, expected.values)
+        self.assertFalse(np.allclose(results[0], results[1], equal_nan=True))
+
+    def test_kdtree_forest(self):
+        """Test querying one kd-tree per source chunk."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        import dask
+        data = self.data_2d.where(self.data_2d != 12)
+        for neighbours in (1, 4):
+            results = []
+            for kdtree_forest in (False, True):
+                resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                              radius_of_influence=50000,
+                                              neighbours=neighbours,
+                                              kdtree_forest=kdtree_forest)
+                ninfo = resampler.get_neighbour_info(mask=data.isnull())
+                results.append(dask.compute(*[val for val in ninfo if val is not None]))
+            self.assertEqual(len(resampler.delayed_kdtree),
+                             np.prod(data.data.numblocks))
+            for expected, res in zip(*results):
+                self.assertEqual(res.dtype, expected.dtype)
+                np.testing.assert_array_equal(res, expected)
+
+    def test_skip_empty_chunks(self):
+        """Test filling the target chunks the source doesn't cover."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        from dask.core import get_dependencies
+        with mock.patch('pyresample.kd_tree.CHUNK_SIZE', 200):
+            for neighbours, weight_funcs in ((1, None), (4, lambda r: 1 / r)):
+                results = []
+                for skip_empty_chunks in (False, True):
+                    resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                                  radius_of_influence=50000,
+                                                  neighbours=neighbours,
+                                                  skip_empty_chunks=skip_empty_chunks)
+                    resampler.get_neighbour_info()
+                    results.append(resampler.get_sample_from_neighbour_info(
+                        self.data_2d, weight_funcs=weight_funcs))
+                np.testing.assert_array_equal(results[1].values, results[0].values)
+
+                _, covered = resampler._coverage
+                self.assertTrue(covered.any())
+                self.assertFalse(covered.all())
+                # Uncovered chunks are constant blocks without dependencies
+                graph = dict(results[1].data.__dask_graph__())
+                num_constant = sum(not get_dependencies(graph, key)
+                                   for row in results[1].data.__dask_keys__()
+                                   for key in row)
+                self.assertEqual(num_constant, np.count_nonzero(~covered))
+
+    def test_target_chunks(self):
+        """Test the target chunks from the chunk size or the memory limit."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                      radius_of_influence=50000, chunks=300)
+        index_array = resampler.get_neighbour_info()[2]
+        self.assertEqual(index_array.chunks[:2], ((300, 300, 200),) * 2)
+        res = resampler.get_sample_from_neighbour_info(self.data_2d)
+        self.assertEqual(res.data.chunks, ((300, 300, 200),) * 2)
+
+        resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                      radius_of_influence=50000, neighbours=4,
+                                      memory_limit='4MB')
+        pixel_bytes, fixed_bytes = resampler._get_task_memory()
+        index_array = resampler.get_neighbour_info()[2]
+        size = max(index_array.chunks[0])
+        self.assertLessEqual(fixed_bytes + size ** 2 * pixel_bytes, 4e6)
+        self.assertGreater(fixed_bytes + (size + 1) ** 2 * pixel_bytes, 4e6)
+
+        with self.assertRaises(ValueError):
+            XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                              radius_of_influence=50000, chunks=300,
+                              memory_limit='4MB').get_neighbour_info()
+
+    def test_save_load_neighbour_info(self):
+        """Test saving and loading the neighbour info."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        import dask
+        import dask.array as da
+        tempdir = tempfile.mkdtemp()
+        try:
+            resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                          radius_of_influence=50000,
+                                          neighbours=4)
+            ninfo = dask.compute(*resampler.get_neighbour_info())
+            for filename in ('nn.zarr', 'nn.npz'):
+                filename = os.path.join(tempdir, filename)
+                resampler.save_neighbour_info(filename)
+                new_resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                                  radius_of_influence=50000,
+                                                  neighbours=4)
+                loaded = new_resampler.load_neighbour_info(filename)
+                for orig, reloaded in zip(ninfo, loaded):
+                    self.assertIsInstance(reloaded, da.Array)
+                    np.testing.assert_array_equal(orig, reloaded.compute())
+
+            # Without zarr, uncompressed .npy files are memory mapped
+            filename = os.path.join(tempdir, 'nn')
+            with mock.patch('pyresample.kd_tree.zarr', None):
+                resampler.save_neighbour_info(filename)
+                with mock.patch('numpy.load', wraps=np.load) as load:
+                    loaded = new_resampler.load_neighbour_info(filename)
+            self.assertEqual(sorted(os.listdir(filename)),
+                             ['distance_array.npy', 'index_array.npy',
+                              'valid_input_index.npy', 'valid_output_index.npy'])
+            for call in load.call_args_list:
+                self.assertEqual(call[1], {'mmap_mode': 'r'})
+            for orig, reloaded in zip(ninfo, loaded):
+                self.assertIsInstance(reloaded, da.Array)
+                np.testing.assert_array_equal(orig, reloaded.compute())
+
+            # The target arrays are chunked like the target of the resampler
+            resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                          radius_of_influence=50000,
+                                          neighbours=4, chunks=300)
+            computed = resampler.get_neighbour_info()
+            for filename in ('chunked.zarr', 'chunked.npz'):
+                filename = os.path.join(tempdir, filename)
+                resampler.save_neighbour_info(filename)
+                loaded = resampler.load_neighbour_info(filename)
+                for orig, reloaded in zip(computed[1:], loaded[1:]):
+                    self.assertEqual(reloaded.chunks, orig.chunks)
+                    self.assertEqual(reloaded.chunks[0], (300, 300, 200))
+        finally:
+            shutil.rmtree(tempdir, ignore_errors=True)
+
+    def test_neighbour_info_cache_dir(self):
+        """Test reusing neighbour info from the cache directory."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        tempdir = tempfile.mkdtemp()
+        try:
+            results = []
+            for _ in range(2):
+                resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                              radius_of_influence=50000,
+                                              neighbours=1)
+                with mock.patch.object(resampler, '_create_resample_kdtree',
+                                       wraps=resampler._create_resample_kdtree) as create:
+                    resampler.get_neighbour_info(cache_dir=tempdir)
+                results.append(resampler.get_sample_from_neighbour_info(self.data_2d).values)
+            # The second resampler loads the saved neighbour info
+            create.assert_not_called()
+            self.assertEqual(len(os.listdir(tempdir)), 1)
+            np.testing.assert_array_equal(results[0], results[1])
+
+            # Neighbour info depending on a mask is not cached
+            resampler.get_neighbour_info(mask=self.data_2d.isnull(), cache_dir=tempdir)
+            self.assertEqual(len(os.listdir(tempdir)), 1)
+        finally:
+            shutil.rmtree(tempdir, ignore_errors=True)
+
+    def test_weighted_area_to_area_multi_channel(self):
+        """Test weighted resampling of bands with one weight function each."""
+        from pyresample.kd_tree import XArrayResamplerNN
+        import dask.array as da
+        weight_funcs = [lambda r: np.exp(-r ** 2 / 25000. ** 2),
+                        lambda r: np.exp(-r ** 2 / 50000. ** 2),
+                        lambda r: 1 / r]
+        resampler = XArrayResamplerNN(self.swath_def_2d, self.area_def,
+                                      radius_of_influence=50000,
+                                      neighbours=4)
+        resampler.get_neighbour_info()
+        data = self.data_3d.transpose('bands', 'my_dim_y', 'my_dim_x')
+        res = resampler.get_sample_from_neighbour_info(
+            data, weight_funcs=weight_funcs)
+        self.assertIsInstance(res.data, da.Array)
+        self.assertEqual(res.dims, ('bands', 'y', 'x'))
+        self.assertEqual(res.shape, (3,) + self.area_def.shape)
+        self.assertIn('bands', res.coords)
+
+        swath_def = geometry.SwathDefinition(lons=self.lons_2d.values,
+                                             lats=self.lats_2d.values)
+        expected = kd_tree.resample_custom(swath_def, self.data_3d.values,
+                                           self.area_def, 50000, weight_funcs,
+                                           neighbours=4, fill_value=np.nan)
+        np.testing.assert_allclose(res.values, np.moveaxis(expected, 2, 0))
+        with self.assertRaises(ValueError):
+            resampler.get_sample_from_neighbour_info(
+                data, weight_funcs=weight_funcs[:2])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020 PyTroll developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Testing the _multi_proc module."""
+
+import unittest
+
+import numpy as np
+
+from pyresample._multi_proc import Scheduler, SchedulerStats
+
+
+class SchedulerTest(unittest.TestCase):
+    """Test the load balancing Scheduler."""
+
+    def _run(self, scheduler, nprocs):
+        """Iterate the scheduler once per worker, one after the other."""
+        return [list(scheduler) for _ in range(nprocs)]
+
+    def _assert_covers(self, slices, ndata):
+        counts = np.zeros(ndata, dtype=int)
+        for s in slices:
+            counts[s] += 1
+        np.testing.assert_array_equal(counts, 1)
+
+    def test_stealing(self):
+        """Test that an idle worker steals the ranges of the others."""
+        for schedule in ('guided', 'dynamic'):
+            stats = SchedulerStats(4)
+            slices = self._run(Scheduler(1003, 4, schedule=schedule, stats=stats), 4)
+            # The first worker finishes before the others start
+            self._assert_covers(slices[0], 1003)
+            self.assertEqual(slices[1:], [[], [], []])
+            np.testing.assert_array_equal(stats.items, [1003, 0, 0, 0])
+            self.assertEqual(stats.chunks[0], len(slices[0]))
+
+    def test_static(self):
+        """Test that the static schedule keeps to the pre-split ranges."""
+        slices = self._run(Scheduler(1003, 4, schedule='static'), 4)
+        self.assertEqual([sum(s.stop - s.start for s in worker) for worker in slices],
+                         [250, 251, 251, 251])
+        self._assert_covers(sum(slices, []), 1003)
+
+    def test_extra_worker(self):
+        """Test iterating the scheduler more often than there are workers."""
+        scheduler = Scheduler(100, 2, chunk=10)
+        self.assertEqual(next(iter(scheduler)), slice(0, 25))
+        self.assertEqual(next(iter(scheduler)), slice(50, 75))
+        slices = list(scheduler)
+        self._assert_covers(slices + [slice(0, 25), slice(50, 75)], 100)
+
+    def test_stats_workers(self):
+        """Test that the stats have to match the number of workers."""
+        with self.assertRaises(ValueError):
+            Scheduler(100, 2, stats=SchedulerStats(3))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pyresample, Resampling of remote sensing image data in python
+#
+# Copyright (C) 2020 PyTroll developers
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Testing the resampler module."""
+
+import unittest
+from unittest import mock
+
+import dask.array as da
+import numpy as np
+import xarray as xr
+
+from pyresample.geometry import AreaDefinition
+from pyresample.resampler import BaseResampler
+
+
+class _DoublingResampler(BaseResampler):
+    """Resampler doubling the data, for testing."""
+
+    def compute(self, data, **kwargs):
+        return data * 2
+
+
+class TestResampleMany(unittest.TestCase):
+    """Test resampling several datasets at once."""
+
+    def setUp(self):
+        """Set up a resampler and some data."""
+        area = AreaDefinition('test', 'test', 'test',
+                              {'proj': 'eqc', 'lon_0': 0.0, 'lat_0': 0.0},
+                              4, 3, (-1000., -1000., 1000., 1000.))
+        self.resampler = _DoublingResampler(area, area)
+        arr = da.from_array(np.arange(12.).reshape((3, 4)), chunks=2)
+        self.data = xr.DataArray(arr, dims=('y', 'x'))
+        self.other = xr.DataArray(arr + 1, dims=('y', 'x'))
+
+    def test_shared_precompute(self):
+        """Test that datasets with the same mask share their precompute."""
+        with mock.patch.object(self.resampler, 'precompute') as precompute:
+            res = self.resampler.resample_many(
+                [self.data, self.data.copy(), self.other], mask_area=True)
+        self.assertEqual(precompute.call_count, 2)
+        self.assertEqual(len(res), 3)
+        np.testing.assert_array_equal(res[1], self.data * 2)
+        np.testing.assert_array_equal(res[2], self.other * 2)
+
+        with mock.patch.object(self.resampler, 'precompute') as precompute:
+            self.resampler.resample_many([self.data, self.other])
+        precompute.assert_called_once()
+
+    def test_dict_and_compute(self):
+        """Test resampling a dict of datasets and computing them together."""
+        res = self.resampler.resample_many({'a': self.data, 'b': self.other},
+                                           compute=True)
+        self.assertEqual(list(res.keys()), ['a', 'b'])
+        self.assertIsInstance(res['a'].data, np.ndarray)
+        np.testing.assert_array_equal(res['b'], self.other * 2)
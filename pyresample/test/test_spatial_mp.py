@@ -19,8 +19,8 @@
 """Testing the _spatial_mp module."""
 
 
-# from unittest import mock
 import unittest
+from unittest import mock
 import numpy as np
 
 import pyresample._spatial_mp as sp
@@ -83,3 +83,148 @@ class SpatialMPTest(unittest.TestCase):
         self.assertIs(type(coords_float32[0, 0]), np.float32)
         self.assertIs(type(coords_float[0, 0]), np.float64)
         self.assertTrue(np.issubdtype(coords_int.dtype, np.floating))
+
+
+class KDTreeMPTest(unittest.TestCase):
+    """Test of the multiprocessing kd-tree."""
+
+    def setUp(self):
+        """Set up random source and query points."""
+        rng = np.random.RandomState(0)
+        self.data = rng.random_sample((2000, 3))
+        self.x = rng.random_sample((500, 3))
+
+    def test_float32(self):
+        """Test that float32 coordinates stay float32 in shared memory."""
+        kdtree = sp.cKDTree_MP(self.data.astype(np.float32), nprocs=2)
+        self.assertEqual(kdtree.data.dtype, np.float32)
+        d, i = kdtree.query(self.x.astype(np.float32), k=4)
+        self.assertEqual(d.dtype, np.float32)
+        self.assertEqual(i.dtype, np.int32)
+        exp_d, exp_i = sp.cKDTree_MP(self.data, nprocs=2).query(self.x, k=4)
+        np.testing.assert_allclose(d, exp_d, atol=1e-6)
+
+    def test_stats(self):
+        """Test collecting the work done per process."""
+        from pyresample._multi_proc import SchedulerStats
+        stats = SchedulerStats(2)
+        sp.cKDTree_MP(self.data, nprocs=2).query(self.x, k=4, stats=stats)
+        self.assertEqual(stats.items.sum(), 500)
+        self.assertTrue((stats.chunks > 0).any())
+        self.assertTrue((stats.wall_time >= 0).all())
+        self.assertIn('worker 1:', str(stats))
+
+    def test_index_dtype(self):
+        """Test choosing the index dtype from the number of data points."""
+        self.assertEqual(sp._get_index_dtype(2 ** 31 - 1), np.int32)
+        self.assertEqual(sp._get_index_dtype(2 ** 31), np.int64)
+
+    def test_shmem_dtypes(self):
+        """Test that shared memory arrays keep their numpy dtype."""
+        from pyresample._multi_proc import shmem_as_ndarray, shmem_empty
+        for dtype in (np.float32, np.float64, np.int32, np.int64, np.uint32, np.uint8):
+            arr = shmem_as_ndarray(shmem_empty(5, dtype))
+            self.assertEqual(arr.dtype, dtype)
+            self.assertEqual(arr.size, 5)
+
+    @unittest.skipIf(sp.shared_memory is None, 'multiprocessing.shared_memory is missing')
+    def test_persistent_pool(self):
+        """Test that queries of a started pool match the per-query processes."""
+        kdtree = sp.cKDTree_MP(self.data, nprocs=2)
+        exp_d, exp_i = kdtree.query(self.x, k=4)
+        with kdtree:
+            self.assertIsNotNone(kdtree._pool)
+            for k in (4, 1, 6):
+                d, i = kdtree.query(self.x, k=k)
+                if k == 1:
+                    self.assertEqual(d.shape, (500,))
+                    np.testing.assert_array_equal(i, exp_i[:, 0])
+                else:
+                    self.assertEqual(d.shape, (500, k))
+                    np.testing.assert_array_equal(i[:, :4], exp_i)
+                    np.testing.assert_allclose(d[:, :4], exp_d)
+            # Fewer points reuse the shared memory of the first query
+            d, i = kdtree.query(self.x[:10], k=4)
+            np.testing.assert_array_equal(i, exp_i[:10])
+
+            # The workers of the pool collect stats too
+            from pyresample._multi_proc import SchedulerStats
+            stats = SchedulerStats(2)
+            kdtree.query(self.x, k=4, stats=stats)
+            kdtree.query(self.x[:10], k=4, stats=stats)
+            self.assertEqual(stats.items.sum(), 510)
+            self.assertTrue((stats.chunks > 0).any())
+            self.assertTrue((stats.wall_time >= 0).all())
+            with self.assertRaises(ValueError):
+                kdtree.query(self.x, k=4, stats=SchedulerStats(3))
+        self.assertIsNone(kdtree._pool)
+
+        with sp.cKDTree_MP(self.data.astype(np.float32), nprocs=2) as kdtree:
+            d, i = kdtree.query(self.x, k=4)
+        self.assertEqual(d.dtype, np.float32)
+        np.testing.assert_array_equal(i, exp_i)
+
+    @unittest.skipIf(sp.shared_memory is None, 'multiprocessing.shared_memory is missing')
+    def test_persistent_pool_dead_worker(self):
+        """Test that queries fail instead of waiting for a worker that exited."""
+        with sp.cKDTree_MP(self.data, nprocs=2) as kdtree:
+            worker = kdtree._pool._workers[0]
+            worker.terminate()
+            worker.join()
+            with mock.patch.object(sp, 'POOL_POLL_INTERVAL', 0.1):
+                # Waiting for the chunks of a query notices the exited worker
+                with self.assertRaises(RuntimeError):
+                    kdtree._pool._get_done()
+                with self.assertRaises(RuntimeError):
+                    kdtree.query(self.x, k=4)
+
+
+class ThreadsBackendTest(unittest.TestCase):
+    """Test of the thread-based parallel backend."""
+
+    def test_kdtree(self):
+        """Test that the threaded kd-tree matches pykdtree."""
+        from pykdtree.kdtree import KDTree
+        rng = np.random.RandomState(0)
+        data = rng.random_sample((2000, 3))
+        x = rng.random_sample((500, 3))
+        exp_d, exp_i = KDTree(data).query(x, k=4, distance_upper_bound=0.1)
+        with sp.cKDTree_Threads(data, nprocs=3) as kdtree:
+            d, i = kdtree.query(x, k=4, distance_upper_bound=0.1)
+            np.testing.assert_array_equal(i, exp_i)
+            np.testing.assert_array_equal(d, exp_d)
+        d, i = kdtree.query(x, k=1)
+        self.assertEqual(d.shape, (500,))
+        np.testing.assert_array_equal(i, KDTree(data).query(x)[1])
+
+    def test_proj(self):
+        """Test that the threaded projection matches a single Proj call."""
+        lons, lats = np.meshgrid(np.linspace(-10, 10, 50), np.linspace(40, 60, 40))
+        proj = sp.Proj_Threads(proj='stere', lat_0=50, lon_0=0)
+        x, y = proj(lons, lats, nprocs=3)
+        exp_x, exp_y = sp.Proj(proj='stere', lat_0=50, lon_0=0)(lons, lats)
+        self.assertEqual(x.shape, lons.shape)
+        np.testing.assert_allclose(x, exp_x)
+        np.testing.assert_allclose(y, exp_y)
+
+    def test_cartesian(self):
+        """Test that the threaded cartesian transform matches Cartesian."""
+        lons = np.linspace(-180, 180, 1000)
+        lats = np.linspace(-90, 90, 1000).astype(np.float32)
+        coords = sp.Cartesian_Threads(3).transform_lonlats(lons, lats)
+        np.testing.assert_allclose(coords, sp.Cartesian().transform_lonlats(lons, lats))
+
+    def test_backend_selection(self):
+        """Test choosing the classes of the parallel backend."""
+        self.assertIs(sp.get_kdtree_class('threads'), sp.cKDTree_Threads)
+        self.assertIs(sp.get_proj_class('processes'), sp.Proj_MP)
+        self.assertIs(sp.get_cartesian_class('threads'), sp.Cartesian_Threads)
+        self.assertEqual(sp.get_parallel_backend('auto'), 'threads')
+        with mock.patch('pyresample._spatial_mp.is_pyproj2', return_value=False):
+            self.assertEqual(sp.get_parallel_backend('auto'), 'processes')
+        with mock.patch('pyresample.PARALLEL', 'threads'):
+            self.assertIs(sp.get_kdtree_class(), sp.cKDTree_Threads)
+        with mock.patch('pyresample.PARALLEL', 'processes'):
+            self.assertIs(sp.get_kdtree_class(), sp.cKDTree_MP)
+        with self.assertRaises(ValueError):
+            sp.get_parallel_backend('gpu')
@@ -54,6 +54,8 @@ extensions = [
               depends=["pyresample/ewa/_fornav_templates.h"]),
     Extension("pyresample.gradient._gradient_search", sources=["pyresample/gradient/_gradient_search.pyx"],
               extra_compile_args=extra_compile_args),
+    Extension("pyresample._weighted_sum", sources=["pyresample/_weighted_sum.pyx"],
+              extra_compile_args=extra_compile_args),
 ]
 
 try: